@@ -0,0 +1,311 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine import ENGINES, ParallelEngine, make_engine
+from metrics import Metrics
+from model import GameOfLifeLoader, GameOfLifeMaker
+
+
+# Замеры скорости игры
+# Для каждого случая (случайное поле заданного размера и плотности или узор
+# из patterns/) и каждого движка измеряются:
+#   - поколения в секунду и клетки в секунду для GameOfLife.next
+#   - время по фазам шага (GameOfLife.metrics, см. metrics.py): вычисление
+#     поколения, отпечаток поля, запись в историю, проверки завершения
+#     и периодичности
+#   - пиковая память (tracemalloc) при создании игры и первых шагах
+#   - время преобразований GameOfLifeLoader и GameFieldView.toImage
+#     (последнее -- только если установлен PyQt5)
+# Поля случайные, но с фиксированным зерном, поэтому прогоны воспроизводимы.
+# Результаты пишутся в JSON; с --baseline они сравниваются с прошлым прогоном
+# и замедления больше чем на --tolerance выводятся как регрессии.
+#
+# Пример
+#   python benchmark.py --out results/before.json
+#   python benchmark.py --out results/after.json --baseline results/before.json
+#   python benchmark.py --sizes 1024 4096 --engine numpy packed parallel --workers 1 2 4
+
+DEFAULT_SIZES = (32, 128, 512, 1024, 2048, 4096)
+DEFAULT_DENSITIES = (0.1, 0.3, 0.5)
+PATTERNS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns")
+# Размер поля для узоров из patterns/
+PATTERN_SIZE = (256, 256)
+# Сколько поколений проходит под tracemalloc
+MEMORY_GENERATIONS = 3
+# Сколько раз повторяется преобразование; берётся лучшее время
+CONVERTER_REPEATS = 3
+
+FORMAT_VERSION = 1
+
+# Приложение Qt для замера toImage, создаётся один раз
+_app = None
+
+
+# Случай замера: имя и способ создать поле
+class Case:
+    def __init__(self, name, make, **params):
+        self.name = name
+        self.make = make
+        self.params = params
+
+    # Игра не останавливается на завершённом поле: натюрморты и вымирающие
+    # поля меряются столько же поколений, сколько остальные
+    def game(self, engine):
+        game = self.make(engine)
+        game.stop_when_finished = False
+        return game
+
+
+def random_case(size, density, seed):
+    return Case(
+        f"random-{size}x{size}-{density}",
+        lambda engine: GameOfLifeMaker.random(size, size, density=density, seed=seed, engine=engine),
+        rows=size, cols=size, density=density, seed=seed,
+    )
+
+
+def pattern_case(path):
+    return Case(
+        f"pattern-{os.path.splitext(os.path.basename(path))[0]}",
+        lambda engine: GameOfLifeMaker.fromfile(path, minsize=PATTERN_SIZE, engine=engine),
+        pattern=path,
+    )
+
+
+def make_cases(sizes, densities, seed, patterns=PATTERNS):
+    cases = [random_case(size, density, seed) for size in sizes for density in densities]
+    if patterns:
+        cases += [pattern_case(path) for path in sorted(glob.glob(os.path.join(patterns, "*")))]
+    return cases
+
+
+# Движки для замера: (имя, фабрика)
+# None -- движок, который игра выбирает по размеру поля сама
+def make_engines(names, workers):
+    engines = [(name, lambda name=name: make_engine(None if name == "auto" else name)) for name in names]
+    engines += [(f"parallel:{w}", lambda w=w: ParallelEngine(workers=w)) for w in workers]
+    return engines
+
+
+# Шаги игры, пока не пройдёт min_time секунд или max_generations поколений;
+# возвращает (поколения, секунды)
+def run_timed(game, min_time, max_generations):
+    generations = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while generations < max_generations:
+        game.next()
+        generations += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    return generations, elapsed
+
+
+def run_generations(game, generations):
+    for _ in range(generations):
+        game.next()
+
+
+def best_time(function, repeats=CONVERTER_REPEATS):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_converters(matrix, view=None):
+    text = GameOfLifeLoader.matrix_to_string(matrix)
+    blob = GameOfLifeLoader.matrix_to_bytes(matrix)
+    seconds = {
+        "matrix_to_string": best_time(lambda: GameOfLifeLoader.matrix_to_string(matrix)),
+        "string_to_matrix": best_time(lambda: GameOfLifeLoader.string_to_matrix(text, minsize=matrix.shape)),
+        "matrix_to_bytes": best_time(lambda: GameOfLifeLoader.matrix_to_bytes(matrix)),
+        "bytes_to_matrix": best_time(lambda: GameOfLifeLoader.bytes_to_matrix(blob)),
+    }
+    if view is not None:
+        # Новый объект-срез на каждый вызов: кеш изображений не срабатывает
+        seconds["to_image"] = best_time(lambda: view.toImage(matrix[:]))
+    return seconds
+
+
+def measure(case, engine_name, make, min_time, max_generations, view=None):
+    # Скорость: прогрев одним шагом (буферы, потоки), затем замер
+    game = case.game(make())
+    game.next()
+    generations, seconds = run_timed(game, min_time, max_generations)
+    cells = game.height() * game.width()
+    close(game)
+
+    # Фазы: столько же поколений на новой игре
+    game = case.game(make())
+    game.next()
+    game.metrics = Metrics()
+    start = time.perf_counter()
+    run_generations(game, generations)
+    total = time.perf_counter() - start
+    phases = {name[len("game."):]: h.total for (name, h) in game.metrics.timings.items()}
+    phases["other"] = max(0.0, total - sum(phases.values()))
+    close(game)
+
+    # Память: пик при создании игры и нескольких шагах
+    tracemalloc.start()
+    try:
+        game = case.game(make())
+        run_generations(game, MEMORY_GENERATIONS)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    converters = measure_converters(game.state, view)
+    close(game)
+
+    rate = generations / seconds if seconds > 0 else 0.0
+    return {
+        "case": case.name,
+        "engine": engine_name,
+        "params": case.params,
+        "rows": game.height(),
+        "cols": game.width(),
+        "generations": generations,
+        "seconds": seconds,
+        "generations_per_second": rate,
+        "cells_per_second": rate * cells,
+        "peak_memory": peak,
+        "phases": {phase: value / generations if generations else 0.0 for (phase, value) in phases.items()},
+        "converters": converters,
+    }
+
+
+def close(game):
+    if hasattr(game.engine, "close"):
+        game.engine.close()
+
+
+# GameFieldView для замера toImage или None без PyQt5
+def make_view():
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        from view import GameFieldView
+    except ImportError:
+        return None
+    global _app
+    _app = QApplication.instance() or QApplication([])
+    return GameFieldView()
+
+
+def environment():
+    return {
+        "format": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# Сравнение с прошлым прогоном
+# Возвращает строки с регрессиями: меньше поколений в секунду, больше
+# памяти или времени преобразований, чем в baseline, с допуском tolerance
+def compare(results, baseline, tolerance):
+    previous = {(r["case"], r["engine"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["engine"]))
+        if old is None:
+            continue
+        name = f"{result['case']} [{result['engine']}]"
+
+        rate, old_rate = result["generations_per_second"], old["generations_per_second"]
+        if rate < old_rate * (1 - tolerance):
+            regressions.append(f"{name}: {old_rate:.1f} -> {rate:.1f} поколений/с")
+
+        memory, old_memory = result["peak_memory"], old["peak_memory"]
+        if memory > old_memory * (1 + tolerance):
+            regressions.append(f"{name}: память {old_memory} -> {memory} байт")
+
+        for (converter, seconds) in result["converters"].items():
+            old_seconds = old["converters"].get(converter)
+            if old_seconds is not None and seconds > old_seconds * (1 + tolerance):
+                regressions.append(f"{name}: {converter} {old_seconds * 1e3:.3f} -> {seconds * 1e3:.3f} мс")
+    return regressions
+
+
+def format_result(result):
+    phases = ", ".join(f"{phase} {seconds * 1e6:.0f}" for (phase, seconds) in result["phases"].items())
+    return (f"{result['case']:<28} {result['engine']:<12} "
+            f"{result['generations_per_second']:>10.1f} пок/с "
+            f"{result['cells_per_second'] / 1e6:>9.1f} Мкл/с "
+            f"{result['peak_memory'] / 2 ** 20:>8.1f} МБ  "
+            f"[мкс/пок: {phases}]")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры скорости игры жизнь")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="стороны квадратных полей")
+    parser.add_argument("--densities", nargs="+", type=float, default=DEFAULT_DENSITIES,
+                        help="доли живых клеток случайных полей")
+    parser.add_argument("--seed", type=int, default=0, help="зерно случайных полей")
+    parser.add_argument("--patterns", default=PATTERNS, help="каталог узоров ('' -- без узоров)")
+    parser.add_argument("--engine", nargs="+", choices=["auto"] + sorted(ENGINES), default=["auto"],
+                        help="движки (auto -- выбор по размеру поля)")
+    parser.add_argument("--workers", nargs="*", type=int, default=[],
+                        help="числа потоков для движка parallel")
+    parser.add_argument("--min-time", type=float, default=1.0, help="сколько секунд считать каждый случай")
+    parser.add_argument("--max-generations", type=int, default=1000, help="не больше стольких поколений")
+    parser.add_argument("--no-image", action="store_true", help="не замерять toImage")
+    parser.add_argument("--out", default=None, help="файл для результатов в JSON")
+    parser.add_argument("--baseline", default=None, help="результаты прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="допустимое замедление (доля)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cases = make_cases(args.sizes, args.densities, args.seed, args.patterns)
+    engines = make_engines(args.engine, args.workers)
+    view = None if args.no_image else make_view()
+
+    results = []
+    for case in cases:
+        for (engine_name, make) in engines:
+            result = measure(case, engine_name, make, args.min_time, args.max_generations, view)
+            results.append(result)
+            print(format_result(result), flush=True)
+
+    report = {"environment": environment(), "results": results}
+    if args.out is not None:
+        directory = os.path.dirname(args.out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.out, "w") as io:
+            json.dump(report, io, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as io:
+            regressions = compare(results, json.load(io), args.tolerance)
+        if regressions:
+            print("Регрессии:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
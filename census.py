@@ -0,0 +1,353 @@
+import glob
+import os
+from collections import Counter
+
+import numpy as np
+
+from engine import default_engine
+from formats import read_pattern
+from model import GameOfLifeMaker
+from rules import CONWAY
+from soupcache import canonical_key
+
+
+# Перепись объектов поля: какие блоки, мигалки, планеры... на нём остались
+# Живые клетки делятся на связные (по восьми соседям) компоненты, каждая
+# приводится к каноническому виду (soupcache.canonical_key: сдвиг, повороты,
+# отражения) и ищется в каталоге (Catalogue) -- словаре канонический
+# ключ -> имя. Каталог собирается из узоров patterns/: для осцилляторов
+# и кораблей в него попадают все фазы, поэтому объект узнаётся в любой фазе,
+# ориентации и положении.
+#
+# Разметка компонент векторная и идёт по списку живых клеток, а не по всему
+# полю: рёбра между соседними живыми клетками строятся сразу для всех,
+# затем метки (номера клеток) повторяют «взять наименьшую метку соседа»
+# с перескоком по меткам, пока не перестанут меняться. Поле может быть
+# стопкой B x N x M (например, GameOfLifeEnsemble.state): тогда размечаются
+# сразу все поля стопки.
+#
+# Одинаковые компоненты на полях повторяются тысячами, поэтому каждая
+# сначала получает отпечаток без поворотов (сумма перемешанных номеров её
+# клеток, как в ensemble.py), и канонический вид ищется один раз на отпечаток.
+#
+# Пример
+#   catalogue = Catalogue.from_directory()   # узоры patterns/ рядом с census.py
+#   census(game.state, catalogue)            # Counter({"block": 4, "blinker": 2, ...})
+#   census(ensemble.state, catalogue)        # список Counter, по одному на поле
+#   game_census(game, catalogue)
+#
+# Компонента не из каталога называется unknown_<число клеток>_<начало ключа>.
+# Фаза объекта может распадаться на несколько компонент (у кораблей LWSS,
+# MWSS, HWSS -- каждое второе поколение: корпус и искра, у пентадекатлона --
+# две половины). Такие части каталог помнит (Catalogue._fragments) вместе
+# с расстоянием, на котором они лежат друг от друга (Catalogue._reach), и
+# census собирает их обратно: части не дальше _reach клеток друг от друга
+# размечаются ещё раз вместе, и группа из нескольких частей, которая есть
+# в каталоге, считается одним объектом. Иначе части считаются каждая сама
+# по себе (в том числе части объекта, рядом с которыми оказалась ещё одна).
+# Соприкасающиеся объекты узнаются только вместе и только если такая
+# компонента есть в каталоге (например, ship_tie -- два корабля).
+
+# Каталог узоров -- рядом с модулем, а не в текущем каталоге
+PATTERNS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns")
+
+# Наибольший период объектов каталога
+MAX_PERIOD = 64
+
+# Отпечатков компонент без поворотов, которые помнит каталог
+MAX_ORIENTED = 100000
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+# Перемешивание 64-битных чисел (splitmix64)
+def _mix(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+# Компоненты живых клеток поля (или стопки полей)
+# Возвращает координаты живых клеток b, r, c (b -- номер поля в стопке)
+# и номер компоненты каждой клетки, компоненты занумерованы с 0
+# wrap -- поле тор: клетки у противоположных краёв соседние
+# reach -- клетки соседние, если они не дальше reach клеток друг от друга
+# (1 -- восемь соседей)
+def _components(alive, wrap, reach=1):
+    B, N, M = alive.shape
+    b, r, c = np.nonzero(alive)
+    n = b.size
+    if n == 0:
+        return b, r, c, np.zeros(0, dtype=np.int64), 0
+
+    index = np.full(alive.shape, -1, dtype=np.int64)
+    index[b, r, c] = np.arange(n)
+
+    # Рёбра к соседям «вперёд» (при reach = 1 -- к четырём), в обе стороны
+    src, dst = [], []
+    forward = [(0, dj) for dj in range(1, reach + 1)]
+    forward += [(di, dj) for di in range(1, reach + 1) for dj in range(-reach, reach + 1)]
+    for (di, dj) in forward:
+        rr, cc = r + di, c + dj
+        if wrap:
+            rr %= N
+            cc %= M
+            cells = np.arange(n)
+        else:
+            inside = (rr < N) & (cc >= 0) & (cc < M)
+            cells = np.flatnonzero(inside)
+            rr, cc = rr[inside], cc[inside]
+        neighbour = index[b[cells], rr, cc]
+        linked = neighbour >= 0
+        src += [cells[linked], neighbour[linked]]
+        dst += [neighbour[linked], cells[linked]]
+    src, dst = np.concatenate(src), np.concatenate(dst)
+
+    labels = np.arange(n)
+    if src.size:
+        order = np.argsort(src, kind="stable")
+        src, dst = src[order], dst[order]
+        starts = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+        nodes = src[starts]
+        while True:
+            low = np.minimum.reduceat(labels[dst], starts)
+            new = labels.copy()
+            np.minimum(new[nodes], low, out=low)
+            new[nodes] = low
+            new = new[new]
+            if np.array_equal(new, labels):
+                break
+            labels = new
+
+    _, component = np.unique(labels, return_inverse=True)
+    return b, r, c, component.ravel(), int(component.max()) + 1
+
+
+# Разметка компонент: матрица номеров (0 -- мёртвая клетка, компоненты --
+# 1 .. count) того же размера, что cells, и count
+def label(cells, wrap=True):
+    alive = np.asarray(cells) != 0
+    stack = alive if alive.ndim == 3 else alive[None]
+    b, r, c, component, count = _components(stack, wrap)
+    labels = np.zeros(stack.shape, dtype=np.int32)
+    labels[b, r, c] = component + 1
+    return (labels if alive.ndim == 3 else labels[0]), count
+
+
+# Каталог объектов
+class Catalogue:
+    def __init__(self, rule=CONWAY):
+        if rule.states != 2:
+            raise ValueError(f"Перепись объектов -- для правил с двумя состояниями, а не {rule}")
+        self.rule = rule
+        # Канонический ключ фазы -> имя объекта
+        self._names = {}
+        # Канонические ключи частей фаз, распадающихся на несколько компонент,
+        # и наибольшее расстояние (reach у _components), на котором части
+        # одной фазы ещё собираются в одну компоненту
+        self._fragments = set()
+        self._reach = 1
+        # Отпечаток компоненты без поворотов -> (имя, ключ) (кеш для census)
+        self._oriented = {}
+
+    # Число известных фаз
+    def __len__(self):
+        return len(self._names)
+
+    # Имена объектов каталога
+    def objects(self):
+        return sorted(set(self._names.values()))
+
+    # Добавить объект name: cells -- одна его фаза (матрица bool)
+    # Узор считается отдельно от всего: если за max_period поколений он
+    # повторился (с точностью до сдвига), добавляются все фазы, иначе --
+    # только данная. Части фаз, распадающихся на несколько компонент,
+    # запоминаются, чтобы census мог собрать фазу из них
+    def add(self, name, cells, max_period=MAX_PERIOD):
+        cells = np.asarray(cells, dtype=np.bool_)
+        first = canonical_key(cells, self.rule)
+        phases = [first]
+        boards = [cells]
+
+        # Поле с запасом: корабль за период уходит не дальше чем на период
+        margin = max_period + 2
+        engine = default_engine(self.rule)
+        board = np.zeros((cells.shape[0] + 2 * margin, cells.shape[1] + 2 * margin), dtype=np.bool_)
+        board[margin:margin + cells.shape[0], margin:margin + cells.shape[1]] = cells
+        src, dst = engine.pack(board), engine.pack(board)
+        for _ in range(max_period):
+            engine.step(src, dst)
+            src, dst = dst, src
+            board = np.array(engine.unpack(src))
+            key = canonical_key(board, self.rule)
+            if key == first:
+                break
+            phases.append(key)
+            boards.append(board)
+        else:
+            phases, boards = [first], [cells]
+
+        for key in phases:
+            self._names.setdefault(key, name)
+        for board in boards:
+            self._split(board)
+        self._oriented.clear()
+
+    # Запомнить части фазы cells, если она распадается на несколько компонент
+    def _split(self, cells):
+        cells = cells[None]
+        b, r, c, component, count = _components(cells, wrap=False)
+        if count < 2:
+            return
+        for k in range(count):
+            rows, cols = r[component == k], c[component == k]
+            part = np.zeros((rows.max() - rows.min() + 1, cols.max() - cols.min() + 1), dtype=np.bool_)
+            part[rows - rows.min(), cols - cols.min()] = True
+            self._fragments.add(canonical_key(part, self.rule))
+        reach = 2
+        while _components(cells, wrap=False, reach=reach)[4] > 1:
+            reach += 1
+        self._reach = max(self._reach, reach)
+
+    # Имя объекта (компонента cells -- матрица bool) или None
+    def name(self, cells):
+        return self._names.get(canonical_key(np.asarray(cells, dtype=np.bool_), self.rule))
+
+    # Каталог из файлов каталога path: имя объекта -- имя файла
+    # Файлы -- как у GameOfLifeMaker.fromfile (.txt, .rle, .lif, .life, .cells)
+    # ValueError, если каталога нет или из него не прочитан ни один узор
+    @classmethod
+    def from_directory(cls, path=PATTERNS, rule=CONWAY, max_period=MAX_PERIOD):
+        if not os.path.isdir(path):
+            raise ValueError(f"Каталог узоров {path} не найден")
+        catalogue = cls(rule)
+        for file in sorted(glob.glob(os.path.join(path, "*"))):
+            name, extension = os.path.splitext(os.path.basename(file))
+            try:
+                if extension.lower() == ".txt":
+                    cells = GameOfLifeMaker.fromtxt(file).state
+                else:
+                    cells = read_pattern(file).cells
+            except Exception as e:
+                print(f"Узор {file} не прочитан: {e}")
+                continue
+            catalogue.add(name, cells, max_period)
+        if len(catalogue) == 0:
+            raise ValueError(f"В каталоге {path} нет узоров")
+        return catalogue
+
+    # Имена и канонические ключи компонент по их отпечаткам без поворотов;
+    # make(k) строит матрицу k-й компоненты, если её отпечатка ещё нет в кеше
+    def _lookup(self, hashes, make):
+        if len(self._oriented) > MAX_ORIENTED:
+            self._oriented.clear()
+        found = []
+        for (k, h) in enumerate(hashes):
+            item = self._oriented.get(h)
+            if item is None:
+                cells = make(k)
+                key = canonical_key(cells, self.rule)
+                name = self._names.get(key) or f"unknown_{int(cells.sum())}_{key.hex()[:8]}"
+                item = self._oriented[h] = (name, key)
+            found.append(item)
+        return found
+
+
+# Компоненты стопки полей stack (B x N x M) и их имена по каталогу
+# Возвращает поле каждой компоненты, (имя, канонический ключ) каждой
+# компоненты и номер компоненты каждой живой клетки (клетки -- в порядке
+# np.nonzero(stack))
+def _identify(stack, catalogue, wrap, reach=1):
+    B, N, M = stack.shape
+    b, r, c, component, count = _components(stack, wrap, reach)
+    if count == 0:
+        return b, [], component
+
+    # Клетки по компонентам
+    order = np.argsort(component, kind="stable")
+    b, r, c = b[order], r[order], c[order]
+    starts = np.flatnonzero(np.r_[True, component[order][1:] != component[order][:-1]])
+    sizes = np.diff(np.r_[starts, b.size])
+    owner = np.repeat(np.arange(count), sizes)
+
+    # На торе компонента может переходить через край: тогда её клетки
+    # сдвигаются так, чтобы край пришёлся на reach свободных от неё строк
+    # (столбцов) подряд -- через них компонента не проходит
+    if wrap:
+        for (axis, size) in ((r, N), (c, M)):
+            low, high = np.minimum.reduceat(axis, starts), np.maximum.reduceat(axis, starts)
+            for k in np.flatnonzero((low < reach) & (high >= size - reach)):
+                part = slice(starts[k], starts[k] + sizes[k])
+                free = np.bincount(axis[part], minlength=size) == 0
+                gap = free.copy()
+                for j in range(1, reach):
+                    gap &= np.roll(free, j)
+                gap = np.flatnonzero(gap)
+                if gap.size:
+                    axis[part] = (axis[part] - gap[-1] - 1) % size
+
+    top, left = np.minimum.reduceat(r, starts), np.minimum.reduceat(c, starts)
+    height = np.maximum.reduceat(r, starts) - top + 1
+    width = np.maximum.reduceat(c, starts) - left + 1
+    dr, dc = r - top[owner], c - left[owner]
+
+    # Отпечаток компоненты без поворотов: размеры и сумма перемешанных
+    # номеров клеток внутри её прямоугольника
+    code = dr.astype(np.uint64) << np.uint64(32) | dc.astype(np.uint64)
+    hashes = np.add.reduceat(_mix(code), starts)
+    hashes = hashes ^ _mix(height.astype(np.uint64) << np.uint64(32) | width.astype(np.uint64))
+    unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+
+    def make(k):
+        j = first[k]
+        cells = np.zeros((height[j], width[j]), dtype=np.bool_)
+        part = slice(starts[j], starts[j] + sizes[j])
+        cells[dr[part], dc[part]] = True
+        return cells
+
+    found = catalogue._lookup(unique.tolist(), make)
+    return b[starts], [found[k] for k in inverse.ravel().tolist()], component
+
+
+# Перепись поля cells (матрица bool) или стопки полей (B x N x M)
+# Для поля -- Counter имя -> число объектов, для стопки -- список Counter
+# wrap -- поле тор (как у GameOfLife), иначе края поля -- его границы
+def census(cells, catalogue, wrap=True):
+    alive = np.asarray(cells) != 0
+    stack = alive if alive.ndim == 3 else alive[None]
+    counts = [Counter() for _ in range(stack.shape[0])]
+    boards, found, component = _identify(stack, catalogue, wrap)
+
+    # Части распавшихся фаз: группы соседних частей размечаются ещё раз,
+    # и группа из нескольких частей, которая есть в каталоге, заменяет их
+    merged = np.zeros(len(found), dtype=np.bool_)
+    fragment = np.array([key in catalogue._fragments for (_, key) in found], dtype=np.bool_)
+    if fragment.sum() > 1:
+        b, r, c = np.nonzero(stack)
+        part = fragment[component]
+        parts = np.zeros(stack.shape, dtype=np.bool_)
+        parts[b[part], r[part], c[part]] = True
+        group_boards, groups, group = _identify(parts, catalogue, wrap, catalogue._reach)
+        # Номер группы -> номера её частей
+        members = np.unique(np.stack([group, component[part]]), axis=1)
+        sizes = np.bincount(members[0], minlength=len(groups))
+        for g in np.flatnonzero(sizes > 1).tolist():
+            (name, key) = groups[g]
+            if key in catalogue._names:
+                merged[members[1][members[0] == g]] = True
+                counts[group_boards[g]][name] += 1
+
+    for (board, (name, _), done) in zip(boards.tolist(), found, merged.tolist()):
+        if not done:
+            counts[board][name] += 1
+    return counts if alive.ndim == 3 else counts[0]
+
+
+# Перепись текущего поля игры (GameOfLife); на неограниченной плоскости --
+# по границам узора
+def game_census(game, catalogue):
+    if game.is_unbounded():
+        return census(game.live_region()[0], catalogue, wrap=False)
+    return census(game.state, catalogue, wrap=True)
@@ -0,0 +1,185 @@
+import os
+import pickle
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from engine import make_engine
+from model import GameOfLife
+from rules import parse_rule
+
+
+# Контрольные точки долгих прогонов
+# Checkpointer сам решает, когда сохранить игру: каждые every поколений
+# и/или каждые seconds секунд. После каждого шага цикл игры вызывает
+# after_step(); снимок (GameOfLife.snapshot) делается тут же, в потоке шагов:
+# это копии упакованных полей (для поля из bool -- бит на клетку), отпечатков
+# и истории, без прохода по объектам клеток. Сжатие и запись на диск идут
+# в фоновом потоке, шаги их не ждут. Если прошлая точка ещё пишется,
+# очередная пропускается -- записи не копятся в памяти.
+#
+# Запись атомарна: файл пишется под временным именем, сбрасывается на диск
+# (fsync) и только потом переименовывается в checkpoint_<поколение>.gol.
+# Оборванная запись оставляет лишь временный файл, а прошлые точки целы.
+# Хранятся keep последних точек.
+#
+# resume(directory) восстанавливает игру из последней целой точки
+# (испорченные пропускаются) так, что дальше она идёт бит в бит так же,
+# как шла бы без остановки: те же поля, поколение, признаки завершения
+# и периодичности, отпечатки для поиска периода, история и статистика.
+#
+# Пример
+#   checkpointer = Checkpointer(game, "runs/big/checkpoints", every=10000, seconds=600)
+#   while ...:
+#       game.next()
+#       checkpointer.after_step()
+#   checkpointer.close()                 # дождаться последней записи
+#   ...
+#   game = resume("runs/big/checkpoints")
+#
+# Файлы читаются pickle: открывайте только свои контрольные точки.
+# Поле в файлах (engine.MappedEngine) в контрольных точках не нуждается:
+# оно сохраняется после каждого шага (GameOfLifeMaker.open_mapped).
+
+MAGIC = b"GOLC"
+VERSION = 1
+
+_NAME = re.compile(r"^checkpoint_(\d+)\.gol$")
+
+
+class Checkpointer:
+    def __init__(self, game, directory, every=None, seconds=None, keep=3):
+        if keep < 1:
+            raise ValueError(f"Хранится хотя бы одна контрольная точка, а не {keep}")
+        self.game = game
+        self.directory = directory
+        self.every = every
+        self.seconds = seconds
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._pending = None
+        self._last_time = time.monotonic()
+        self._last_age = game.age
+        # Поколение последней записанной точки и ошибка последнего снимка или записи
+        self.saved_age = None
+        self.error = None
+
+    # Пора ли сохранять игру после шага
+    def is_due(self):
+        age = self.game.age
+        if age == self._last_age:
+            return False
+        if self.every and age - self._last_age >= self.every:
+            return True
+        return bool(self.seconds) and time.monotonic() - self._last_time >= self.seconds
+
+    # Вызывается после каждого шага; True -- точка начата
+    def after_step(self):
+        if not self.is_due():
+            return False
+        if self._pending is not None and not self._pending.done():
+            return False
+        return self.save()
+
+    # Сохранить игру сейчас (снимок -- в этом потоке, запись -- в фоновом)
+    # False -- снимок не сделан (ошибка -- в error)
+    def save(self):
+        # Следующая попытка -- через every поколений или seconds секунд,
+        # даже если эта не удалась
+        self._last_age = self.game.age
+        self._last_time = time.monotonic()
+        try:
+            snapshot = self.game.snapshot()
+        except Exception as e:
+            self.error = e
+            print(f"Контрольная точка поколения {self.game.age} не сделана: {e}")
+            return False
+        self._pending = self._writer.submit(self._write, snapshot)
+        return True
+
+    # Дождаться записи и остановить фоновый поток
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+    def _write(self, snapshot):
+        try:
+            name = f"checkpoint_{snapshot['age']:012d}.gol"
+            write_atomic(os.path.join(self.directory, name), dumps(snapshot))
+            self.saved_age = snapshot["age"]
+            self.error = None
+            self._prune()
+        except Exception as e:
+            self.error = e
+            print(f"Контрольная точка поколения {snapshot['age']} не записана: {e}")
+
+    def _prune(self):
+        for (_, path) in checkpoints(self.directory)[:-self.keep]:
+            os.remove(path)
+
+
+# Снимок в байтах: заголовок, затем сжатый pickle
+def dumps(snapshot):
+    data = zlib.compress(pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    return MAGIC + bytes([VERSION]) + data
+
+
+def loads(blob):
+    if blob[:4] != MAGIC or blob[4] != VERSION:
+        raise ValueError(f"Неизвестный формат контрольной точки: {bytes(blob[:5])!r}")
+    return pickle.loads(zlib.decompress(blob[5:]))
+
+
+# Запись файла целиком или никак: временный файл, fsync, переименование
+def write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as io:
+        io.write(data)
+        io.flush()
+        os.fsync(io.fileno())
+    os.replace(tmp, path)
+    # Переименование тоже должно дойти до диска (на Windows каталог не открыть)
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Контрольные точки каталога: пары (поколение, путь) по возрастанию поколений
+def checkpoints(directory):
+    found = []
+    for name in os.listdir(directory):
+        match = _NAME.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+# Игра из снимка: движок того же типа и правила
+def from_snapshot(snapshot):
+    rule = parse_rule(snapshot["rule"])
+    engine = make_engine(snapshot["engine"], rule)
+    game = GameOfLife(np.zeros(tuple(snapshot["shape"]), dtype=np.bool_), engine)
+    game.load_snapshot(snapshot)
+    return game
+
+
+# Игра из последней целой контрольной точки каталога или None
+def resume(directory):
+    for (age, path) in reversed(checkpoints(directory)):
+        try:
+            with open(path, "rb") as io:
+                return from_snapshot(loads(io.read()))
+        except Exception as e:
+            print(f"Контрольная точка {path} не читается: {e}")
+    return None
@@ -0,0 +1,91 @@
+import hashlib
+from collections import OrderedDict
+
+
+# Поиск периодических конфигураций
+# Каждое поколение запоминается отпечатком (хеш упакованного поля) в словаре
+# отпечаток -> номер поколения. Повтор состояния находится одним поиском
+# в словаре, сколько бы поколений назад оно ни было.
+#
+# Память ограничена бюджетом в байтах: при превышении забываются самые
+# давние поколения. Для небольших полей вместе с отпечатком хранится само
+# упакованное поле, и совпадение отпечатков перепроверяется сравнением полей.
+# Для больших полей хранится только отпечаток (128 бит), вероятность
+# ложного совпадения пренебрежимо мала.
+
+# Бюджет памяти по умолчанию, байт
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+# Примерная цена записи словаря без поля: ключ, кортеж, служебные поля
+ENTRY_OVERHEAD = 200
+
+# Поле хранится для перепроверки, если в бюджет помещается столько записей
+MIN_VERIFIED_ENTRIES = 1024
+
+
+def fingerprint(bits):
+    return hashlib.blake2b(bits, digest_size=16).digest()
+
+
+class CycleDetector:
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self._index = OrderedDict()
+        self._used = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def clear(self):
+        self._index.clear()
+        self._used = 0
+
+    # Копия (для контрольной точки): записи неизменяемы, копируется только словарь
+    def copy(self):
+        other = CycleDetector(self.budget)
+        other._index = OrderedDict(self._index)
+        other._used = self._used
+        return other
+
+    # Номер самого позднего поколения с таким же полем или None
+    # bits -- упакованное поле (bytes-like), digest -- его отпечаток
+    def find(self, bits, digest):
+        entry = self._index.get(digest)
+        if entry is None:
+            return None
+        generation, snapshot = entry
+        if snapshot is not None and snapshot != bytes(bits):
+            return None
+        return generation
+
+    # Запоминание поля поколения generation
+    # Повтор уже известного поля обновляет номер поколения
+    def add(self, bits, digest, generation):
+        old = self._index.pop(digest, None)
+        if old is not None:
+            self._used -= self._cost(old[1])
+
+        snapshot = None
+        if (ENTRY_OVERHEAD + len(bits)) * MIN_VERIFIED_ENTRIES <= self.budget:
+            snapshot = bytes(bits)
+        self._index[digest] = (generation, snapshot)
+        self._used += self._cost(snapshot)
+
+        # Вытеснение самых давних поколений
+        while self._used > self.budget and len(self._index) > 1:
+            _, (_, evicted) = self._index.popitem(last=False)
+            self._used -= self._cost(evicted)
+
+    # Забыть поколения начиная с generation (после перемотки назад)
+    # Записи идут по возрастанию поколений, поэтому удаляются с конца
+    def truncate(self, generation):
+        while self._index:
+            digest, (seen, snapshot) = self._index.popitem(last=True)
+            if seen < generation:
+                self._index[digest] = (seen, snapshot)
+                break
+            self._used -= self._cost(snapshot)
+
+    @staticmethod
+    def _cost(snapshot):
+        return ENTRY_OVERHEAD + (len(snapshot) if snapshot is not None else 0)
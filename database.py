@@ -0,0 +1,159 @@
+import ast
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from model import GameOfLifeLoader
+
+
+# База сохранённых игр
+# Таблица data: game_name, age, init_str, curr_str, size
+# Поля init_str и curr_str хранятся как BLOB в формате
+# GameOfLifeLoader.matrix_to_bytes. Версия схемы -- PRAGMA user_version:
+#   0 -- поля текстом из "x" и "." (GameOfLifeLoader.matrix_to_string)
+#   1 -- поля в двоичном формате
+#   2 -- индекс data_list (имя, поколение, размер) для списка игр
+#
+# Приложение работает с базой через один объект Database на файл
+# (Database.shared): одно соединение в режиме WAL на всё время работы,
+# запросы только с параметрами. Список игр читается без полей, страницами;
+# поля загружаются по одной игре. Сохранение идёт в фоновом потоке
+# (save_async), интерфейс его не ждёт.
+#
+# Пример
+#   db = Database.shared()
+#   page = db.list_games(limit=100)                 # [(имя, поколение, размер), ...]
+#   more = db.list_games(after=page[-1][0], limit=100)
+#   age, init_str, curr_str, size = db.load_game(page[0][0])
+#   db.save_async(name, age, initial_state, state)  # Future
+
+DATABASE_PATH = 'utils/database.db'
+SCHEMA_VERSION = 2
+
+# Строк на страницу списка игр
+PAGE_SIZE = 200
+
+
+class Database:
+    # Открытые базы по путям к файлам
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=DATABASE_PATH):
+        self.path = path
+        # Соединение общее для интерфейса и потока сохранения,
+        # запросы к нему идут по очереди
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL: чтение списка не ждёт записи
+            self._con.execute("PRAGMA journal_mode = WAL")
+            self._con.execute("PRAGMA synchronous = NORMAL")
+            migrate(self._con)
+        # Один поток: сохранения выполняются в порядке вызова
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-save")
+
+    # Общий объект для файла path
+    @classmethod
+    def shared(cls, path=DATABASE_PATH):
+        with cls._shared_lock:
+            db = cls._shared.get(path)
+            if db is None:
+                db = cls._shared[path] = cls(path)
+            return db
+
+    # Число сохранённых игр
+    def count_games(self):
+        with self._lock:
+            return self._con.execute("SELECT count(*) FROM data").fetchone()[0]
+
+    # Страница списка игр по имени: после имени after (None -- с начала),
+    # не больше limit строк (имя, поколение, размер)
+    # Поля игр не читаются: запрос берёт всё из индекса data_list
+    def list_games(self, after=None, limit=PAGE_SIZE):
+        with self._lock:
+            if after is None:
+                rows = self._con.execute(
+                    "SELECT game_name, age, size FROM data ORDER BY game_name LIMIT ?",
+                    (limit,))
+            else:
+                rows = self._con.execute(
+                    "SELECT game_name, age, size FROM data WHERE game_name > ? ORDER BY game_name LIMIT ?",
+                    (after, limit))
+            return rows.fetchall()
+
+    # Поколение, поля и размер игры (None -- игры нет)
+    def load_game(self, game_name):
+        with self._lock:
+            return self._con.execute(
+                "SELECT age, init_str, curr_str, size FROM data WHERE game_name = ?",
+                (game_name,)).fetchone()
+
+    # Сохранение игры; поля -- матрицы состояния
+    def save_game(self, game_name, age, initial_state, state):
+        init_str = GameOfLifeLoader.matrix_to_bytes(initial_state)
+        curr_str = GameOfLifeLoader.matrix_to_bytes(state)
+        size = str((state.shape[1], state.shape[0]))
+        with self._lock:
+            with self._con:
+                self._con.execute(
+                    """
+                    INSERT INTO data
+                     (game_name, age, init_str, curr_str, size)
+                     VALUES
+                     (?, ?, ?, ?, ?)
+                    """,
+                    (game_name, age, init_str, curr_str, size))
+
+    # То же в фоновом потоке; матрицы копируются сразу, игру можно менять дальше
+    # Возвращает concurrent.futures.Future (ошибка -- в future.exception())
+    def save_async(self, game_name, age, initial_state, state):
+        return self._saver.submit(self.save_game, game_name, age, initial_state.copy(), state.copy())
+
+    # Дождаться сохранений и закрыть соединение
+    def close(self):
+        self._saver.shutdown(wait=True)
+        with self._lock:
+            self._con.close()
+        with Database._shared_lock:
+            if Database._shared.get(self.path) is self:
+                del Database._shared[self.path]
+
+
+def migrate(con):
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        _migrate_text_to_blob(con)
+    if version < 2:
+        con.execute("CREATE INDEX IF NOT EXISTS data_list ON data (game_name, age, size)")
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    con.commit()
+
+
+# Перевод сохранённых текстом полей в двоичный формат
+# Размер поля, как и при загрузке текста, -- не меньше size;
+# если size не читается, поле берётся по размеру текста
+def _migrate_text_to_blob(con):
+    rows = con.execute("""
+        SELECT game_name, init_str, curr_str, size FROM data
+        WHERE typeof(init_str) = 'text' OR typeof(curr_str) = 'text'
+    """).fetchall()
+
+    for (game_name, init_str, curr_str, size) in rows:
+        try:
+            minsize = ast.literal_eval(size)
+        except (ValueError, SyntaxError):
+            minsize = (0, 0)
+
+        initial_state = GameOfLifeLoader.string_to_matrix(init_str or "", minsize=minsize)
+        state = GameOfLifeLoader.string_to_matrix(curr_str or "", minsize=initial_state.shape)
+        con.execute(
+            """
+            UPDATE data SET init_str = ?, curr_str = ?, size = ?
+            WHERE game_name = ?
+            """,
+            (GameOfLifeLoader.matrix_to_bytes(initial_state),
+             GameOfLifeLoader.matrix_to_bytes(state),
+             str((state.shape[1], state.shape[0])),
+             game_name),
+        )
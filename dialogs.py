@@ -3,7 +3,7 @@ from PyQt5.QtWidgets import QDialog, QDialogButtonBox
 from PyQt5.QtWidgets import QLabel, QLineEdit, QVBoxLayout
 from PyQt5.QtWidgets import QTableWidget
 from PyQt5.QtWidgets import QTableWidgetItem
-import sqlite3
+import database
 from model import GameOfLifeMaker
 
 
@@ -112,16 +112,23 @@ class TableWidget(QTableWidget):
             print(e)
 
 
+# Список игр читается из базы страницами по database.PAGE_SIZE:
+# следующая страница -- когда список прокручен до конца.
+# Поля игры загружаются только при выборе строки.
 class GameLoadDialog(QDialog):
-    def __init__(self, game, title="Загрузка игры из БД"):
+    def __init__(self, game, title="Загрузка игры из БД", db=None):
         try:
             super().__init__()
             self.game = game
+            self.db = db or database.Database.shared()
             self.load_success = False
             self.game_age = None
             self.game_init_str = None
             self.game_curr_str = None
             self.size = None
+            # Имя последней загруженной строки списка; None -- список прочитан весь
+            self._last_name = None
+            self._more = True
             self.resize(300, 300)
             self.setWindowTitle(title)
 
@@ -130,16 +137,8 @@ class GameLoadDialog(QDialog):
 
             buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
 
-            con = sqlite3.connect('utils/database.db')
-            cur = con.cursor()
-            items = cur.execute("""
-            SELECT * FROM data
-            """)
-            k = []
-            for i in items:
-                k.append(i)
             self.tableWidget = TableWidget()
-            self.tableWidget.setRowCount(len(k))
+            self.tableWidget.setRowCount(0)
 
             self.tableWidget.setColumnCount(2)
             self.tableWidget.resize(100, 100)
@@ -147,16 +146,12 @@ class GameLoadDialog(QDialog):
             # Этот сигнал испускается всякий раз, когда ячейка в таблице нажата.
             # Указанная строка и столбец - это ячейка, которая была нажата.
             self.tableWidget.cellPressed[int, int].connect(self.clickedRowColumn)
+            self.tableWidget.verticalScrollBar().valueChanged.connect(self._scrolled)
 
-            for i in range(len(k)):
-                for j in range(2):
-                    item = QTableWidgetItem(str(k[i][j]))
-                    item.setTextAlignment(QtCore.Qt.AlignHCenter)
-                    self.tableWidget.setItem(i, j, item)
+            self._load_page()
 
             layout.addWidget(self.tableWidget)
             layout.addWidget(buttons)
-            con.close()
 
             buttons.accepted.connect(self.accept)
             # buttons.accepted.connect(self._load_game)
@@ -164,29 +159,47 @@ class GameLoadDialog(QDialog):
         except Exception as e:
             print(e)
 
+    # Следующая страница списка игр
+    def _load_page(self):
+        try:
+            if not self._more:
+                return None
+            rows = self.db.list_games(after=self._last_name)
+            self._more = len(rows) == database.PAGE_SIZE
+            if not rows:
+                return None
+            self._last_name = rows[-1][0]
+
+            start = self.tableWidget.rowCount()
+            self.tableWidget.setRowCount(start + len(rows))
+            for (i, row) in enumerate(rows, start):
+                for j in range(2):
+                    item = QTableWidgetItem(str(row[j]))
+                    item.setTextAlignment(QtCore.Qt.AlignHCenter)
+                    self.tableWidget.setItem(i, j, item)
+        except Exception as e:
+            print(e)
+
+    def _scrolled(self, value):
+        if value >= self.tableWidget.verticalScrollBar().maximum():
+            self._load_page()
+
     def clickedRowColumn(self, r, c):
         try:
-            con = sqlite3.connect('utils/database.db')
-            cur = con.cursor()
-            items = cur.execute(f"""SELECT * FROM 'data'
-             WHERE game_name = '{self.tableWidget.item(r, 0).text()}'
-                    """)
-            for i in items:
-                k = i
-            print(k)
+            k = self.db.load_game(self.tableWidget.item(r, 0).text())
+            if k is None:
+                return None
             self.load_success = True
-            self.game_age = k[1]
-            self.game_init_str = k[2]
-            self.game_curr_str = k[3]
-            self.size = k[4]
+            self.game_age = k[0]
+            self.game_init_str = k[1]
+            self.game_curr_str = k[2]
+            self.size = k[3]
             #GameOfLifeMaker.update_from_database(
             #                                     self.game,
-            #                                     age=k[1],
-            #                                    init_str=k[2],
-            #                                     curr_str=k[3]
+            #                                     age=k[0],
+            #                                    init_str=k[1],
+            #                                     curr_str=k[2]
             #                                     )
-
-            con.close()
             return k
         except Exception as e:
             print(e)
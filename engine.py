@@ -0,0 +1,1304 @@
+import json
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rules import ALIVE, CONWAY, DEAD, MOORE, parse_rule
+
+
+# Движки вычисления следующего поколения
+# Движок получает два буфера одинакового размера:
+#   src -- текущее поколение (только чтение)
+#   dst -- сюда записывается следующее поколение
+# Поле -- тор: клетки на краях соседствуют с клетками противоположного края
+# (кроме SparseEngine: у него поле -- неограниченная плоскость)
+#
+# Правило (rules.Rule, по умолчанию B3/S23) передаётся движку при создании;
+# supports(rule) -- умеет ли движок его считать.
+#
+# Кроме шага движок задаёт представление поля в памяти (буфер):
+#   pack(matrix)        -- буфер из матрицы bool (всегда копия)
+#   unpack(buf)         -- матрица bool (живые клетки) для отображения и сохранения
+#   unpack_states(buf)  -- матрица состояний клеток (для правил Generations
+#                          uint8: 0 -- мёртвая, 1 -- живая, 2.. -- угасающие)
+#   packed_bits(buf)    -- поле в виде байтов (для отпечатков и истории)
+#   from_packed_bits(bits, shape) -- буфер из packed_bits (копия)
+# и операции над буферами, не требующие распаковки
+#
+# step(src, dst, stats=True) возвращает ещё и сводку шага (StepStats):
+# население, рождения, смерти и границы живых клеток dst. Движок считает
+# её внутри шага по данным, которые у него уже под рукой: полоса, пока она
+# в кеше (ParallelEngine -- в потоке полосы), слова по 64 клетки
+# (PackedEngine), только пересчитанные плитки (TiledEngine, SparseEngine).
+
+
+# Сводка шага
+# population -- живых клеток в новом поколении, births и deaths -- клеток,
+# ставших живыми и переставших быть живыми (для правил Generations живая --
+# состояние 1), bbox -- границы живых клеток (строки i0..i1, столбцы j0..j1,
+# как в worker.changed_cells; на неограниченной плоскости -- координаты
+# плоскости) или None, если живых нет
+class StepStats:
+    __slots__ = ("population", "births", "deaths", "bbox")
+
+    def __init__(self, population=0, births=0, deaths=0, bbox=None):
+        self.population = population
+        self.births = births
+        self.deaths = deaths
+        self.bbox = bbox
+
+    # Сводка по частям поля (полосам, плиткам)
+    @classmethod
+    def merge(cls, parts):
+        total = cls()
+        for part in parts:
+            total.population += part.population
+            total.births += part.births
+            total.deaths += part.deaths
+            total.bbox = _bbox_union(total.bbox, part.bbox)
+        return total
+
+    def __repr__(self):
+        return (f"StepStats(population={self.population}, births={self.births}, "
+                f"deaths={self.deaths}, bbox={self.bbox})")
+
+
+def _bbox_union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+# Границы живых клеток матрицы, сдвинутые на top, left
+def _bbox(alive, top=0, left=0):
+    rows = np.flatnonzero(alive.any(axis=1))
+    if rows.size == 0:
+        return None
+    i0, i1 = int(rows[0]), int(rows[-1]) + 1
+    cols = np.flatnonzero(alive[i0:i1].any(axis=0))
+    return top + i0, top + i1, left + int(cols[0]), left + int(cols[-1]) + 1
+
+
+# Сводка по живым клеткам до и после шага (матрицы bool одной формы)
+# mask -- рабочий буфер той же формы; строки сдвигаются на top
+# Рождения и смерти -- из числа изменившихся клеток и разности населений:
+# один проход сравнения вместо двух
+def _stats(before, after, mask, top=0):
+    np.not_equal(after, before, out=mask)
+    changed = int(np.count_nonzero(mask))
+    population = int(np.count_nonzero(after))
+    grown = population - int(np.count_nonzero(before))
+    return StepStats(population, (changed + grown) // 2, (changed - grown) // 2, _bbox(after, top))
+
+
+# Поле хранится как есть: байт на клетку
+# Для правил с двумя состояниями -- матрица bool, unpack возвращает сам буфер,
+# без копирования; для правил Generations -- номера состояний в uint8
+class DenseStorage:
+    def __init__(self, rule=CONWAY):
+        self.rule = rule
+        self.dtype = np.bool_ if rule.states == 2 else np.uint8
+
+    @classmethod
+    def supports(cls, rule):
+        return True
+
+    def pack(self, matrix):
+        return np.array(matrix, dtype=self.dtype, order="C")
+
+    def unpack(self, buf):
+        if self.dtype is np.bool_:
+            return buf
+        return buf == 1
+
+    def unpack_states(self, buf):
+        return buf
+
+    def zeros(self, shape):
+        return np.zeros(shape, dtype=self.dtype)
+
+    def copy(self, buf):
+        return buf.copy()
+
+    def shape(self, buf):
+        return buf.shape
+
+    def get(self, buf, i, j):
+        return bool(buf[i, j] == 1)
+
+    def set(self, buf, i, j, value):
+        buf[i, j] = value
+
+    def clear(self, buf):
+        buf[:, :] = 0
+
+    def is_empty(self, buf):
+        return not buf.any()
+
+    def equal(self, a, b):
+        return np.array_equal(a, b)
+
+    # Поле, упакованное по 8 клеток в байт (одномерный массив uint8)
+    # Для правил Generations -- сами состояния, байт на клетку
+    def packed_bits(self, buf):
+        if self.dtype is np.bool_:
+            return np.packbits(buf)
+        return buf.reshape(-1)
+
+    def from_packed_bits(self, bits, shape):
+        if self.dtype is np.bool_:
+            return np.unpackbits(bits, count=shape[0] * shape[1]).reshape(shape).view(np.bool_)
+        return np.array(bits, dtype=np.uint8).reshape(shape)
+
+
+# Смещения соседей клетки (без самой клетки)
+def _neighbour_offsets(rule):
+    r = rule.radius
+    return [(di, dj)
+            for di in range(-r, r + 1) for dj in range(-r, r + 1)
+            if (di or dj) and (rule.neighbourhood == MOORE or abs(di) + abs(dj) <= r)]
+
+
+# Эталонный движок: двойной цикл по клеткам
+# Медленный, оставлен для сверки результатов других движков
+class LoopEngine(DenseStorage):
+    name = "loop"
+
+    def step(self, src, dst, stats=False):
+        # Соседи -- клетки на смещениях из окрестности правила, для B3/S23 (компас)
+        # nw nn ne
+        # ww    ee
+        # sw ss se
+        # Следующее состояние -- по таблице правила: table[состояние, живых соседей]
+        N, M = src.shape
+        table = self.rule.table
+        offsets = _neighbour_offsets(self.rule)
+        for i in range(N):
+            for j in range(M):
+                live_neighbours = sum(
+                    int(src[(i + di) % N, (j + dj) % M] == 1) for (di, dj) in offsets
+                )
+                dst[i, j] = table[int(src[i, j]), live_neighbours]
+        if stats:
+            return _stats(src == 1, dst == 1, np.empty(src.shape, dtype=np.bool_))
+
+
+# Рабочие буферы для вычисления полосы из h строк поля ширины M
+class _StripScratch:
+    def __init__(self, h, M, rule=CONWAY):
+        r = rule.radius
+        self.padded = np.zeros((h + 2 * r, M + 2 * r), dtype=np.uint8)  # живые клетки полосы с рамкой
+        self.count = np.zeros((h, M), dtype=rule.count_dtype)           # число живых соседей
+        self.mask = np.zeros((h, M), dtype=np.bool_)                    # промежуточная маска правила
+        self.diff = np.zeros((h, M), dtype=rule.count_dtype)            # для проверки отрезков числа соседей
+        if rule.states > 2:
+            self.alive = np.zeros((h, M), dtype=np.bool_)
+            self.dead = np.zeros((h, M), dtype=np.bool_)
+            self.born = np.zeros((h, M), dtype=np.bool_)
+
+
+# Живые клетки строк src в строки рамки p (байт 0 или 1)
+def _alive_into(p, src):
+    if src.dtype == np.bool_:
+        p[...] = src
+    else:
+        np.equal(src, 1, out=p)
+
+
+# Применение правила к числу соседей (см. rules.py, Rule.terms)
+# count -- числа соседей, alive -- маска живых клеток,
+# dead -- маска мёртвых (None -- все неживые, как при двух состояниях),
+# out -- результат: клетка живая в следующем поколении,
+# t, d -- рабочие буферы формы count: bool и типа count
+def _apply_terms(rule, count, alive, dead, out, t, d):
+    first = True
+    for (lo, hi, cells) in rule.terms:
+        m = out if first else t
+        if lo == hi:
+            np.equal(count, lo, out=m)
+        elif hi == rule.max_count:
+            np.greater_equal(count, lo, out=m)
+        elif lo == 0:
+            np.less_equal(count, hi, out=m)
+        else:
+            # Беззнаковое вычитание: числа меньше lo становятся большими
+            np.subtract(count, lo, out=d)
+            np.less_equal(d, hi - lo, out=m)
+
+        if cells == ALIVE:
+            np.logical_and(m, alive, out=m)
+        elif cells == DEAD:
+            if dead is None:
+                np.greater(m, alive, out=m)  # m и не alive
+            else:
+                np.logical_and(m, dead, out=m)
+
+        if not first:
+            np.logical_or(out, m, out=out)
+        first = False
+
+    if first:
+        out[...] = False
+
+
+# Число живых соседей по рамке p для окрестности радиуса больше 1
+# (или окрестности фон Неймана): суммы окон строк по префиксным суммам,
+# затем сумма по строкам окрестности
+def _count_neighbours(p, rule, count):
+    r = rule.radius
+    h, M = count.shape
+    dtype = count.dtype
+    # Переполнение не мешает: разности префиксных сумм считаются по модулю
+    prefix = np.zeros((p.shape[0], p.shape[1] + 1), dtype=dtype)
+    np.cumsum(p, axis=1, dtype=dtype, out=prefix[:, 1:])
+
+    # Суммы по строкам рамки в окне j - w .. j + w
+    def row_sums(w):
+        return prefix[:, r + w + 1:r + w + 1 + M] - prefix[:, r - w:r - w + M]
+
+    if rule.neighbourhood == MOORE:
+        rows = np.zeros((h + 2 * r + 1, M), dtype=dtype)
+        np.cumsum(row_sums(r), axis=0, dtype=dtype, out=rows[1:])
+        np.subtract(rows[2 * r + 1:], rows[:h], out=count)
+    else:
+        count[...] = 0
+        for di in range(-r, r + 1):
+            count += row_sums(r - abs(di))[r + di:r + di + h]
+    # Без самой клетки
+    count -= p[r:-r, r:-r]
+
+
+# Следующее поколение строк r0..r1 - 1 поля src в те же строки dst
+# Строки рамки берутся с учётом склейки тора
+# stats -- вернуть сводку полосы (StepStats), пока полоса ещё в кеше
+def _step_strip(src, dst, r0, r1, scratch, rule=CONWAY, stats=False):
+    N = src.shape[0]
+    r = rule.radius
+    p, count, mask = scratch.padded, scratch.count, scratch.mask
+    cur, out = src[r0:r1], dst[r0:r1]
+    h = r1 - r0
+
+    # Копия полосы в центр рамки, затем склейка краёв тора
+    # Порядок важен: углы рамки берутся из уже заполненных строк
+    _alive_into(p[r:-r, r:-r], cur)
+    for k in range(r):
+        _alive_into(p[k, r:-r], src[(r0 - r + k) % N])
+        _alive_into(p[r + h + k, r:-r], src[(r1 + k) % N])
+    p[:, :r] = p[:, -2 * r:-r]
+    p[:, -r:] = p[:, r:2 * r]
+
+    if r == 1 and rule.neighbourhood == MOORE:
+        # Сумма восьми соседей
+        np.add(p[:-2, :-2], p[:-2, 1:-1], out=count)
+        np.add(count, p[:-2, 2:], out=count)
+        np.add(count, p[1:-1, :-2], out=count)
+        np.add(count, p[1:-1, 2:], out=count)
+        np.add(count, p[2:, :-2], out=count)
+        np.add(count, p[2:, 1:-1], out=count)
+        np.add(count, p[2:, 2:], out=count)
+    else:
+        _count_neighbours(p, rule, count)
+
+    if rule.states == 2:
+        # Рождение или выживание; для B3/S23: ровно 3 соседа,
+        # либо живая клетка и ровно 2 соседа
+        _apply_terms(rule, count, cur, None, out, mask, scratch.diff)
+        if stats:
+            return _stats(cur, out, mask, r0)
+        return None
+
+    # Generations: непустые клетки угасают: 1 -> 2 -> ... -> C - 1 -> 0,
+    # затем выжившие возвращаются из 2 в 1, а родившиеся -- из 0 в 1
+    # (арифметикой по маскам: присваивание по маске в numpy много медленнее)
+    alive = np.equal(cur, 1, out=scratch.alive)
+    dead = np.equal(cur, 0, out=scratch.dead)
+    born = scratch.born
+    _apply_terms(rule, count, alive, dead, born, mask, scratch.diff)
+
+    np.logical_not(dead, out=mask)
+    np.add(cur, mask, out=out)
+    np.not_equal(out, rule.states, out=mask)
+    np.multiply(out, mask, out=out)
+    np.logical_and(born, alive, out=mask)
+    np.subtract(out, mask, out=out)
+    np.logical_and(born, dead, out=mask)
+    np.add(out, mask, out=out)
+    if stats:
+        # born больше не нужна: теперь это живые клетки нового поколения
+        return _stats(alive, np.equal(out, 1, out=born), mask, r0)
+    return None
+
+
+# Векторизованный движок на numpy
+# Число соседей считается сложением восьми сдвинутых срезов поля в uint8,
+# правило применяется операциями над целыми массивами.
+# Рабочие буферы создаются один раз на размер поля и переиспользуются,
+# поэтому шаг не выделяет память.
+class NumpyEngine(DenseStorage):
+    name = "numpy"
+
+    def __init__(self, rule=CONWAY):
+        super().__init__(rule)
+        self._shape = None
+        self._scratch = None
+
+    def _prepare(self, shape):
+        if self._shape == shape:
+            return None
+        N, M = shape
+        self._shape = shape
+        self._scratch = _StripScratch(N, M, self.rule)
+
+    def step(self, src, dst, stats=False):
+        self._prepare(src.shape)
+        return _step_strip(src, dst, 0, src.shape[0], self._scratch, self.rule, stats)
+
+
+# Многопоточный движок
+# Поле делится на горизонтальные полосы, по одной на поток; каждая полоса
+# считается тем же ядром, что и в NumpyEngine, со своей рамкой из соседних
+# строк. Операции numpy над большими массивами отпускают GIL, поэтому потоки
+# работают параллельно, а буферы state/prev_state общие для всех потоков:
+# их не нужно ни копировать, ни передавать в другие процессы.
+#
+# Ускорение:
+#   - поля меньше MIN_STRIP_CELLS клеток на поток считаются одной полосой,
+#     накладные расходы на потоки там больше выигрыша
+#   - на больших полях ускорение растёт с числом потоков до числа ядер
+#     и упирается в пропускную способность памяти: ядро делает около
+#     12 проходов по полосе за шаг, так что выигрыш тем больше, чем лучше
+#     полоса помещается в кеш ядра
+#   - больше потоков, чем ядер, не ускоряет, а добавляет переключения
+class ParallelEngine(NumpyEngine):
+    name = "parallel"
+
+    MIN_STRIP_CELLS = 1 << 16
+
+    def __init__(self, workers=None, rule=CONWAY):
+        super().__init__(rule)
+        self.workers = workers or os.cpu_count() or 1
+        self._strips = []
+        self._pool = None
+
+    def _prepare(self, shape):
+        if self._shape == shape:
+            return None
+        N, M = shape
+        self._shape = shape
+        count = max(1, min(self.workers, N, N * M // self.MIN_STRIP_CELLS))
+        bounds = [N * k // count for k in range(count + 1)]
+        self._strips = [(r0, r1, _StripScratch(r1 - r0, M, self.rule)) for (r0, r1) in zip(bounds[:-1], bounds[1:])]
+        if count > 1 and self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    def step(self, src, dst, stats=False):
+        self._prepare(src.shape)
+        if len(self._strips) == 1:
+            r0, r1, scratch = self._strips[0]
+            return _step_strip(src, dst, r0, r1, scratch, self.rule, stats)
+
+        futures = [self._pool.submit(_step_strip, src, dst, r0, r1, scratch, self.rule, stats)
+                   for (r0, r1, scratch) in self._strips]
+        parts = [future.result() for future in futures]
+        if stats:
+            return StepStats.merge(parts)
+        return None
+
+    # Остановка потоков
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+# Упакованное поле: 64 клетки в одном слове uint64
+# Клетка (i, j) -- бит j % 64 слова words[i, j // 64]
+# Биты за правым краем последнего слова всегда нулевые,
+# поэтому буферы можно сравнивать целиком
+class PackedBoard:
+    __slots__ = ("words", "shape")
+
+    def __init__(self, words, shape):
+        self.words = words
+        self.shape = shape
+
+
+_ONE = np.uint64(1)
+_SIGN = np.uint64(63)
+
+# Число единичных битов в массиве слов
+# В numpy до 2.0 нет bitwise_count: биты считаются по байтам таблицей
+if hasattr(np, "bitwise_count"):
+    def _popcount(words):
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+else:
+    _BYTE_BITS = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return int(_BYTE_BITS[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+# Движок на упакованном поле (SWAR)
+# Восемь соседей складываются побитовыми полусумматорами и сумматорами
+# сразу для 64 клеток слова. Памяти в 8 раз меньше, чем у матрицы bool.
+# Правила -- только с двумя состояниями и восемью соседями (B/S).
+# Для B3/S23 сумматоры сразу дают ответ "2 или 3 соседа"; для других
+# правил число соседей собирается в четыре разряда и правило проверяется
+# сравнением разрядов с каждым числом соседей из rule.terms.
+class PackedEngine:
+    name = "packed"
+
+    def __init__(self, rule=CONWAY):
+        if not self.supports(rule):
+            raise ValueError(f"Движок {self.name} не поддерживает правило {rule}")
+        self.rule = rule
+        self._shape = None
+
+    @classmethod
+    def supports(cls, rule):
+        return rule.is_life_like
+
+    # Представление поля
+
+    def pack(self, matrix):
+        N, M = matrix.shape
+        bits = np.packbits(np.asarray(matrix, dtype=np.bool_), axis=1, bitorder="little")
+        raw = np.zeros((N, 8 * ((M + 63) // 64)), dtype=np.uint8)
+        raw[:, :bits.shape[1]] = bits
+        return PackedBoard(raw.view("<u8"), (N, M))
+
+    def unpack(self, buf):
+        N, M = buf.shape
+        bits = np.unpackbits(buf.words.view(np.uint8), axis=1, count=M, bitorder="little")
+        return bits.view(np.bool_)
+
+    def unpack_states(self, buf):
+        return self.unpack(buf)
+
+    def zeros(self, shape):
+        N, M = shape
+        return PackedBoard(np.zeros((N, (M + 63) // 64), dtype="<u8"), (N, M))
+
+    def copy(self, buf):
+        return PackedBoard(buf.words.copy(), buf.shape)
+
+    def shape(self, buf):
+        return buf.shape
+
+    def get(self, buf, i, j):
+        return bool((buf.words[i, j >> 6] >> np.uint64(j & 63)) & _ONE)
+
+    def set(self, buf, i, j, value):
+        bit = _ONE << np.uint64(j & 63)
+        if value:
+            buf.words[i, j >> 6] |= bit
+        else:
+            buf.words[i, j >> 6] &= ~bit
+
+    def clear(self, buf):
+        buf.words[:, :] = 0
+
+    def is_empty(self, buf):
+        return not buf.words.any()
+
+    def equal(self, a, b):
+        return np.array_equal(a.words, b.words)
+
+    def packed_bits(self, buf):
+        return buf.words.view(np.uint8).reshape(-1)
+
+    def from_packed_bits(self, bits, shape):
+        words = np.array(bits, dtype=np.uint8).view("<u8").reshape(shape[0], -1)
+        return PackedBoard(words, tuple(shape))
+
+    # Шаг
+
+    def _prepare(self, shape):
+        if self._shape == shape:
+            return None
+        N, M = shape
+        W = (M + 63) // 64
+        self._shape = shape
+        self._left, self._right, self._t, self._k, self._q = (
+            np.zeros((N, W), dtype="<u8") for _ in range(5)
+        )
+        self._h1 = np.zeros((N + 2, W), dtype="<u8")
+        self._h2 = np.zeros((N + 2, W), dtype="<u8")
+        if self.rule != CONWAY:
+            # Разряды числа соседей, их инверсии и буферы проверки правила
+            self._planes = [np.zeros((N, W), dtype="<u8") for _ in range(4)]
+            self._inverted = [np.zeros((N, W), dtype="<u8") for _ in range(4)]
+            self._match, self._term = np.zeros((N, W), dtype="<u8"), np.zeros((N, W), dtype="<u8")
+
+        # Номер слова и бита последней клетки строки
+        self._last_word = (M - 1) // 64
+        self._last_bit = np.uint64((M - 1) % 64)
+        self._tail = M % 64 != 0
+        # Маска значащих битов последнего слова
+        self._last_mask = np.uint64((1 << (M % 64)) - 1) if self._tail else ~np.uint64(0)
+
+    def step(self, src, dst, stats=False):
+        self._prepare(src.shape)
+        x = src.words
+        L, R, T, K, Q = self._left, self._right, self._t, self._k, self._q
+        H1, H2 = self._h1, self._h2
+
+        # L -- сосед слева (w), R -- сосед справа (e) для каждого бита
+        # Перенос между словами, затем склейка тора по столбцам
+        np.left_shift(x, _ONE, out=L)
+        np.right_shift(x[:, :-1], _SIGN, out=T[:, 1:])
+        np.right_shift(x[:, -1], _SIGN, out=T[:, 0])
+        np.bitwise_or(L, T, out=L)
+
+        np.right_shift(x, _ONE, out=R)
+        np.left_shift(x[:, 1:], _SIGN, out=T[:, :-1])
+        np.left_shift(x[:, 0], _SIGN, out=T[:, -1])
+        np.bitwise_or(R, T, out=R)
+
+        if self._tail:
+            # Последняя клетка строки не на границе слова, перенос делается вручную
+            L[:, 0] |= (x[:, self._last_word] >> self._last_bit) & _ONE
+            R[:, self._last_word] |= (x[:, 0] & _ONE) << self._last_bit
+
+        # Сумма трёх клеток строки (w, c, e): h1 -- единицы, h2 -- двойки
+        # Сумма двух соседей в своей строке (w, e): T -- единицы, L -- двойки
+        h1, h2 = H1[1:-1], H2[1:-1]
+        np.bitwise_xor(L, R, out=T)
+        np.bitwise_xor(T, x, out=h1)
+        np.bitwise_and(x, T, out=h2)
+        np.bitwise_and(L, R, out=L)
+        np.bitwise_or(h2, L, out=h2)
+
+        # Склейка тора по строкам
+        H1[0], H1[-1] = H1[-2], H1[1]
+        H2[0], H2[-1] = H2[-2], H2[1]
+        u1, d1 = H1[:-2], H1[2:]
+        u2, d2 = H2[:-2], H2[2:]
+
+        # Единицы: T = s1 = u1 + d1 + T, перенос в двойки K
+        np.bitwise_xor(u1, d1, out=R)
+        np.bitwise_and(T, R, out=K)
+        np.bitwise_xor(R, T, out=T)
+        np.bitwise_and(u1, d1, out=R)
+        np.bitwise_or(K, R, out=K)
+
+        if self.rule != CONWAY:
+            self._apply_rule(x, T, K, L, u2, d2, dst.words)
+            dst.words[:, -1] &= self._last_mask
+            return self._step_stats(x, dst.words) if stats else None
+
+        # Двойки: L = q1 = u2 + d2 + L, перенос в четвёрки Q
+        np.bitwise_xor(u2, d2, out=R)
+        np.bitwise_and(L, R, out=Q)
+        np.bitwise_xor(R, L, out=L)
+        np.bitwise_and(u2, d2, out=R)
+        np.bitwise_or(Q, R, out=Q)
+
+        # Число соседей равно 2 или 3, если в разряде двоек ровно одна единица:
+        # q1 + K == 1 и нет переноса Q
+        np.bitwise_xor(L, K, out=L)
+        np.invert(Q, out=Q)
+        np.bitwise_and(L, Q, out=L)
+
+        # 3 соседа (s1 = 1) -- клетка живая, 2 соседа -- если была живой
+        np.bitwise_or(T, x, out=T)
+        np.bitwise_and(L, T, out=dst.words)
+        dst.words[:, -1] &= self._last_mask
+        return self._step_stats(x, dst.words) if stats else None
+
+    # Сводка шага по словам: рождения -- биты y без x, смерти -- x без y
+    # Рабочие буферы шага к этому времени свободны; строки сдвигаются на top
+    def _step_stats(self, x, y, top=0):
+        T, K = self._t[:x.shape[0]], self._k[:x.shape[0]]
+        np.invert(x, out=T)
+        np.bitwise_and(T, y, out=T)
+        np.invert(y, out=K)
+        np.bitwise_and(K, x, out=K)
+        result = StepStats(_popcount(y), _popcount(T), _popcount(K))
+
+        rows = np.flatnonzero(y.any(axis=1))
+        if rows.size:
+            i0, i1 = int(rows[0]), int(rows[-1]) + 1
+            # Столбцы -- по слову, собранному из всех строк (ИЛИ)
+            column = np.bitwise_or.reduce(y[i0:i1], axis=0)
+            words = np.flatnonzero(column)
+            first, last = int(column[words[0]]), int(column[words[-1]])
+            j0 = 64 * int(words[0]) + (first & -first).bit_length() - 1
+            j1 = 64 * int(words[-1]) + last.bit_length()
+            result.bbox = (top + i0, top + i1, j0, j1)
+        return result
+
+    # Произвольное правило B/S
+    # ones -- разряд единиц числа соседей, carry -- перенос из него в двойки,
+    # own2, u2, d2 -- двойки своей строки, верхней и нижней тройки
+    def _apply_rule(self, x, ones, carry, own2, u2, d2, out):
+        s0, s1, s2, s3 = self._planes
+        R, Q = self._right, self._q
+
+        # Двойки: сумма четырёх битов u2 + d2 + own2 + carry (от 0 до 4)
+        # s1 -- её младший разряд, s2 и s3 -- следующие
+        np.bitwise_xor(u2, d2, out=R)
+        np.bitwise_and(u2, d2, out=s3)
+        np.bitwise_xor(own2, carry, out=Q)
+        np.bitwise_and(own2, carry, out=s2)
+        np.bitwise_xor(R, Q, out=s1)
+        np.bitwise_and(R, Q, out=R)
+        np.bitwise_xor(s2, R, out=R)
+        np.bitwise_and(s3, s2, out=Q)
+        np.bitwise_xor(R, s3, out=s2)
+        np.copyto(s3, Q)
+        np.copyto(s0, ones)
+
+        planes = self._planes
+        inverted = self._inverted
+        for (plane, inv) in zip(planes, inverted):
+            np.invert(plane, out=inv)
+
+        # Клетка живая, если число соседей совпало с числом из правила
+        match, term = self._match, self._term
+        out[...] = 0
+        for (lo, hi, cells) in self.rule.terms:
+            term[...] = 0
+            for k in range(lo, hi + 1):
+                np.copyto(match, planes[0] if k & 1 else inverted[0])
+                for b in (1, 2, 3):
+                    np.bitwise_and(match, planes[b] if k >> b & 1 else inverted[b], out=match)
+                np.bitwise_or(term, match, out=term)
+            if cells == ALIVE:
+                np.bitwise_and(term, x, out=term)
+            elif cells == DEAD:
+                np.invert(x, out=match)
+                np.bitwise_and(term, match, out=term)
+            np.bitwise_or(out, term, out=out)
+
+
+# Упакованное поле в файле, отображённом в память (np.memmap)
+# path -- путь к файлу, words -- слова поля прямо в файле
+class MappedBoard(PackedBoard):
+    __slots__ = ("path", "__weakref__")
+
+    def __init__(self, words, shape, path):
+        super().__init__(words, shape)
+        self.path = path
+
+
+# Движок для полей больше оперативной памяти
+# Поле упаковано, как у PackedEngine, но каждый буфер -- файл в каталоге
+# path, отображённый в память: в памяти держатся только страницы, с которыми
+# идёт работа, остальное -- на диске. Шаг идёт блоками по block_rows строк:
+# блок с рамкой из соседних строк (с учётом тора) копируется в память,
+# считается ядром PackedEngine и записывается в буфер нового поколения.
+# Так шаг читает и пишет файлы последовательно, а памяти нужно на два блока.
+#
+# Каталог -- это и сохранение игры: после каждого шага GameOfLife вызывает
+# commit, и в meta.json записываются размер поля, правило, поколение
+# и файлы начального, текущего и предыдущего поколений. Открыв каталог
+# снова (GameOfLifeMaker.open_mapped), игру можно продолжить сразу,
+# без загрузки поля. Данные файлов пишет на диск система; flush --
+# дождаться записи (иначе после сбоя питания поле может не совпасть
+# с meta.json).
+#
+# Буферы, не записанные в meta.json (копии, поля из истории),
+# удаляются вместе с объектом буфера.
+# Правила -- только с двумя состояниями и восемью соседями (B/S).
+class MappedEngine(PackedEngine):
+    name = "mapped"
+    # Поле не распаковывается целиком без необходимости (см. GameOfLife.next)
+    on_disk = True
+
+    META = "meta.json"
+    # Примерный размер блока строк, байт
+    BLOCK_BYTES = 1 << 20
+
+    def __init__(self, path, rule=CONWAY, block_rows=None):
+        super().__init__(rule)
+        self.path = path
+        self.block_rows = block_rows
+        os.makedirs(path, exist_ok=True)
+        # Ядро шага для блока строк; для последнего, более короткого, -- своё
+        self._kernels = {}
+        # Имена файлов из meta.json: их не удалять
+        self._committed = set()
+        self._counter = 0
+
+    # Файлы
+
+    def _new_board(self, shape):
+        N, M = shape
+        while True:
+            name = f"board{self._counter}.bits"
+            self._counter += 1
+            if not os.path.exists(os.path.join(self.path, name)):
+                break
+        return self._map(name, shape, "w+")
+
+    def _map(self, name, shape, mode):
+        N, M = shape
+        path = os.path.join(self.path, name)
+        words = np.memmap(path, dtype="<u8", mode=mode, shape=(N, (M + 63) // 64))
+        board = MappedBoard(words, (N, M), path)
+        weakref.finalize(board, self._discard, name)
+        return board
+
+    def _discard(self, name):
+        if name not in self._committed:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def _rows(self, shape):
+        if self.block_rows:
+            return self.block_rows
+        return max(1, self.BLOCK_BYTES // (8 * ((shape[1] + 63) // 64)))
+
+    # Запись поколения в meta.json (атомарно: через временный файл)
+    def commit(self, initial, state, prev, age):
+        names = [os.path.basename(buf.path) for buf in (initial, state, prev)]
+        meta = {"rows": state.shape[0], "cols": state.shape[1], "rule": str(self.rule), "age": age,
+                "initial": names[0], "state": names[1], "prev": names[2]}
+        self._committed = set(names)
+        path = os.path.join(self.path, self.META)
+        with open(path + ".tmp", "w") as io:
+            json.dump(meta, io)
+        os.replace(path + ".tmp", path)
+
+    # Дождаться записи буферов на диск
+    def flush(self, *bufs):
+        for buf in bufs:
+            buf.words.flush()
+
+    # Сохранённая игра каталога path: движок, буферы и поколение
+    # (None -- в каталоге нет meta.json)
+    @classmethod
+    def open(cls, path, block_rows=None):
+        try:
+            with open(os.path.join(path, cls.META)) as io:
+                meta = json.load(io)
+        except FileNotFoundError:
+            return None
+        engine = cls(path, parse_rule(meta["rule"]), block_rows)
+        shape = (meta["rows"], meta["cols"])
+        engine._committed = {meta["initial"], meta["state"], meta["prev"]}
+        initial, state, prev = (engine._map(meta[key], shape, "r+") for key in ("initial", "state", "prev"))
+        return engine, initial, state, prev, meta["age"]
+
+    # Представление поля
+
+    # Матрица упаковывается блоками строк: подойдёт и объект, у которого
+    # есть shape и срез строк matrix[r0:r1] (поле, не помещающееся в память)
+    def pack(self, matrix):
+        buf = self._new_board(matrix.shape)
+        B = self._rows(matrix.shape)
+        for r0 in range(0, matrix.shape[0], B):
+            block = super().pack(np.asarray(matrix[r0:r0 + B], dtype=np.bool_))
+            # Файл уже в нулях: пустые блоки не пишутся и не занимают места
+            if block.words.any():
+                buf.words[r0:r0 + B] = block.words
+        return buf
+
+    # Новый файл уже заполнен нулями и занимает место на диске
+    # только по мере записи
+    def zeros(self, shape):
+        return self._new_board(tuple(shape))
+
+    def copy(self, buf):
+        out = self._new_board(buf.shape)
+        B = self._rows(buf.shape)
+        for r0 in range(0, buf.shape[0], B):
+            block = buf.words[r0:r0 + B]
+            if block.any():
+                out.words[r0:r0 + B] = block
+        return out
+
+    def clear(self, buf):
+        B = self._rows(buf.shape)
+        for r0 in range(0, buf.shape[0], B):
+            buf.words[r0:r0 + B] = 0
+
+    def from_packed_bits(self, bits, shape):
+        out = self._new_board(tuple(shape))
+        out.words[...] = np.asarray(bits, dtype=np.uint8).view("<u8").reshape(out.words.shape)
+        return out
+
+    # Шаг
+
+    def _kernel(self, h):
+        kernel = self._kernels.get(h)
+        if kernel is None:
+            if len(self._kernels) >= 2:
+                self._kernels.clear()
+            kernel = self._kernels[h] = (PackedEngine(self.rule), super().zeros((h + 2, self._shape[1])),
+                                         super().zeros((h + 2, self._shape[1])))
+        return kernel
+
+    def step(self, src, dst, stats=False):
+        if self._shape != src.shape:
+            self._shape = src.shape
+            self._kernels.clear()
+        N = src.shape[0]
+        B = self._rows(src.shape)
+        x, y = src.words, dst.words
+        parts = []
+        for r0 in range(0, N, B):
+            r1 = min(N, r0 + B)
+            kernel, block, out = self._kernel(r1 - r0)
+            # Блок с рамкой: строки r0 - 1 .. r1 по тору. Ядро склеивает
+            # по тору и строки блока, но это портит только строки рамки
+            block.words[0] = x[(r0 - 1) % N]
+            block.words[1:-1] = x[r0:r1]
+            block.words[-1] = x[r1 % N]
+            kernel.step(block, out)
+            y[r0:r1] = out.words[1:-1]
+            if stats:
+                parts.append(kernel._step_stats(block.words[1:-1], out.words[1:-1], r0))
+        if stats:
+            return StepStats.merge(parts)
+        return None
+
+
+# Следующее поколение внутренней части блока с рамкой в одну клетку
+# p -- матрица uint8 (h + 2) x (w + 2), результат -- матрица bool h x w
+# Можно передать и стопку блоков K x (h + 2) x (w + 2)
+def _step_block(p, rule=CONWAY):
+    count = (p[..., :-2, :-2] + p[..., :-2, 1:-1] + p[..., :-2, 2:]
+             + p[..., 1:-1, :-2] + p[..., 1:-1, 2:]
+             + p[..., 2:, :-2] + p[..., 2:, 1:-1] + p[..., 2:, 2:])
+    out = np.empty(count.shape, dtype=np.bool_)
+    _apply_terms(rule, count, p[..., 1:-1, 1:-1] == 1, None, out,
+                 np.empty_like(out), np.empty_like(count))
+    return out
+
+
+# Движок для разреженных полей
+# Поле делится на плитки tile x tile. Движок помнит, какие плитки изменились
+# на прошлом шаге, и пересчитывает только их и их соседей: плитка, вокруг
+# которой ничего не менялось, на следующем шаге тоже не изменится.
+# Мёртвые и стабильные области не стоят ничего.
+#
+# Те же сведения делают проверки "все клетки мертвы" и "стабильная
+# конфигурация" бесплатными: население и изменения плиток уже известны.
+# Отслеживание работает, пока шаги идут по очереди между одними и теми же
+# двумя буферами; любой другой вызов step пересчитывает поле целиком.
+# Правила -- только с двумя состояниями и восемью соседями (B/S).
+class TiledEngine(NumpyEngine):
+    name = "tiled"
+
+    def __init__(self, tile=64, rule=CONWAY):
+        if not self.supports(rule):
+            raise ValueError(f"Движок {self.name} не поддерживает правило {rule}")
+        super().__init__(rule)
+        self.tile = tile
+        # Буферы (src, dst) последнего шага; None -- сведений о плитках нет
+        self._tracked = None
+        # Изменилась ли плитка на последнем шаге
+        self._changed = None
+        self._any_changed = True
+        # Население плиток dst и всего поля
+        self._tile_population = None
+        self._population = 0
+
+    @classmethod
+    def supports(cls, rule):
+        return rule.is_life_like
+
+    def invalidate(self):
+        self._tracked = None
+
+    def _is_current(self, buf):
+        return self._tracked is not None and buf is self._tracked[1]
+
+    def _is_tracked(self, buf):
+        return self._tracked is not None and (buf is self._tracked[0] or buf is self._tracked[1])
+
+    # Операции над буферами с учётом сведений о плитках
+
+    def set(self, buf, i, j, value):
+        if self._is_current(buf):
+            if bool(buf[i, j]) != bool(value):
+                t = (i // self.tile, j // self.tile)
+                self._tile_population[t] += 1 if value else -1
+                self._population += 1 if value else -1
+                self._changed[t] = True
+                self._any_changed = True
+        elif self._is_tracked(buf):
+            self.invalidate()
+        super().set(buf, i, j, value)
+
+    def clear(self, buf):
+        if self._is_tracked(buf):
+            self.invalidate()
+        super().clear(buf)
+
+    def is_empty(self, buf):
+        if self._is_current(buf):
+            return self._population == 0
+        return super().is_empty(buf)
+
+    def equal(self, a, b):
+        if self._is_tracked(a) and self._is_tracked(b) and a is not b:
+            return not self._any_changed
+        return super().equal(a, b)
+
+    # Шаг
+
+    def step(self, src, dst, stats=False):
+        tracked = self._tracked
+        if tracked is not None and src is tracked[1] and dst is tracked[0]:
+            result = self._step_active(src, dst, stats)
+        else:
+            result = self._step_full(src, dst, stats)
+        self._tracked = (src, dst)
+        return result
+
+    def _step_full(self, src, dst, stats=False):
+        result = super().step(src, dst, stats)
+        N, M = src.shape
+        rows = np.arange(0, N, self.tile)
+        cols = np.arange(0, M, self.tile)
+
+        diff = np.not_equal(src, dst)
+        diff = np.logical_or.reduceat(np.logical_or.reduceat(diff, rows, axis=0), cols, axis=1)
+        population = np.add.reduceat(dst.view(np.uint8), rows, axis=0, dtype=np.int64)
+        population = np.add.reduceat(population, cols, axis=1)
+
+        self._changed = diff
+        self._any_changed = bool(diff.any())
+        self._tile_population = population
+        self._population = int(population.sum())
+        return result
+
+    # Сводка считается только по пересчитанным плиткам,
+    # границы -- по плиткам с живыми клетками
+    def _step_active(self, src, dst, stats=False):
+        N, M = src.shape
+        T = self.tile
+        changed = self._changed
+
+        # Активные плитки: изменившиеся и их соседи (с учётом тора)
+        active = changed.copy()
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                if di or dj:
+                    active |= np.roll(changed, (di, dj), axis=(0, 1))
+
+        new_changed = np.zeros_like(changed)
+        births = deaths = 0
+        for (ti, tj) in np.argwhere(active):
+            r0, c0 = ti * T, tj * T
+            r1, c1 = min(r0 + T, N), min(c0 + T, M)
+
+            if r0 > 0 and r1 < N and c0 > 0 and c1 < M:
+                block = src[r0 - 1:r1 + 1, c0 - 1:c1 + 1]
+            else:
+                block = np.take(src, np.arange(r0 - 1, r1 + 1), axis=0, mode="wrap")
+                block = np.take(block, np.arange(c0 - 1, c1 + 1), axis=1, mode="wrap")
+
+            new = _step_block(block.view(np.uint8), self.rule)
+            dst[r0:r1, c0:c1] = new
+
+            old = src[r0:r1, c0:c1]
+            if not np.array_equal(new, old):
+                new_changed[ti, tj] = True
+                population = int(np.count_nonzero(new))
+                self._population += population - self._tile_population[ti, tj]
+                self._tile_population[ti, tj] = population
+                if stats:
+                    births += int(np.count_nonzero(new > old))
+                    deaths += int(np.count_nonzero(old > new))
+
+        self._changed = new_changed
+        self._any_changed = bool(new_changed.any())
+        if stats:
+            return StepStats(self._population, births, deaths, self._tiles_bbox(dst))
+        return None
+
+    # Границы живых клеток: крайние плитки с живыми клетками,
+    # внутри них -- по клеткам
+    def _tiles_bbox(self, buf):
+        T = self.tile
+        rows = np.flatnonzero(self._tile_population.any(axis=1))
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(self._tile_population.any(axis=0))
+        r0, r1 = int(rows[0]) * T, (int(rows[-1]) + 1) * T
+        c0, c1 = int(cols[0]) * T, (int(cols[-1]) + 1) * T
+        top = _bbox(buf[r0:r0 + T, c0:c1], r0, c0)
+        bottom = _bbox(buf[max(r0, r1 - T):r1, c0:c1], max(r0, r1 - T), c0)
+        left = _bbox(buf[r0:r1, c0:c0 + T], r0, c0)
+        right = _bbox(buf[r0:r1, max(c0, c1 - T):c1], r0, max(c0, c1 - T))
+        return top[0], bottom[1], left[2], right[3]
+
+
+# Неограниченное поле: плитки CHUNK x CHUNK в словаре по координатам плитки
+# Плитка (ti, tj) -- клетки строк ti * CHUNK .. и столбцов tj * CHUNK ..,
+# координаты -- любые целые числа. Хранятся только плитки с живыми клетками,
+# поэтому память зависит от населения, а не от размеров узора.
+class ChunkMap:
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks if chunks is not None else {}
+
+
+# Движок на неограниченной плоскости (без тора)
+# Буфер -- ChunkMap. Снаружи видно окно: прямоугольник размера window
+# с левым верхним углом origin; unpack, get, set и shape работают в его
+# координатах, а pack кладёт матрицу в окно. Окно можно сдвигать (move),
+# поле при этом не меняется. Шаг считает только плитки с живыми клетками
+# и соседние с ними, если у общего края есть живые клетки; опустевшие
+# плитки удаляются.
+# Правила -- только с двумя состояниями и восемью соседями, без B0
+# (иначе пустая плоскость сразу заполнилась бы целиком).
+class SparseEngine:
+    name = "sparse"
+    unbounded = True
+
+    # Сдвиги соседних плиток: сверху, снизу, слева, справа и по углам
+    _SIDES = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+
+    def __init__(self, chunk=64, rule=CONWAY):
+        if not self.supports(rule):
+            raise ValueError(f"Движок {self.name} не поддерживает правило {rule}")
+        self.rule = rule
+        self.chunk = chunk
+        # Окно: левый верхний угол и размер
+        self.origin = (0, 0)
+        self.window = (0, 0)
+
+    @classmethod
+    def supports(cls, rule):
+        return rule.is_life_like and rule.keeps_empty
+
+    # Окно
+
+    def move(self, di, dj):
+        self.origin = (self.origin[0] + di, self.origin[1] + dj)
+
+    # Буферы
+
+    def pack(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.bool_)
+        self.window = matrix.shape
+        return self.from_matrix(matrix, *self.origin)
+
+    def unpack(self, buf):
+        return self.region(buf, *self.origin, *self.window)
+
+    def unpack_states(self, buf):
+        return self.unpack(buf)
+
+    def zeros(self, shape):
+        self.window = tuple(shape)
+        return ChunkMap()
+
+    def copy(self, buf):
+        return ChunkMap({key: chunk.copy() for (key, chunk) in buf.chunks.items()})
+
+    def shape(self, buf):
+        return self.window
+
+    def get(self, buf, i, j):
+        (ti, i), (tj, j) = divmod(self.origin[0] + i, self.chunk), divmod(self.origin[1] + j, self.chunk)
+        chunk = buf.chunks.get((ti, tj))
+        return chunk is not None and bool(chunk[i, j])
+
+    def set(self, buf, i, j, value):
+        (ti, i), (tj, j) = divmod(self.origin[0] + i, self.chunk), divmod(self.origin[1] + j, self.chunk)
+        chunk = buf.chunks.get((ti, tj))
+        if chunk is None:
+            if not value:
+                return None
+            chunk = buf.chunks[(ti, tj)] = np.zeros((self.chunk, self.chunk), dtype=np.bool_)
+        chunk[i, j] = value
+        if not value and not chunk.any():
+            del buf.chunks[(ti, tj)]
+
+    def clear(self, buf):
+        buf.chunks.clear()
+
+    # Пустых плиток в буфере не бывает
+    def is_empty(self, buf):
+        return not buf.chunks
+
+    def equal(self, a, b):
+        if a.chunks.keys() != b.chunks.keys():
+            return False
+        return all(np.array_equal(chunk, b.chunks[key]) for (key, chunk) in a.chunks.items())
+
+    # Координаты плиток и сами плитки, упакованные по 8 клеток в байт;
+    # от положения окна не зависит
+    def packed_bits(self, buf):
+        keys = sorted(buf.chunks)
+        if not keys:
+            return np.zeros(0, dtype=np.uint8)
+        coords = np.array(keys, dtype=np.int64).view(np.uint8).reshape(-1)
+        cells = np.packbits(np.stack([buf.chunks[key] for key in keys]))
+        return np.concatenate([coords, cells])
+
+    # Размер окна берётся текущий, shape не используется
+    def from_packed_bits(self, bits, shape):
+        T = self.chunk
+        count = bits.size // (16 + T * T // 8)
+        keys = np.frombuffer(bits[:16 * count].tobytes(), dtype=np.int64).reshape(count, 2)
+        cells = np.unpackbits(bits[16 * count:]).reshape(count, T, T).view(np.bool_)
+        return ChunkMap({(int(ti), int(tj)): cells[k] for (k, (ti, tj)) in enumerate(keys)})
+
+    def population(self, buf):
+        return sum(int(np.count_nonzero(chunk)) for chunk in buf.chunks.values())
+
+    # Матрица клеток прямоугольника rows x cols с левым верхним углом top, left
+    def region(self, buf, top, left, rows, cols):
+        T = self.chunk
+        matrix = np.zeros((rows, cols), dtype=np.bool_)
+        if not buf.chunks or rows <= 0 or cols <= 0:
+            return matrix
+        for ti in range(top // T, (top + rows - 1) // T + 1):
+            for tj in range(left // T, (left + cols - 1) // T + 1):
+                chunk = buf.chunks.get((ti, tj))
+                if chunk is None:
+                    continue
+                r0, c0 = max(top, ti * T), max(left, tj * T)
+                r1, c1 = min(top + rows, (ti + 1) * T), min(left + cols, (tj + 1) * T)
+                matrix[r0 - top:r1 - top, c0 - left:c1 - left] = chunk[r0 - ti * T:r1 - ti * T, c0 - tj * T:c1 - tj * T]
+        return matrix
+
+    # Буфер с матрицей, левый верхний угол которой -- клетка top, left
+    def from_matrix(self, matrix, top=0, left=0):
+        T = self.chunk
+        rows, cols = matrix.shape
+        buf = ChunkMap()
+        for ti in range(top // T, (top + rows - 1) // T + 1):
+            for tj in range(left // T, (left + cols - 1) // T + 1):
+                r0, c0 = max(top, ti * T), max(left, tj * T)
+                r1, c1 = min(top + rows, (ti + 1) * T), min(left + cols, (tj + 1) * T)
+                part = matrix[r0 - top:r1 - top, c0 - left:c1 - left]
+                if part.any():
+                    chunk = np.zeros((T, T), dtype=np.bool_)
+                    chunk[r0 - ti * T:r1 - ti * T, c0 - tj * T:c1 - tj * T] = part
+                    buf.chunks[(ti, tj)] = chunk
+        return buf
+
+    # Живые клетки в виде матрицы по их границам и координаты её левого
+    # верхнего угла; для пустого поля -- матрица 0 x 0
+    def to_matrix(self, buf):
+        if not buf.chunks:
+            return np.zeros((0, 0), dtype=np.bool_), (0, 0)
+        T = self.chunk
+        keys = np.array(list(buf.chunks))
+        (ti0, tj0), (ti1, tj1) = keys.min(axis=0), keys.max(axis=0) + 1
+        matrix = self.region(buf, int(ti0) * T, int(tj0) * T, int(ti1 - ti0) * T, int(tj1 - tj0) * T)
+        rows = np.flatnonzero(matrix.any(axis=1))
+        cols = np.flatnonzero(matrix.any(axis=0))
+        r0, r1, c0, c1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        return matrix[r0:r1, c0:c1].copy(), (int(ti0) * T + int(r0), int(tj0) * T + int(c0))
+
+    # Шаг
+    # Все плитки считаются разом: стопка плиток с рамками K x (T + 2) x (T + 2)
+    # собирается выборками из стопки плиток src (последняя -- пустая,
+    # на её место встают отсутствующие соседи)
+
+    def step(self, src, dst, stats=False):
+        T = self.chunk
+        keys = list(src.chunks)
+        if not keys:
+            dst.chunks = {}
+            return StepStats() if stats else None
+
+        stack = np.zeros((len(keys) + 1, T, T), dtype=np.uint8)
+        np.stack(list(src.chunks.values()), out=stack[:-1])
+        cells = stack[:-1]
+
+        # Кандидаты: плитки src и соседние, к которым примыкают живые клетки
+        edges = (cells[:, 0, :].any(axis=1), cells[:, -1, :].any(axis=1),
+                 cells[:, :, 0].any(axis=1), cells[:, :, -1].any(axis=1),
+                 cells[:, 0, 0] != 0, cells[:, 0, -1] != 0,
+                 cells[:, -1, 0] != 0, cells[:, -1, -1] != 0)
+        index = {key: k for (k, key) in enumerate(keys)}
+        candidates = list(keys)
+        known = set(keys)
+        for ((di, dj), edge) in zip(self._SIDES, edges):
+            for k in np.flatnonzero(edge):
+                key = (keys[k][0] + di, keys[k][1] + dj)
+                if key not in known:
+                    known.add(key)
+                    candidates.append(key)
+
+        # Номера в stack самой плитки и её соседей
+        empty = len(keys)
+
+        def neighbours(di, dj):
+            return np.array([index.get((ti + di, tj + dj), empty) for (ti, tj) in candidates])
+
+        p = np.empty((len(candidates), T + 2, T + 2), dtype=np.uint8)
+        p[:, 1:-1, 1:-1] = stack[neighbours(0, 0)]
+        p[:, 0, 1:-1] = stack[neighbours(-1, 0), -1, :]
+        p[:, -1, 1:-1] = stack[neighbours(1, 0), 0, :]
+        p[:, 1:-1, 0] = stack[neighbours(0, -1), :, -1]
+        p[:, 1:-1, -1] = stack[neighbours(0, 1), :, 0]
+        p[:, 0, 0] = stack[neighbours(-1, -1), -1, -1]
+        p[:, 0, -1] = stack[neighbours(-1, 1), -1, 0]
+        p[:, -1, 0] = stack[neighbours(1, -1), 0, -1]
+        p[:, -1, -1] = stack[neighbours(1, 1), 0, 0]
+
+        out = _step_block(p, self.rule)
+        alive = np.flatnonzero(out.any(axis=(1, 2)))
+        dst.chunks = {candidates[k]: out[k] for k in alive}
+        if stats:
+            return self._step_stats(p[:, 1:-1, 1:-1], out, [candidates[k] for k in alive], alive)
+        return None
+
+    # Сводка по стопкам плиток до и после шага
+    # Границы -- по живым плиткам: первая и последняя живые строки
+    # и столбцы каждой плитки в координатах плоскости
+    def _step_stats(self, before, after, keys, alive):
+        T = self.chunk
+        result = StepStats(int(np.count_nonzero(after)),
+                           int(np.count_nonzero(after > before)),
+                           int(np.count_nonzero(before > after)))
+        if not keys:
+            return result
+        live = after[alive]
+        corner = np.array(keys, dtype=np.int64) * T
+        rows, cols = live.any(axis=2), live.any(axis=1)
+        i0 = corner[:, 0] + rows.argmax(axis=1)
+        i1 = corner[:, 0] + T - rows[:, ::-1].argmax(axis=1)
+        j0 = corner[:, 1] + cols.argmax(axis=1)
+        j1 = corner[:, 1] + T - cols[:, ::-1].argmax(axis=1)
+        result.bbox = (int(i0.min()), int(i1.max()), int(j0.min()), int(j1.max()))
+        return result
+
+
+# Поля от этого числа клеток по умолчанию хранятся упакованными
+PACKED_MIN_CELLS = 1 << 22
+
+
+# Движки по именам (для командной строки и настроек)
+ENGINES = {
+    engine.name: engine
+    for engine in (LoopEngine, NumpyEngine, PackedEngine, TiledEngine, ParallelEngine, SparseEngine)
+}
+
+
+# Движок по умолчанию
+def default_engine(rule=CONWAY):
+    return NumpyEngine(rule)
+
+
+# Движок по имени; None -- выбор по размеру поля при создании игры
+def make_engine(name, rule=None):
+    if name is None:
+        return None
+    return ENGINES[name](rule=rule or CONWAY)
+
+
+# Выбор движка по размеру поля и правилу
+def select_engine(shape, rule=CONWAY):
+    N, M = shape
+    if N * M >= PACKED_MIN_CELLS and PackedEngine.supports(rule):
+        return PackedEngine(rule)
+    return default_engine(rule)
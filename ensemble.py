@@ -0,0 +1,207 @@
+import numpy as np
+
+from engine import _apply_terms
+from rules import CONWAY
+
+
+# Ансамбль игр: много полей одного размера считаются одновременно
+# Поля хранятся стопкой B x N x M, шаг -- одна векторная операция на всю стопку,
+# поэтому пропускная способность растёт с числом полей, а не упирается
+# в накладные расходы Python на каждую игру.
+#
+# Для каждого поля, как в GameOfLife, отслеживаются:
+#   - завершение (все клетки мертвы или стабильная конфигурация) и его поколение
+#   - периодическое состояние и пара поколений с одинаковым полем
+# Период ищется среди последних window поколений по 64-битным отпечаткам
+# упакованных полей; совпадение отпечатков перепроверяется сравнением полей.
+# Завершённые поля дальше не меняются (мёртвое остаётся мёртвым,
+# стабильное -- стабильным), поэтому их можно считать вместе со всеми.
+#
+# Правило (rules.Rule) -- любое с двумя состояниями и восемью соседями,
+# без рождения при 0 соседей (иначе мёртвое поле не осталось бы мёртвым).
+
+DEFAULT_WINDOW = 128
+
+# Причины завершения
+NOT_FINISHED = 0
+ALL_DEAD = 1
+STABLE = 2
+
+
+class GameOfLifeEnsemble:
+    def __init__(self, states, window=DEFAULT_WINDOW, seed=0, rule=CONWAY):
+        if not (rule.is_life_like and rule.keeps_empty):
+            raise ValueError(f"Ансамбль не поддерживает правило {rule}")
+        states = np.asarray(states, dtype=np.bool_)
+        B, N, M = states.shape
+        self.rule = rule
+
+        self.state = states.copy()
+        self.prev_state = states.copy()
+        self.age = 1
+
+        # Рабочие буферы шага
+        self._padded = np.zeros((B, N + 2, M + 2), dtype=np.uint8)
+        self._count = np.zeros((B, N, M), dtype=np.uint8)
+        self._mask = np.zeros((B, N, M), dtype=np.bool_)
+        self._diff = np.zeros((B, N, M), dtype=np.uint8)
+
+        # Завершение: причина и поколение для каждого поля
+        self._finish_code = np.zeros(B, dtype=np.uint8)
+        self._finish_age = np.zeros(B, dtype=np.int64)
+
+        # Периодичность: поколения, между которыми поле повторилось
+        self._periodic = np.zeros(B, dtype=np.bool_)
+        self._periodic_from = np.zeros(B, dtype=np.int64)
+        self._periodic_age = np.zeros(B, dtype=np.int64)
+
+        # Кольцо последних window поколений: упакованные поля и их отпечатки
+        # Слово упакованного поля умножается на свой случайный нечётный
+        # множитель, сумма по модулю 2^64 -- отпечаток
+        words = (N * M + 63) // 64
+        self.window = window
+        self._ring_bits = np.zeros((window, B, words), dtype=np.uint64)
+        self._ring_hash = np.zeros((window, B), dtype=np.uint64)
+        self._ring_age = np.zeros(window, dtype=np.int64)   # 0 -- пустая ячейка
+        self._ring_pos = 0
+        rng = np.random.default_rng(seed)
+        self._weights = rng.integers(0, 1 << 63, size=words, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        self._current_bits, self._current_hash = self._fingerprint()
+
+    @classmethod
+    def random(cls, count, rows, cols, density=0.5, seed=None, window=DEFAULT_WINDOW, rule=CONWAY):
+        rng = np.random.default_rng(seed)
+        return cls(rng.random((count, rows, cols)) < density, window=window, rule=rule)
+
+    # Размеры
+
+    def size(self):
+        return self.state.shape[0]
+
+    def height(self):
+        return self.state.shape[1]
+
+    def width(self):
+        return self.state.shape[2]
+
+    # Состояние полей (массивы длины B)
+
+    def is_finished(self):
+        return self._finish_code != NOT_FINISHED
+
+    def finish_age(self):
+        return self._finish_age
+
+    def is_periodic(self):
+        return self._periodic.copy()
+
+    def periodic_generations(self):
+        return self._periodic_from, self._periodic_age
+
+    # Все поля завершились или стали периодическими
+    def is_done(self):
+        return bool(np.all(self.is_finished() | self._periodic))
+
+    # Описания для поля b, в тех же словах, что у GameOfLife
+
+    def finish_reason(self, b):
+        code, age = self._finish_code[b], self._finish_age[b]
+        if code == ALL_DEAD:
+            return f"Все клетки мертвы. Поколение {age}."
+        if code == STABLE:
+            return f"Стабильная конфигурация. Поколение {age}."
+        return None
+
+    def periodic_info(self, b):
+        if not self._periodic[b]:
+            return None
+        return f"Периодическая конфигурация. Поколения {self._periodic_from[b]} и {self._periodic_age[b]}."
+
+    # Шаг всех полей
+    def next(self):
+        # Текущее поколение уходит в кольцо
+        pos = self._ring_pos
+        self._ring_bits[pos] = self._current_bits
+        self._ring_hash[pos] = self._current_hash
+        self._ring_age[pos] = self.age
+        self._ring_pos = (pos + 1) % self.window
+
+        self.prev_state, self.state = self.state, self.prev_state
+        self._step(self.prev_state, self.state)
+        self.age += 1
+
+        self._current_bits, self._current_hash = self._fingerprint()
+        # Проверки только для полей, ещё не завершённых и не ставших периодическими
+        running = ~self._periodic & ~self.is_finished()
+        self._check_finished(running, pos)
+        self._check_periodic(running, pos)
+        return self.state
+
+    # Шаги, пока все поля не завершатся или не пройдёт generations поколений
+    def run(self, generations):
+        for _ in range(generations):
+            if self.is_done():
+                break
+            self.next()
+        return self.age
+
+    def _step(self, src, dst):
+        p, count, mask = self._padded, self._count, self._mask
+
+        # Копия полей в центр рамки, затем склейка краёв тора
+        p[:, 1:-1, 1:-1] = src
+        p[:, 0, 1:-1] = p[:, -2, 1:-1]
+        p[:, -1, 1:-1] = p[:, 1, 1:-1]
+        p[:, :, 0] = p[:, :, -2]
+        p[:, :, -1] = p[:, :, 1]
+
+        # Сумма восьми соседей
+        np.add(p[:, :-2, :-2], p[:, :-2, 1:-1], out=count)
+        np.add(count, p[:, :-2, 2:], out=count)
+        np.add(count, p[:, 1:-1, :-2], out=count)
+        np.add(count, p[:, 1:-1, 2:], out=count)
+        np.add(count, p[:, 2:, :-2], out=count)
+        np.add(count, p[:, 2:, 1:-1], out=count)
+        np.add(count, p[:, 2:, 2:], out=count)
+
+        # Правило (для B3/S23 -- те же четыре операции, см. engine._apply_terms)
+        _apply_terms(self.rule, count, src, None, dst, mask, self._diff)
+
+    # Упакованные поля (B x words) и их отпечатки (B)
+    def _fingerprint(self):
+        B = self.size()
+        words = self._weights.shape[0]
+        raw = np.zeros((B, words * 8), dtype=np.uint8)
+        packed = np.packbits(self.state.reshape(B, -1), axis=1)
+        raw[:, :packed.shape[1]] = packed
+        bits = raw.view(np.uint64)
+        return bits, (bits * self._weights).sum(axis=1, dtype=np.uint64)
+
+    def _check_finished(self, candidates, prev_pos):
+        dead = ~self._current_bits.any(axis=1)
+        stable = np.all(self._current_bits == self._ring_bits[prev_pos], axis=1)
+
+        newly_dead = candidates & dead
+        newly_stable = candidates & ~dead & stable
+        self._finish_code[newly_dead] = ALL_DEAD
+        self._finish_code[newly_stable] = STABLE
+        self._finish_age[newly_dead | newly_stable] = self.age
+
+    def _check_periodic(self, candidates, prev_pos):
+        # Совпадения отпечатков со всеми поколениями кольца, кроме предыдущего
+        # (стабильный случай) и пустых ячеек
+        hits = self._ring_hash == self._current_hash
+        hits[prev_pos] = False
+        hits[self._ring_age == 0] = False
+        hits &= candidates
+
+        # Для каждого поля -- самое позднее подтверждённое совпадение
+        for b in np.flatnonzero(hits.any(axis=0)):
+            slots = np.flatnonzero(hits[:, b])
+            for slot in slots[np.argsort(-self._ring_age[slots])]:
+                if np.array_equal(self._ring_bits[slot, b], self._current_bits[b]):
+                    self._periodic[b] = True
+                    self._periodic_from[b] = self._ring_age[slot]
+                    self._periodic_age[b] = self.age
+                    break
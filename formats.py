@@ -0,0 +1,284 @@
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+
+# Чтение и запись узоров в распространённых форматах
+#   RLE       (.rle)         -- https://conwaylife.com/wiki/Run_Length_Encoded
+#   Life 1.06 (.lif, .life)  -- список координат живых клеток
+#   Plaintext (.cells)       -- строки из "." и "O"
+#
+# Файлы читаются построчно: в памяти никогда не собирается весь текст,
+# клетки сразу попадают в матрицу (если размер известен из заголовка)
+# или в компактные массивы координат, из которых матрица строится в конце.
+
+# Узор: матрица bool и правило из файла (строка или None)
+Pattern = namedtuple("Pattern", ["cells", "rule"])
+
+# Сколько строк Life 1.06 разбирается за один раз
+_LIFE106_BLOCK = 1 << 16
+
+_RLE_HEADER = re.compile(r"x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?", re.IGNORECASE)
+_RLE_TRAILING_COUNT = re.compile(r"(\d+)$")
+
+
+# Матрица по координатам живых клеток
+# rows, cols -- массивы номеров строк и столбцов; shape -- размер или None
+def _cells_from_coordinates(rows, cols, shape=None):
+    if shape is None:
+        shape = (int(rows.max(initial=-1)) + 1, int(cols.max(initial=-1)) + 1)
+    cells = np.zeros(shape, dtype=np.bool_)
+    cells[rows, cols] = True
+    return cells
+
+
+# RLE
+# Текст тела читается кусками примерно по _RLE_CHUNK символов;
+# кусок разбирается на отрезки векторно: номера строк и столбцов
+# отрезков -- накопленные суммы их длин
+
+_RLE_CHUNK = 1 << 16
+
+
+class _RleReader:
+    def __init__(self):
+        self.cells = None
+        self.rule = None
+        # Отрезки живых клеток (строки, столбцы, длины), если размера нет в заголовке
+        self.runs = []
+        self.row, self.col = 0, 0
+        self.done = False
+
+    def feed(self, text):
+        b = np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8)
+        is_digit = (b >= ord("0")) & (b <= ord("9"))
+        tag_pos = np.flatnonzero(~is_digit)
+
+        # Число перед символом: цифры, идущие подряд перед ним
+        count = np.zeros(tag_pos.size, dtype=np.int64)
+        has_count = np.zeros(tag_pos.size, dtype=np.bool_)
+        running = np.ones(tag_pos.size, dtype=np.bool_)
+        scale = 1
+        for d in range(1, 20):
+            p = tag_pos - d
+            running &= p >= 0
+            running[running] &= is_digit[p[running]]
+            if not running.any():
+                break
+            count[running] += (b[p[running]].astype(np.int64) - ord("0")) * scale
+            has_count |= running
+            scale *= 10
+        count[~has_count] = 1
+        tags = b[tag_pos]
+
+        # Всё после "!" не относится к узору
+        end = np.flatnonzero(tags == ord("!"))
+        if end.size:
+            tags, count = tags[:end[0]], count[:end[0]]
+            self.done = True
+
+        is_newline = tags == ord("$")
+        is_alive = ~is_newline & (tags != ord("b")) & (tags != ord("."))
+
+        # Положение каждого отрезка: строка и столбец начала
+        advance = np.where(is_newline, 0, count)
+        ends = np.cumsum(advance)
+        starts = ends - advance
+        rows = self.row + np.cumsum(np.where(is_newline, count, 0))
+        last_newline = np.maximum.accumulate(np.where(is_newline, np.arange(tags.size), -1))
+        base = np.where(last_newline >= 0, ends[np.maximum(last_newline, 0)], -self.col)
+        cols = starts - base
+
+        if tags.size:
+            self.row = int(rows[-1])
+            self.col = int(cols[-1] + advance[-1])
+        self._add_runs(rows[is_alive], cols[is_alive], count[is_alive])
+
+    def _add_runs(self, rows, cols, lengths):
+        if self.cells is None:
+            self.runs.append((rows, cols, lengths))
+            return None
+        rows, cols = _expand_runs(rows, cols, lengths)
+        inside = (rows < self.cells.shape[0]) & (cols < self.cells.shape[1])
+        self.cells[rows[inside], cols[inside]] = True
+
+    def result(self):
+        if self.cells is None:
+            if self.runs:
+                rows, cols = _expand_runs(*(np.concatenate(part) for part in zip(*self.runs)))
+                self.cells = _cells_from_coordinates(rows, cols)
+            else:
+                self.cells = np.zeros((0, 0), dtype=np.bool_)
+        return Pattern(self.cells, self.rule)
+
+
+# Отрезки (строка, начало, длина) -> координаты всех их клеток
+def _expand_runs(rows, cols, lengths):
+    rows = np.repeat(rows, lengths)
+    offsets = np.arange(rows.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return rows, np.repeat(cols, lengths) + offsets
+
+
+def read_rle(io):
+    reader = _RleReader()
+    chunk = []
+    size = 0
+    for line in io:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if reader.cells is None and not reader.runs and not chunk and line[0] in "xX":
+            header = _RLE_HEADER.match(line)
+            if header:
+                reader.cells = np.zeros((int(header.group(2)), int(header.group(1))), dtype=np.bool_)
+                reader.rule = header.group(3)
+                continue
+
+        chunk.append(line)
+        size += len(line)
+        if size >= _RLE_CHUNK:
+            # Число в конце куска относится к символу из следующего куска
+            text = "".join(chunk)
+            trailing = _RLE_TRAILING_COUNT.search(text)
+            pending = trailing.group(1) if trailing else ""
+            reader.feed(text[:len(text) - len(pending)])
+            if reader.done:
+                return reader.result()
+            chunk, size = [pending], len(pending)
+
+    if chunk:
+        reader.feed("".join(chunk))
+    return reader.result()
+
+
+def write_rle(cells, io, rule="B3/S23", width=70):
+    N, M = cells.shape
+    io.write(f"x = {M}, y = {N}, rule = {rule}\n")
+
+    line = ""
+    # Строка, на которой остановилась запись; пустые строки
+    # пропускаются и записываются одним $ с числом
+    last_row = 0
+    for i in range(N):
+        row = cells[i]
+        # Границы отрезков живых клеток строки: начало, конец, начало, ...
+        edges = np.flatnonzero(np.diff(row.view(np.int8), prepend=0, append=0))
+        if edges.size == 0:
+            continue
+
+        tokens = [_rle_token(i - last_row, "$")] if i > last_row else []
+        last_row = i
+        if edges[0] > 0:
+            tokens.append(_rle_token(edges[0], "b"))
+        for k in range(0, edges.size, 2):
+            start, end = edges[k], edges[k + 1]
+            tokens.append(_rle_token(end - start, "o"))
+            if k + 2 < edges.size:
+                tokens.append(_rle_token(edges[k + 2] - end, "b"))
+
+        for token in tokens:
+            if len(line) + len(token) > width:
+                io.write(line + "\n")
+                line = ""
+            line += token
+    io.write(line + "!\n")
+
+
+def _rle_token(n, tag):
+    return f"{n}{tag}" if n > 1 else tag
+
+
+# Life 1.06
+
+def read_life106(io):
+    blocks = []
+    lines = []
+    for line in io:
+        if line.startswith("#"):
+            continue
+        lines.append(line)
+        if len(lines) == _LIFE106_BLOCK:
+            blocks.append(_parse_life106_block(lines))
+            lines = []
+    if lines:
+        blocks.append(_parse_life106_block(lines))
+
+    if not blocks:
+        return Pattern(np.zeros((0, 0), dtype=np.bool_), None)
+    xy = np.concatenate(blocks)
+    # Координаты могут быть отрицательными: узор сдвигается в угол
+    cols = xy[:, 0] - xy[:, 0].min(initial=0)
+    rows = xy[:, 1] - xy[:, 1].min(initial=0)
+    return Pattern(_cells_from_coordinates(rows, cols), None)
+
+
+def _parse_life106_block(lines):
+    xy = np.fromstring("".join(lines), dtype=np.int64, sep=" ")
+    return xy[:xy.size // 2 * 2].reshape(-1, 2)
+
+
+def write_life106(cells, io):
+    io.write("#Life 1.06\n")
+    rows, cols = np.nonzero(cells)
+    for start in range(0, rows.size, _LIFE106_BLOCK):
+        block = zip(cols[start:start + _LIFE106_BLOCK], rows[start:start + _LIFE106_BLOCK])
+        io.write("".join(f"{x} {y}\n" for (x, y) in block))
+
+
+# Plaintext (.cells)
+
+def read_cells(io):
+    # Для каждой строки -- номера столбцов живых клеток
+    alive = []
+    width = 0
+    for line in io:
+        if line.startswith("!"):
+            continue
+        line = line.rstrip("\r\n")
+        chars = np.frombuffer(line.encode("utf-32-le"), dtype="<u4")
+        alive.append(np.flatnonzero((chars == ord("O")) | (chars == ord("*"))))
+        width = max(width, chars.size)
+
+    lengths = np.fromiter(map(len, alive), dtype=np.int64, count=len(alive))
+    rows = np.repeat(np.arange(len(alive)), lengths)
+    cols = np.concatenate(alive) if alive else np.zeros(0, dtype=np.int64)
+    return Pattern(_cells_from_coordinates(rows, cols, (len(alive), width)), None)
+
+
+def write_cells(cells, io, name=None):
+    if name:
+        io.write(f"!Name: {name}\n")
+    for row in cells:
+        chars = np.where(row, ord("O"), ord(".")).astype(np.uint8)
+        io.write(chars.tobytes().decode("ascii").rstrip(".") + "\n")
+
+
+# Выбор формата по расширению файла
+
+READERS = {
+    ".rle": read_rle,
+    ".lif": read_life106,
+    ".life": read_life106,
+    ".cells": read_cells,
+}
+
+WRITERS = {
+    ".rle": write_rle,
+    ".lif": write_life106,
+    ".life": write_life106,
+    ".cells": write_cells,
+}
+
+
+def read_pattern(path):
+    reader = READERS[os.path.splitext(path)[1].lower()]
+    with open(path) as io:
+        return reader(io)
+
+
+def write_pattern(cells, path):
+    writer = WRITERS[os.path.splitext(path)[1].lower()]
+    with open(path, "w") as io:
+        writer(cells, io)
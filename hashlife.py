@@ -0,0 +1,345 @@
+import numpy as np
+
+from rules import CONWAY
+
+
+# HashLife: поле -- квадродерево, одинаковые поддеревья хранятся один раз
+# (hash-consing), а результат эволюции каждого узла запоминается.
+# Благодаря этому повторяющиеся участки пространства и времени считаются
+# один раз, и переход на 2^k поколений стоит столько же, сколько на одно.
+#
+# Узел уровня L -- квадрат 2^L x 2^L клеток из четырёх узлов уровня L - 1:
+#   nw ne
+#   sw se
+# Узлы уровня 0 -- одна клетка (ALIVE или DEAD).
+#
+# Два режима:
+#   HashLife.advance_torus -- тор, как у GameOfLife. Поле размножается
+#       плиткой на плоскость, что точно соответствует тору, только если
+#       стороны поля -- степени двойки
+#   HashLifeUniverse -- отдельная неограниченная плоскость без склейки краёв
+#
+# Правило (rules.Rule) -- любое с двумя состояниями и восемью соседями,
+# при котором пустое пространство остаётся пустым (без B0): см. supports_rule
+
+
+class _Node:
+    __slots__ = ("nw", "ne", "sw", "se", "level", "population", "result")
+
+    def __init__(self, nw, ne, sw, se, level, population):
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+        self.level = level
+        self.population = population
+        # Запомненные результаты: шаг j -> центр узла через 2^j поколений
+        self.result = None
+
+
+DEAD = _Node(None, None, None, None, 0, 0)
+ALIVE = _Node(None, None, None, None, 0, 1)
+
+# Сборка мусора запускается, когда в таблице больше узлов
+DEFAULT_MAX_NODES = 1 << 20
+
+
+class HashLife:
+    def __init__(self, max_nodes=DEFAULT_MAX_NODES, rule=CONWAY):
+        if not self.supports_rule(rule):
+            raise ValueError(f"HashLife не поддерживает правило {rule}")
+        self.max_nodes = max_nodes
+        self.rule = rule
+        # Следующее состояние клетки: _next[живая][число соседей]
+        self._next = [[bool(v) for v in row] for row in rule.table]
+        # Таблица уникальных узлов: id детей -> узел
+        # Узел держит ссылки на детей, поэтому id не переиспользуются
+        self._table = {}
+        # Пустой узел каждого уровня
+        self._empty = [DEAD]
+        # Число сборок мусора (для статистики)
+        self.collections = 0
+
+    def __len__(self):
+        return len(self._table)
+
+    # Узлы
+
+    def join(self, nw, ne, sw, se):
+        key = (id(nw), id(ne), id(sw), id(se))
+        node = self._table.get(key)
+        if node is None:
+            population = nw.population + ne.population + sw.population + se.population
+            node = _Node(nw, ne, sw, se, nw.level + 1, population)
+            self._table[key] = node
+        return node
+
+    def empty(self, level):
+        while len(self._empty) <= level:
+            e = self._empty[-1]
+            self._empty.append(self.join(e, e, e, e))
+        return self._empty[level]
+
+    # Узел уровня L + 1 с узлом node в центре и пустой рамкой
+    def centre(self, node):
+        e = self.empty(node.level - 1)
+        return self.join(
+            self.join(e, e, e, node.nw), self.join(e, e, node.ne, e),
+            self.join(e, node.sw, e, e), self.join(node.se, e, e, e),
+        )
+
+    # Эволюция
+
+    # Центр узла (уровень L - 1) через 2^j поколений, 0 <= j <= L - 2
+    def successor(self, node, j):
+        if node.population == 0:
+            return self.empty(node.level - 1)
+        if node.result is None:
+            node.result = {}
+        elif j in node.result:
+            return node.result[j]
+
+        if node.level == 2:
+            result = self._base(node)
+        else:
+            a, b, c, d = node.nw, node.ne, node.sw, node.se
+            j1 = min(j, node.level - 3)
+            # Девять перекрывающихся узлов уровня L - 1, сдвинутых на 2^(L - 2)
+            c1 = self.successor(a, j1)
+            c2 = self.successor(self.join(a.ne, b.nw, a.se, b.sw), j1)
+            c3 = self.successor(b, j1)
+            c4 = self.successor(self.join(a.sw, a.se, c.nw, c.ne), j1)
+            c5 = self.successor(self.join(a.se, b.sw, c.ne, d.nw), j1)
+            c6 = self.successor(self.join(b.sw, b.se, d.nw, d.ne), j1)
+            c7 = self.successor(c, j1)
+            c8 = self.successor(self.join(c.ne, d.nw, c.se, d.sw), j1)
+            c9 = self.successor(d, j1)
+
+            if j < node.level - 2:
+                # Достаточно одного полушага: собираем центр из готовых кусков
+                result = self.join(
+                    self.join(c1.se, c2.sw, c4.ne, c5.nw),
+                    self.join(c2.se, c3.sw, c5.ne, c6.nw),
+                    self.join(c4.se, c5.sw, c7.ne, c8.nw),
+                    self.join(c5.se, c6.sw, c8.ne, c9.nw),
+                )
+            else:
+                # Полный шаг: ещё 2^(L - 3) поколений для четырёх четвертей
+                result = self.join(
+                    self.successor(self.join(c1, c2, c4, c5), j1),
+                    self.successor(self.join(c2, c3, c5, c6), j1),
+                    self.successor(self.join(c4, c5, c7, c8), j1),
+                    self.successor(self.join(c5, c6, c8, c9), j1),
+                )
+
+        node.result[j] = result
+        return result
+
+    # Узел 4 x 4 -> центр 2 x 2 через одно поколение
+    def _base(self, node):
+        cells = [[0] * 4 for _ in range(4)]
+        for (qi, qj, q) in ((0, 0, node.nw), (0, 2, node.ne), (2, 0, node.sw), (2, 2, node.se)):
+            cells[qi][qj] = q.nw.population
+            cells[qi][qj + 1] = q.ne.population
+            cells[qi + 1][qj] = q.sw.population
+            cells[qi + 1][qj + 1] = q.se.population
+
+        out = []
+        for i in (1, 2):
+            for j in (1, 2):
+                count = sum(cells[i + di][j + dj]
+                            for di in (-1, 0, 1) for dj in (-1, 0, 1)) - cells[i][j]
+                out.append(ALIVE if self._next[cells[i][j]][count] else DEAD)
+        return self.join(*out)
+
+    # Сборка мусора
+    # Оставляет в таблице только узлы, достижимые из roots, и забывает
+    # запомненные результаты. Узлы из roots остаются действительными
+    def collect(self, roots):
+        table = {}
+        stack = list(roots) + self._empty
+        while stack:
+            node = stack.pop()
+            if node.level == 0:
+                continue
+            key = (id(node.nw), id(node.ne), id(node.sw), id(node.se))
+            if key in table:
+                continue
+            table[key] = node
+            node.result = None
+            stack.extend((node.nw, node.ne, node.sw, node.se))
+        self._table = table
+        self.collections += 1
+
+    def _maybe_collect(self, roots):
+        if len(self._table) > self.max_nodes:
+            self.collect(roots)
+
+    # Конвертация
+
+    # Квадратная матрица bool со стороной 2^level, level >= 2 -> узел
+    # Листья 4 x 4 кодируются 16-битными числами, верхние уровни
+    # собираются векторно по уникальным четвёркам детей
+    def from_matrix(self, matrix):
+        S = matrix.shape[0]
+        blocks = (matrix.reshape(S // 4, 4, S // 4, 4).transpose(0, 2, 1, 3)
+                  .reshape(-1, 16).astype(np.int64))
+        codes = blocks @ (1 << np.arange(16, dtype=np.int64))
+        unique, inverse = np.unique(codes, return_inverse=True)
+        nodes = [self._leaf(int(code)) for code in unique]
+        ids = inverse.reshape(S // 4, S // 4)
+
+        while ids.shape[0] > 1:
+            keys = np.stack([ids[0::2, 0::2], ids[0::2, 1::2],
+                             ids[1::2, 0::2], ids[1::2, 1::2]], axis=-1)
+            half = keys.shape[0]
+            unique, inverse = np.unique(keys.reshape(-1, 4), axis=0, return_inverse=True)
+            nodes = [self.join(nodes[a], nodes[b], nodes[c], nodes[d]) for (a, b, c, d) in unique]
+            ids = inverse.reshape(half, half)
+        return nodes[0]
+
+    # Узел уровня 2 по 16-битному коду клеток (строки сверху вниз)
+    def _leaf(self, code):
+        cell = [ALIVE if code >> k & 1 else DEAD for k in range(16)]
+        return self.join(
+            self.join(cell[0], cell[1], cell[4], cell[5]),
+            self.join(cell[2], cell[3], cell[6], cell[7]),
+            self.join(cell[8], cell[9], cell[12], cell[13]),
+            self.join(cell[10], cell[11], cell[14], cell[15]),
+        )
+
+    # Узел -> квадратная матрица bool
+    def to_matrix(self, node):
+        S = 1 << node.level
+        matrix = np.zeros((S, S), dtype=np.bool_)
+        blocks = {}
+        stack = [(node, 0, 0)]
+        while stack:
+            n, i, j = stack.pop()
+            if n.population == 0:
+                continue
+            if n.level <= 3:
+                block = blocks.get(id(n))
+                if block is None:
+                    block = blocks[id(n)] = self._block(n)
+                matrix[i:i + block.shape[0], j:j + block.shape[1]] = block
+                continue
+            h = 1 << (n.level - 1)
+            stack.extend(((n.nw, i, j), (n.ne, i, j + h), (n.sw, i + h, j), (n.se, i + h, j + h)))
+        return matrix
+
+    def _block(self, node):
+        if node.level == 0:
+            return np.array([[node.population == 1]])
+        return np.block([[self._block(node.nw), self._block(node.ne)],
+                         [self._block(node.sw), self._block(node.se)]])
+
+    # Режим тора
+
+    @staticmethod
+    def supports_rule(rule):
+        return rule.is_life_like and rule.keeps_empty
+
+    @staticmethod
+    def supports_torus(rows, cols):
+        # Плитка из копий поля совпадает с тором, только если её период
+        # (наибольшая сторона) делится на обе стороны
+        return rows & (rows - 1) == 0 and cols & (cols - 1) == 0
+
+    # Состояние тора через n поколений
+    # matrix -- поле N x M, N и M -- степени двойки
+    def advance_torus(self, matrix, n):
+        N, M = matrix.shape
+        S = max(N, M, 4)
+        k = S.bit_length() - 1
+        # Узел уровня k -- ровно одна клетка тора
+        tile = self.from_matrix(np.tile(matrix, (S // N, S // M)))
+
+        while n > 0:
+            j = n.bit_length() - 1
+            # Плитка с периодом S, увеличенная до уровня j + 1
+            big = tile
+            while big.level < j + 1:
+                big = self.join(big, big, big, big)
+            # Центр узла из четырёх плиток сдвинут на половину плитки,
+            # поэтому четверти результата переставляются обратно
+            r = self.successor(self.join(big, big, big, big), j)
+            big = self.join(r.se, r.sw, r.ne, r.nw)
+            while big.level > k:
+                big = big.nw
+            tile = big
+            n -= 1 << j
+            self._maybe_collect([tile])
+
+        return self.to_matrix(tile)[:N, :M]
+
+
+# Неограниченная плоскость
+# Координаты клеток -- любые целые числа, поле растёт вместе с узором
+class HashLifeUniverse:
+    def __init__(self, hashlife=None):
+        self.hashlife = hashlife if hashlife is not None else HashLife()
+        self.root = self.hashlife.empty(3)
+        # Координаты левого верхнего угла корня
+        self.top = -4
+        self.left = -4
+        self.generation = 0
+
+    @classmethod
+    def from_matrix(cls, matrix, top=0, left=0, hashlife=None):
+        universe = cls(hashlife)
+        N, M = matrix.shape
+        S = 1 << max(2, (max(N, M) - 1).bit_length())
+        square = np.zeros((S, S), dtype=np.bool_)
+        square[:N, :M] = matrix
+        universe.root = universe.hashlife.from_matrix(square)
+        universe.top, universe.left = top, left
+        return universe
+
+    def population(self):
+        return self.root.population
+
+    # Переход на n поколений вперёд
+    def advance(self, n):
+        hl = self.hashlife
+        while n > 0:
+            j = n.bit_length() - 1
+            # Рамка вокруг узора: за 2^j поколений он вырастет
+            # не больше чем на 2^j клеток в каждую сторону
+            root = self._crop(self.root)
+            while root.level < j + 2:
+                root = self._grow(root)
+            root = self._grow(self._grow(root))
+            h = 1 << (root.level - 2)
+            self.root = hl.successor(root, j)
+            self.top += h
+            self.left += h
+            n -= 1 << j
+            self.generation += 1 << j
+            hl._maybe_collect([self.root])
+
+    def _grow(self, node):
+        h = 1 << (node.level - 1)
+        self.top -= h
+        self.left -= h
+        return self.hashlife.centre(node)
+
+    # Отбрасывание пустой рамки вокруг узора
+    def _crop(self, node):
+        hl = self.hashlife
+        while node.level > 3:
+            inner = hl.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+            if inner.population != node.population:
+                break
+            h = 1 << (node.level - 2)
+            self.top += h
+            self.left += h
+            node = inner
+        return node
+
+    # Живые клетки в виде матрицы и координаты её левого верхнего угла
+    def to_matrix(self):
+        matrix = self.hashlife.to_matrix(self.root)
+        rows = np.flatnonzero(matrix.any(axis=1))
+        cols = np.flatnonzero(matrix.any(axis=0))
+        if rows.size == 0:
+            return np.zeros((0, 0), dtype=np.bool_), (self.top, self.left)
+        r0, r1, c0, c1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        return matrix[r0:r1, c0:c1].copy(), (self.top + int(r0), self.left + int(c0))
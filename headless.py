@@ -0,0 +1,361 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+import checkpoint
+from census import PATTERNS, Catalogue, census, game_census
+from engine import ENGINES, MappedEngine, make_engine
+from metrics import Metrics
+from model import GameOfLifeLoader, GameOfLifeMaker
+from rules import CONWAY, parse_rule
+from soupcache import CACHE_PATH, DEFAULT_EVERY, DIES, PERIODIC, STABLE, SoupCache, SoupTracker, game_outcome
+
+
+# Запуск игры без интерфейса
+# Не импортирует PyQt5: подходит для вычислительных узлов без экрана
+# и считает поколения без пауз между ними
+#
+# Пример
+#   python headless.py patterns/glider.txt -n 10000 --out runs/glider --snapshot-every 1000
+#   python headless.py gosper.rle -n 1000
+#   python headless.py --random 1000 1000 --density 0.3 --seed 1 --engine packed -n 500
+#   python headless.py --random 512 512 --rule "B2/S/C3" -n 500
+#   python headless.py gosper.rle --engine sparse -n 10000   # без тора
+#   python headless.py --random 100000 100000 --density 0.3 --mapped runs/big -n 10
+#   python headless.py --resume runs/big -n 10               # ещё 10 поколений
+#   python headless.py --random 4096 4096 -n 1000000 --checkpoint runs/long --checkpoint-seconds 600
+#   python headless.py --resume runs/long -n 1000000         # с последней контрольной точки
+#   python headless.py --random 64 64 --density 0.35 --seed 1 --soups 1000 --soup-cache -n 20000
+#   python headless.py --random 64 64 --density 0.35 --seed 1 --soups 1000 --census -n 20000
+
+
+# Прогон игры с записью снимков поля и статистики на диск
+# Снимки -- файлы gen_<поколение>.txt в формате patterns/glider.txt
+# (на неограниченной плоскости -- узор по его границам, координаты
+# левого верхнего угла -- в комментарии),
+# статистика -- stats.csv (дописывается по строке, пока игра идёт):
+# население, рождения, смерти и границы живых клеток берутся из сводки
+# шага (см. stats.py), поле ради них заново не просматривается;
+# у начального поколения рождений, смертей и границ нет
+class HeadlessRun:
+    STATS_HEADER = "age,population,births,deaths,top,bottom,left,right,elapsed,generations_per_second\n"
+
+    def __init__(self, game, out=None, snapshot_every=0, stats_every=1, stop_on_periodic=True,
+                 checkpointer=None, tracker=None):
+        self.game = game
+        self.out = out
+        # Контрольные точки (checkpoint.Checkpointer) или None
+        self.checkpointer = checkpointer
+        # Кеш исходов (soupcache.SoupTracker) или None: игра останавливается,
+        # как только её поле нашлось в кеше
+        self.tracker = tracker
+        self.snapshot_every = snapshot_every
+        self.stats_every = stats_every
+        self.stop_on_periodic = stop_on_periodic
+
+        self._stats = None
+        self._start = None
+        self._start_age = game.age
+
+    # Шаги до завершения игры или пока не пройдено generations поколений
+    # Возвращает причину остановки
+    def run(self, generations):
+        game = self.game
+        self._start = time.perf_counter()
+        self._start_age = game.age
+
+        if self.out is not None:
+            os.makedirs(self.out, exist_ok=True)
+            path = os.path.join(self.out, "stats.csv")
+            is_new = not os.path.exists(path)
+            self._stats = open(path, "a")
+            if is_new:
+                self._stats.write(self.STATS_HEADER)
+
+        try:
+            self._record()
+            reason = f"Пройдено поколений: {generations}."
+            for _ in range(generations):
+                game.next()
+                self._record()
+                if self.checkpointer is not None:
+                    self.checkpointer.after_step()
+                if self.tracker is not None and self.tracker.after_step() is not None:
+                    reason = self.tracker.reason()
+                    break
+
+                if game.is_finished():
+                    reason = game.finish_reason()
+                    break
+                if self.stop_on_periodic and game.is_periodic():
+                    reason = game.periodic_info()
+                    break
+            if self.tracker is not None:
+                self.tracker.finish()
+        finally:
+            if self._stats is not None:
+                self._stats.close()
+                self._stats = None
+            if self.checkpointer is not None:
+                # Последняя точка -- на поколении остановки (если прошлые
+                # записывались без ошибок)
+                if self.checkpointer.error is None and game.age != self.checkpointer.saved_age:
+                    self.checkpointer.save()
+                self.checkpointer.close()
+
+        if self.out is not None and not self._is_due(self.snapshot_every):
+            self._snapshot()
+        return reason
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def generations_per_second(self):
+        elapsed = self.elapsed()
+        return (self.game.age - self._start_age) / elapsed if elapsed > 0 else 0.0
+
+    def _is_due(self, every):
+        return every > 0 and self.game.age % every == 0
+
+    def _record(self):
+        if self.out is None:
+            return None
+        if self._is_due(self.stats_every):
+            game = self.game
+            last = game.stats.last() if game.stats is not None else None
+            if last is not None and last["age"] == game.age:
+                fields = [last[name] for name in ("population", "births", "deaths")]
+                fields += [last[name] for name in ("top", "bottom", "left", "right")] if last["population"] else [""] * 4
+            else:
+                fields = [game.population()] + [""] * 6
+            self._stats.write(f"{game.age},{','.join(map(str, fields))},"
+                              f"{self.elapsed():.6f},{self.generations_per_second():.1f}\n")
+            self._stats.flush()
+        if self._is_due(self.snapshot_every):
+            self._snapshot()
+
+    def _snapshot(self):
+        path = os.path.join(self.out, f"gen_{self.game.age:08d}.txt")
+        comment = f"Поколение {self.game.age}"
+        matrix, (top, left) = self.game.live_region()
+        if self.game.is_unbounded():
+            comment += f", левый верхний угол ({top}, {left})"
+        with open(path, "w") as io:
+            GameOfLifeLoader.toio(matrix, io, comment=comment)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Игра жизнь без интерфейса")
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("pattern", nargs="?", help="файл поля: .txt (как patterns/glider.txt), .rle, .lif, .cells")
+    source.add_argument("--empty", nargs=2, type=int, metavar=("ROWS", "COLS"), help="пустое поле")
+    source.add_argument("--random", nargs=2, type=int, metavar=("ROWS", "COLS"), help="случайное поле")
+    source.add_argument("--resume", metavar="DIR",
+                        help="продолжить игру из каталога --mapped или --checkpoint")
+
+    parser.add_argument("--density", type=float, default=0.5, help="доля живых клеток для --random")
+    parser.add_argument("--seed", type=int, default=None, help="зерно для --random")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=None,
+                        help="движок (по умолчанию выбирается по размеру поля)")
+    parser.add_argument("--mapped", metavar="DIR", default=None,
+                        help="держать поле в файлах каталога DIR (для полей больше памяти); "
+                             "после каждого поколения игру можно продолжить через --resume")
+    parser.add_argument("--rule", type=parse_rule, default=None,
+                        help="правило: B3/S23, B2/S/C3, R5,C0,M1,S34..58,B34..45,NM или имя "
+                             "(highlife, seeds, ...); по умолчанию -- из файла RLE или B3/S23")
+
+    parser.add_argument("-n", "--generations", type=int, default=1000, help="сколько поколений считать")
+    parser.add_argument("--continue-periodic", action="store_true",
+                        help="не останавливаться на периодической конфигурации")
+
+    parser.add_argument("--checkpoint", metavar="DIR", default=None,
+                        help="каталог контрольных точек для продолжения через --resume")
+    parser.add_argument("--checkpoint-every", type=int, default=None, help="контрольная точка каждые K поколений")
+    parser.add_argument("--checkpoint-seconds", type=float, default=None,
+                        help="контрольная точка каждые T секунд (по умолчанию 600, если не задано --checkpoint-every)")
+
+    parser.add_argument("--soups", type=int, default=0,
+                        help="посчитать столько случайных полей --random (зёрна --seed, --seed + 1, ...) "
+                             "и вывести сводку исходов")
+    parser.add_argument("--soup-cache", nargs="?", const=CACHE_PATH, default=None, metavar="FILE",
+                        help=f"кеш исходов полей (по умолчанию {CACHE_PATH}): игра останавливается, "
+                             "как только её поле нашлось в кеше")
+    parser.add_argument("--cache-every", type=int, default=DEFAULT_EVERY,
+                        help="искать поле в кеше каждые K поколений")
+    parser.add_argument("--census", action="store_true",
+                        help="переписать объекты итогового поля (блоки, мигалки, планеры...)")
+    parser.add_argument("--catalogue", default=PATTERNS, metavar="DIR",
+                        help=f"каталог узоров известных объектов для --census (по умолчанию {PATTERNS})")
+
+    parser.add_argument("--out", default=None, help="каталог для снимков и статистики")
+    parser.add_argument("--snapshot-every", type=int, default=0, help="снимок каждые K поколений")
+    parser.add_argument("--stats-every", type=int, default=1, help="строка статистики каждые K поколений")
+    parser.add_argument("--metrics", action="store_true", help="замерять время фаз шага и вывести сводку")
+    args = parser.parse_args(argv)
+    if args.checkpoint is not None and args.mapped is not None:
+        parser.error("--mapped уже сохраняет игру после каждого поколения, --checkpoint не нужен")
+    if args.census and args.soup_cache is not None:
+        parser.error("--census переписывает итоговое поле, а с --soup-cache его может не быть")
+    return args
+
+
+def create_game(args):
+    if args.resume is not None:
+        if os.path.exists(os.path.join(args.resume, MappedEngine.META)):
+            return GameOfLifeMaker.open_mapped(args.resume)
+        game = checkpoint.resume(args.resume)
+        if game is None:
+            print(f"В каталоге {args.resume} нет контрольных точек")
+        return game
+    if args.mapped is not None:
+        if args.pattern is not None:
+            engine = MappedEngine(args.mapped, args.rule or CONWAY)
+            return GameOfLifeMaker.fromfile(args.pattern, minsize=(0, 0), engine=engine)
+        shape = args.empty if args.empty is not None else args.random
+        density = args.density if args.random is not None else 0.0
+        return GameOfLifeMaker.mapped(args.mapped, *shape, density=density, seed=args.seed, rule=args.rule)
+    try:
+        engine = make_engine(args.engine, args.rule)
+    except ValueError as e:
+        print(e)
+        return None
+    if args.pattern is not None:
+        return GameOfLifeMaker.fromfile(args.pattern, minsize=(0, 0), engine=engine, rule=args.rule)
+    if args.empty is not None:
+        return GameOfLifeMaker.empty(*args.empty, engine=engine, rule=args.rule)
+    return GameOfLifeMaker.random(*args.random, density=args.density, seed=args.seed, engine=engine, rule=args.rule)
+
+
+# Итоговые поля переписываются пачками по столько (census: одна разметка
+# на всю стопку)
+CENSUS_BATCH = 1024
+
+
+def make_catalogue(args, rule):
+    try:
+        return Catalogue.from_directory(args.catalogue, rule or CONWAY)
+    except ValueError as e:
+        print(e)
+        return None
+
+
+def census_text(counts):
+    return "Объекты: " + (", ".join(f"{name} {count}" for (name, count) in counts.most_common()) or "нет")
+
+
+# Прогон множества случайных полей (супов) со сводкой исходов
+def run_soups(args):
+    if args.random is None:
+        print("--soups считает случайные поля: укажите --random ROWS COLS")
+        return 1
+    try:
+        make_engine(args.engine, args.rule)
+    except ValueError as e:
+        print(e)
+        return 1
+    catalogue = None
+    if args.census:
+        catalogue = make_catalogue(args, args.rule)
+        if catalogue is None:
+            return 1
+    cache = SoupCache(args.soup_cache) if args.soup_cache is not None else None
+
+    objects = Counter()
+    boards = []
+    names = {DIES: "вымерли", STABLE: "стабильны", PERIODIC: "периодичны"}
+    counts = dict.fromkeys(names, 0)
+    unfinished = 0
+    generations = 0
+    start = time.perf_counter()
+    try:
+        for k in range(args.soups):
+            seed = args.seed + k if args.seed is not None else None
+            game = GameOfLifeMaker.random(*args.random, density=args.density, seed=seed,
+                                          engine=make_engine(args.engine, args.rule), rule=args.rule)
+            game.history = None
+            tracker = SoupTracker(game, cache, args.cache_every) if cache is not None else None
+            HeadlessRun(game, tracker=tracker).run(args.generations)
+            result = tracker.result() if tracker is not None else game_outcome(game)
+            generations += game.age - 1
+            if result is None:
+                unfinished += 1
+            else:
+                counts[result[0]] += 1
+
+            if catalogue is not None:
+                if game.is_unbounded():
+                    objects += game_census(game, catalogue)
+                else:
+                    boards.append(game.state.copy())
+                if boards and (len(boards) >= CENSUS_BATCH or k == args.soups - 1):
+                    objects += sum(census(boards, catalogue), Counter())
+                    boards.clear()
+    finally:
+        if cache is not None:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{names[kind]} {counts[kind]}" for kind in names)
+    print(f"Полей: {args.soups}: {summary}, не закончились {unfinished}")
+    print(f"{elapsed:.3f} с, {args.soups / elapsed:.1f} полей/с, посчитано поколений {generations}")
+    if cache is not None:
+        print(f"Кеш: найдено {cache.hits}, не найдено {cache.misses}")
+    if catalogue is not None:
+        print(census_text(objects))
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.soups:
+        return run_soups(args)
+    game = create_game(args)
+    if game is None:
+        return 1
+    # Перемотка без интерфейса не нужна, история только замедлила бы шаги
+    game.history = None
+    checkpointer = None
+    if args.checkpoint is not None and game.is_on_disk():
+        # Продолжение игры --mapped: она и так сохраняется после каждого шага
+        print(f"Игра из {args.resume} сохраняется после каждого поколения, --checkpoint не нужен")
+    elif args.checkpoint is not None:
+        seconds = args.checkpoint_seconds
+        if seconds is None and args.checkpoint_every is None:
+            seconds = 600
+        checkpointer = checkpoint.Checkpointer(game, args.checkpoint, every=args.checkpoint_every, seconds=seconds)
+    cache = SoupCache(args.soup_cache) if args.soup_cache is not None else None
+    if args.metrics:
+        game.metrics = Metrics()
+
+    run = HeadlessRun(
+        game,
+        out=args.out,
+        snapshot_every=args.snapshot_every,
+        stats_every=args.stats_every,
+        stop_on_periodic=not args.continue_periodic,
+        checkpointer=checkpointer,
+        tracker=SoupTracker(game, cache, args.cache_every) if cache is not None else None,
+    )
+    try:
+        reason = run.run(args.generations)
+    finally:
+        if cache is not None:
+            cache.close()
+    game.flush()
+
+    print(f"Поколение {game.age}. {reason}")
+    print(f"{run.elapsed():.3f} с, {run.generations_per_second():.1f} поколений/с")
+    if args.census:
+        catalogue = make_catalogue(args, game.rule)
+        if catalogue is not None:
+            print(census_text(game_census(game, catalogue)))
+    if game.metrics is not None:
+        print(game.metrics.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
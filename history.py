@@ -0,0 +1,198 @@
+import zlib
+from collections import deque
+
+import numpy as np
+
+
+# История поколений для перемотки назад
+# Поколение хранится в виде engine.packed_bits (для поля из bool --
+# бит на клетку). Каждое KEYFRAME_EVERY-е поколение -- ключевой кадр,
+# записанный целиком, остальные -- разность (XOR) с предыдущим поколением.
+# От поколения к поколению меняется малая часть поля, поэтому разность
+# почти вся из нулей и хранится списком ненулевых 64-битных слов; если
+# ненулевых много (хаотичное поле), она хранится как есть.
+#
+# Память ограничена бюджетом в байтах: при превышении удаляются самые
+# давние ключевые кадры вместе с их разностями. Поколение восстанавливается
+# от ближайшего ключевого кадра не дольше чем за KEYFRAME_EVERY - 1 разностей.
+#
+# Пример
+#   history = History(budget=16 * 2 ** 20)
+#   history.add(age, engine.packed_bits(buf))   # поколения по порядку
+#   bits = history.get(age - 10)                 # None -- поколения нет
+#   buf = engine.from_packed_bits(bits, shape)
+
+# Бюджет памяти по умолчанию, байт
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+# Ключевой кадр -- каждое столько-то поколение
+KEYFRAME_EVERY = 64
+
+# Примерная цена записи без данных: кортеж, объекты bytes, элемент списка
+ENTRY_OVERHEAD = 150
+
+# Способы записи поколения
+_RAW = 0
+_ZLIB = 1
+_SPARSE = 2
+
+
+# Ключевой кадр: сжатый zlib, если это помогает
+def _encode_keyframe(data):
+    packed = zlib.compress(data, 1)
+    if len(packed) < data.size:
+        return _ZLIB, packed
+    return _RAW, data.tobytes()
+
+
+# Разность: 64-битные слова, длина кратна 8 байтам
+# Номер слова -- 4 байта, значение -- 8: список ненулевых слов выгоднее,
+# пока их меньше двух третей; иначе (хаотичное поле) разность хранится
+# как есть -- сжимать её zlib на каждом шаге слишком долго
+def _encode_delta(delta):
+    words = delta.view(np.uint64)
+    if np.count_nonzero(words) * 12 < delta.size:
+        index = np.flatnonzero(words)
+        return _SPARSE, index.astype(np.uint32).tobytes(), words[index].tobytes()
+    return _RAW, delta.tobytes()
+
+
+def _size(entry):
+    return ENTRY_OVERHEAD + sum(len(part) for part in entry[1:])
+
+
+# Ключевой кадр и идущие за ним разности
+# length -- длина упакованного поля, байт
+class _Segment:
+    __slots__ = ("first", "length", "keyframe", "deltas", "size")
+
+    def __init__(self, first, length, keyframe):
+        self.first = first
+        self.length = length
+        self.keyframe = keyframe
+        self.deltas = []
+        self.size = _size(keyframe)
+
+    # Последнее поколение сегмента
+    def last(self):
+        return self.first + len(self.deltas)
+
+
+class History:
+    def __init__(self, budget=DEFAULT_BUDGET, keyframe_every=KEYFRAME_EVERY):
+        self.budget = budget
+        self.keyframe_every = keyframe_every
+        self._segments = deque()
+        self._used = 0
+        # Последнее записанное поколение (для разности со следующим)
+        # и буфер разности, оба дополнены нулями до целого числа слов
+        self._last = None
+        self._delta = None
+
+    def __len__(self):
+        return sum(len(segment.deltas) + 1 for segment in self._segments)
+
+    # Занятая память, байт
+    def memory(self):
+        return self._used
+
+    # Самое раннее и самое позднее записанные поколения (None -- история пуста)
+    def first(self):
+        return self._segments[0].first if self._segments else None
+
+    def last(self):
+        return self._segments[-1].last() if self._segments else None
+
+    def clear(self):
+        self._segments.clear()
+        self._used = 0
+        self._last = None
+
+    # Копия (для контрольной точки): записи неизменяемы, копируются
+    # только списки и буфер последнего поколения
+    def copy(self):
+        other = History(self.budget, self.keyframe_every)
+        for segment in self._segments:
+            twin = _Segment(segment.first, segment.length, segment.keyframe)
+            twin.deltas = list(segment.deltas)
+            twin.size = segment.size
+            other._segments.append(twin)
+        other._used = self._used
+        if self._last is not None:
+            other._last = self._last.copy()
+            other._delta = np.zeros_like(self._delta)
+        return other
+
+    # Запись поколения generation
+    # Если оно не следует за последним записанным, более поздние поколения
+    # забываются (игра пошла по-другому после перемотки)
+    def add(self, generation, bits):
+        if self.budget <= 0:
+            return None
+        last = self.last()
+        if last is not None and generation <= last:
+            self.truncate(generation)
+            last = self.last()
+
+        n = bits.size
+        segment = self._segments[-1] if self._segments else None
+        if (segment is not None and self._last is not None and generation == last + 1
+                and len(segment.deltas) + 1 < self.keyframe_every and n == segment.length):
+            # Поля дополнены нулями до целого числа слов
+            np.bitwise_xor(bits, self._last[:n], out=self._delta[:n])
+            entry = _encode_delta(self._delta)
+            segment.deltas.append(entry)
+            segment.size += _size(entry)
+            self._used += _size(entry)
+        else:
+            segment = _Segment(generation, n, _encode_keyframe(np.asarray(bits, dtype=np.uint8)))
+            self._segments.append(segment)
+            self._used += segment.size
+            padded = -(-n // 8) * 8
+            self._last = np.zeros(padded, dtype=np.uint8)
+            self._delta = np.zeros(padded, dtype=np.uint8)
+        np.copyto(self._last[:n], bits)
+
+        # Вытеснение самых давних сегментов, последний остаётся всегда
+        while self._used > self.budget and len(self._segments) > 1:
+            self._used -= self._segments.popleft().size
+
+    # Упакованное поле поколения generation (новый массив uint8) или None
+    def get(self, generation):
+        for segment in self._segments:
+            if segment.first <= generation <= segment.last():
+                bits = np.zeros(-(-segment.length // 8) * 8, dtype=np.uint8)
+                self._apply(segment.keyframe, bits)
+                for entry in segment.deltas[:generation - segment.first]:
+                    self._apply(entry, bits)
+                return bits[:segment.length]
+        return None
+
+    # Забыть поколения начиная с generation
+    def truncate(self, generation):
+        while self._segments and self._segments[-1].first >= generation:
+            self._used -= self._segments.pop().size
+        if self._segments and self._segments[-1].last() >= generation:
+            # Разность k -- поколение first + k + 1
+            segment = self._segments[-1]
+            keep = generation - segment.first - 1
+            dropped = segment.deltas[keep:]
+            del segment.deltas[keep:]
+            freed = sum(_size(entry) for entry in dropped)
+            segment.size -= freed
+            self._used -= freed
+        # Разность со следующим поколением -- от нового ключевого кадра
+        self._last = None
+
+    # Наложение записи на bits (XOR); на нули -- само поле
+    @staticmethod
+    def _apply(entry, bits):
+        kind = entry[0]
+        if kind == _SPARSE:
+            index = np.frombuffer(entry[1], dtype=np.uint32)
+            words = bits.view(np.uint64)
+            words[index] ^= np.frombuffer(entry[2], dtype=np.uint64)
+            return None
+        data = zlib.decompress(entry[1]) if kind == _ZLIB else entry[1]
+        data = np.frombuffer(data, dtype=np.uint8)
+        np.bitwise_xor(bits[:data.size], data, out=bits[:data.size])
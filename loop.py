@@ -1,30 +1,78 @@
+import time
+from collections import deque
+
 from PyQt5.QtCore import QTimer
 
 
+# Игровой цикл: таймер кадров
+# delay -- желаемая задержка между поколениями, мс (0 -- без задержки).
+# Пока она не меньше интервала кадра при MAX_FPS, каждый тик -- одно поколение.
+# Если меньше, тики идут с частотой MAX_FPS, а за тик считается несколько
+# поколений: до generations_per_tick, но не дольше time_budget секунд,
+# чтобы кадры успевали показываться. Отрисовывается только последнее.
 class GameOfLifeLoop(QTimer):
+    # Предельная частота кадров, кадров/с
+    MAX_FPS = 60
+    # Доля интервала кадра, которую можно потратить на поколения
+    BUDGET_FRACTION = 0.8
+    # За сколько последних кадров считается скорость, поколений/с
+    RATE_WINDOW = 30
+
     def __init__(self):
         super().__init__()
 
         self.going = False
 
         self.delay = 100
+        # Интервал тика, мс; поколений за тик и время на них, с (None -- без ограничения)
+        self.interval = 100
+        self.generations_per_tick = 1
+        self.time_budget = None
+        # Пары (время, поколение) показанных кадров
+        self._ages = deque(maxlen=self.RATE_WINDOW)
+
         self.timeout.connect(self._loop)
         self.setSingleShot(True)
 
     def _loop(self):
-        if self.going and self.isSingleShot() and self.delay > 0:
-            self.start(self.delay)
+        if self.going and self.isSingleShot():
+            self.start(self.interval)
 
     def set_delay(self, delay_milliseconds):
         self.delay = delay_milliseconds
 
+        frame_interval = 1000 / self.MAX_FPS
+        if self.delay >= frame_interval:
+            self.interval = round(self.delay)
+            self.generations_per_tick = 1
+            self.time_budget = None
+        else:
+            self.interval = round(frame_interval)
+            # Без задержки -- сколько успеется за time_budget
+            self.generations_per_tick = round(frame_interval / self.delay) if self.delay > 0 else 1 << 30
+            self.time_budget = self.BUDGET_FRACTION * frame_interval / 1000
+
+    # Скорость
+
+    # Поколение показанного кадра
+    def record(self, age):
+        self._ages.append((time.perf_counter(), age))
+
+    # Фактическая скорость по последним кадрам, поколений/с
+    def generations_per_second(self):
+        if len(self._ages) < 2:
+            return 0.0
+        (t0, age0), (t1, age1) = self._ages[0], self._ages[-1]
+        return (age1 - age0) / (t1 - t0) if t1 > t0 else 0.0
+
     def play(self):
         if self.going:
             return None
 
         self.stop()
         self.going = True
-        self.start(self.delay)
+        self._ages.clear()
+        self.start(self.interval)
 
     def pause(self):
         if not self.going:
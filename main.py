@@ -1,6 +1,11 @@
 import ast
+import checkpoint
+from engine import SparseEngine
+from history import History
 from loop import GameOfLifeLoop
+from metrics import Metrics
 from model import GameOfLifeMaker
+from rules import parse_rule
 from view import MainWindow
 from PyQt5.QtWidgets import QApplication
 import configparser
@@ -12,10 +17,35 @@ if __name__ == "__main__":
     cfgmain = configparser.ConfigParser()
     cfgmain.read('utils/config.ini')
     # game = GameOfLifeMaker.fromtxt("patterns/glider.txt")
-    game = GameOfLifeMaker.empty(*ast.literal_eval(cfgmain['MAIN']['SIZE']))
+    # Правило игры (см. rules.py): [MAIN] rule = B3/S23
+    rule = parse_rule(cfgmain.get('MAIN', 'rule', fallback='B3/S23'))
+    # Неограниченная плоскость вместо тора: [MAIN] unbounded = true,
+    # size -- размер видимого окна
+    engine = SparseEngine(rule=rule) if cfgmain.getboolean('MAIN', 'unbounded', fallback=False) else None
+    game = GameOfLifeMaker.empty(*ast.literal_eval(cfgmain['MAIN']['SIZE']), engine=engine, rule=rule)
+    # История для перемотки: [HISTORY] budget_mb -- память под неё, МБ (0 -- без истории)
+    budget = cfgmain.getfloat('HISTORY', 'budget_mb', fallback=64) * 2 ** 20
+    game.history = History(budget) if budget > 0 else None
+    # Контрольные точки: [CHECKPOINT] directory -- каталог (пусто -- без них),
+    # every -- каждые столько поколений, seconds -- каждые столько секунд,
+    # resume = true -- начать с последней точки каталога
+    # (вместе с её историей)
+    checkpoint_dir = cfgmain.get('CHECKPOINT', 'directory', fallback='')
+    if checkpoint_dir and cfgmain.getboolean('CHECKPOINT', 'resume', fallback=False):
+        game = checkpoint.resume(checkpoint_dir) or game
     game_loop = GameOfLifeLoop()
+    # Замеры времени фаз и строка статистики: [METRICS] enabled = true
+    metrics = Metrics() if cfgmain.getboolean('METRICS', 'enabled', fallback=False) else None
 
-    window = MainWindow(game, game_loop)
+    checkpointer = None
+    if checkpoint_dir:
+        checkpointer = checkpoint.Checkpointer(
+            game, checkpoint_dir,
+            every=cfgmain.getint('CHECKPOINT', 'every', fallback=0) or None,
+            seconds=cfgmain.getfloat('CHECKPOINT', 'seconds', fallback=600) or None,
+        )
+
+    window = MainWindow(game, game_loop, metrics, checkpointer)
     window.show()
 
     app.exec_()
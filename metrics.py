@@ -0,0 +1,148 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+# Замеры времени по фазам игры
+# Включаются явно: у GameOfLife и GameFieldView есть атрибут metrics
+# (по умолчанию None), MainWindow принимает metrics в конструкторе.
+# Пока metrics -- None, код фаз выполняет лишь проверку на None.
+#
+# Пример
+#   metrics = Metrics()
+#   game.metrics = metrics
+#   game.advance(100)
+#   print(metrics.summary())
+#   metrics.snapshot()  # словарь со счётчиками, временами и частотой кадров
+#
+# Имена фаз: "game.*" -- шаг GameOfLife.next, "view.*" -- отображение,
+# "frame.*" -- показ кадра в MainWindow.
+# Замеры можно вести из нескольких потоков: начало фазы (start/lap)
+# у каждого потока своё.
+
+
+# Гистограмма времён
+# Корзины -- степени двойки в микросекундах: корзина k содержит
+# времена от 2^(k-1) до 2^k мкс (корзина 0 -- меньше микросекунды)
+class Histogram:
+    BINS = 32
+
+    def __init__(self):
+        self.bins = [0] * self.BINS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        k = math.frexp(seconds * 1e6)[1] if seconds >= 1e-6 else 0
+        self.bins[min(k, self.BINS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    # Оценка сверху для доли q времён (по границе корзины), секунды
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for (k, n) in enumerate(self.bins):
+            seen += n
+            if seen >= rank:
+                return min(2.0 ** k * 1e-6, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean(),
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "bins": list(self.bins),
+        }
+
+
+class Metrics:
+    # Сколько последних кадров учитывается в частоте кадров
+    FRAME_WINDOW = 60
+
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self._laps = threading.local()
+        self._frames = deque(maxlen=self.FRAME_WINDOW)
+        self.requested_fps = None
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+        self._laps = threading.local()
+        self._frames.clear()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        histogram = self.timings.get(name)
+        if histogram is None:
+            histogram = self.timings[name] = Histogram()
+        histogram.add(seconds)
+
+    # Замер подряд идущих фаз: start() и затем lap(name) после каждой фазы
+    def start(self):
+        self._laps.start = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.add_time(name, now - self._laps.start)
+        self._laps.start = now
+
+    # Обёртка функции, замеряющая время каждого вызова
+    def timed(self, name, function):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+        return wrapper
+
+    # Частота кадров: frame() вызывается на каждом кадре
+    def frame(self):
+        self._frames.append(time.perf_counter())
+
+    def fps(self):
+        if len(self._frames) < 2:
+            return 0.0
+        elapsed = self._frames[-1] - self._frames[0]
+        return (len(self._frames) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "timings": {name: h.snapshot() for (name, h) in self.timings.items()},
+            "fps": self.fps(),
+            "requested_fps": self.requested_fps,
+        }
+
+    # Краткая сводка: кадры в секунду и среднее время фаз, мс
+    def summary(self):
+        lines = []
+        if self.requested_fps is not None:
+            lines.append(f"FPS {self.fps():.1f} / {self.requested_fps:.1f}")
+        for (name, h) in sorted(self.timings.items()):
+            lines.append(f"{name}: {h.mean() * 1e3:.3f} мс (p95 {h.percentile(0.95) * 1e3:.3f}, n={h.count})")
+        for (name, n) in sorted(self.counters.items()):
+            lines.append(f"{name}: {n}")
+        return "\n".join(lines)
@@ -1,23 +1,60 @@
 import ast
+import os
+import struct
+import zlib
 
 import numpy as np
-from collections import deque
+
+from cycles import CycleDetector, DEFAULT_BUDGET, fingerprint
+from engine import MappedEngine, default_engine, select_engine
+from formats import read_pattern
+from hashlife import HashLife, HashLifeUniverse
+from history import DEFAULT_BUDGET as DEFAULT_HISTORY_BUDGET, History
+from rules import CONWAY, parse_rule
+from stats import DEFAULT_CAPACITY as DEFAULT_STATS_CAPACITY, StatsSeries
 
 
 class GameOfLife:
-    def __init__(self, initial_state):
+    def __init__(self, initial_state, engine=None, periodic_budget=DEFAULT_BUDGET, rule=None,
+                 history_budget=DEFAULT_HISTORY_BUDGET, stats_capacity=DEFAULT_STATS_CAPACITY):
         try:
-            # Состояния хранятся в матрице из bool
+            # Движок вычисления поколений (см. engine.py)
+            # По умолчанию выбирается по размеру поля и правилу (см. rules.py,
+            # без правила -- B3/S23); если движок задан, правило берётся у него
+            self.engine = engine or select_engine(initial_state.shape, rule or CONWAY)
+
+            # Состояния хранятся в буферах движка
+            # Снаружи они доступны как матрицы из bool (свойства ниже)
             # A[i, j] == True -- клетка i, j живая
-            self.initial_state = initial_state.copy()
-            self.state = initial_state.copy()
-            self.prev_state = initial_state.copy()
+            self._initial_state = self.engine.pack(initial_state)
+            self._state = self.engine.copy(self._initial_state)
+            self._prev_state = self.engine.copy(self._initial_state)
+            # Распакованное текущее состояние (для упакованных движков)
+            self._state_view = None
+            # HashLife для advance, создаётся при первом использовании
+            self._hashlife = None
 
             # Номер поколения
             self.age = 1
 
-            # Предыдущие состояния
-            self.history = deque(maxlen=100)
+            # Отпечатки предыдущих состояний для поиска периода (см. cycles.py)
+            # periodic_budget -- сколько байт памяти им отводится
+            self._cycles = CycleDetector(periodic_budget)
+            # Упакованное текущее состояние и его отпечаток,
+            # вычисляются один раз за поколение
+            self._state_bits = None
+            self._state_digest = None
+
+            # История поколений для перемотки назад (см. history.py)
+            # history_budget -- сколько байт памяти ей отводится;
+            # None вместо истории -- без перемотки
+            self.history = History(history_budget) if history_budget else None
+
+            # Статистика последних stats_capacity поколений (см. stats.py)
+            # или None; сводка последнего шага (engine.StepStats), пока
+            # поле после него не менялось, иначе None
+            self.stats = StatsSeries(stats_capacity) if stats_capacity else None
+            self._step_stats = None
 
             # Завершена ли игра (все клетки мертвы или состояние стабильное)
             # Если да, то хранится причина завершения в виде строки
@@ -28,8 +65,184 @@ class GameOfLife:
             # Если да, то хранится информация в виде строки об этом состоянии
             self._periodic = False
             self._periodic_info = None
+            # Поколения первого появления поля и его повтора (periodic_span)
+            self._periodic_span = None
+
+            # Замеры времени фаз шага (metrics.Metrics) или None
+            self.metrics = None
+
+            # Останавливается ли next на завершённой игре; False -- шаги и
+            # проверки идут дальше (например, для замеров скорости)
+            self.stop_when_finished = True
+        except Exception as e:
+            print(e)
+
+    # Состояния в виде матриц bool
+    # Для упакованного поля распаковка происходит только при обращении
+    # (отображение, сохранение); изменять клетки нужно через toggle_cell
+
+    @property
+    def state(self):
+        if self._state_view is None:
+            self._state_view = self.engine.unpack(self._state)
+        return self._state_view
+
+    @state.setter
+    def state(self, matrix):
+        self._state = self.engine.pack(matrix)
+        self._state_view = None
+        self._state_digest = None
+        self._step_stats = None
+
+    @property
+    def prev_state(self):
+        return self.engine.unpack(self._prev_state)
+
+    @prev_state.setter
+    def prev_state(self, matrix):
+        self._prev_state = self.engine.pack(matrix)
+
+    @property
+    def initial_state(self):
+        return self.engine.unpack(self._initial_state)
+
+    @initial_state.setter
+    def initial_state(self, matrix):
+        self._initial_state = self.engine.pack(matrix)
+
+    # Правило игры (rules.Rule)
+    @property
+    def rule(self):
+        return self.engine.rule
+
+    # Неограниченная плоскость (engine.SparseEngine) вместо тора
+    # Тогда state и остальные матрицы -- окно на плоскости размера
+    # height() x width(), которое можно сдвигать (pan)
+    def is_unbounded(self):
+        return getattr(self.engine, "unbounded", False)
+
+    # Поле в файлах на диске (engine.MappedEngine): каталог движка -- это и
+    # сохранение игры, оно обновляется после каждого шага
+    def is_on_disk(self):
+        return getattr(self.engine, "on_disk", False)
+
+    def _commit(self):
+        if self.is_on_disk():
+            self.engine.commit(self._initial_state, self._state, self._prev_state, self.age)
+
+    # Записать поколение и дождаться записи поля на диск (для поля в файлах)
+    def flush(self):
+        if self.is_on_disk():
+            self._commit()
+            self.engine.flush(self._initial_state, self._state, self._prev_state)
+
+    # Продолжение игры с готовых буферов движка, без копирования
+    # (сохранённая игра движка MappedEngine, см. GameOfLifeMaker.open_mapped)
+    def restore(self, initial, state, prev, age):
+        try:
+            self._initial_state, self._state, self._prev_state = initial, state, prev
+            self._state_view = None
+            self._state_digest = None
+            self._step_stats = None
+            self._cycles.clear()
+            if self.history is not None:
+                self.history.clear()
+            if self.stats is not None:
+                self.stats.clear()
+            self.age = age
+            self._finished = False
+            self._finish_reason = None
+            self._periodic = False
+            self._periodic_info = None
+            self._periodic_span = None
+            self._commit()
+        except Exception as e:
+            print(e)
+
+    # Снимок полного состояния игры для контрольной точки (см. checkpoint.py):
+    # словарь из копий, который можно записывать в другом потоке, пока
+    # игра идёт дальше. Поля -- в виде engine.packed_bits (для поля из bool
+    # в 8 раз меньше самого поля), вместе с отпечатками для поиска периода,
+    # историей перемотки и статистикой
+    def snapshot(self):
+        if self.is_on_disk():
+            raise ValueError("Поле в файлах уже сохраняется после каждого шага (GameOfLife.flush)")
+        engine = self.engine
+        return {
+            "engine": engine.name,
+            "rule": str(self.rule),
+            "shape": (self.height(), self.width()),
+            "origin": self.origin(),
+            "age": self.age,
+            "initial": np.array(engine.packed_bits(self._initial_state)),
+            "state": np.array(engine.packed_bits(self._state)),
+            "prev": np.array(engine.packed_bits(self._prev_state)),
+            "finished": (self._finished, self._finish_reason),
+            "periodic": (self._periodic, self._periodic_info),
+            "periodic_span": self._periodic_span,
+            "cycles": self._cycles.copy(),
+            "history": self.history.copy() if self.history is not None else None,
+            "stats": self.stats.copy() if self.stats is not None else None,
+        }
+
+    # Восстановление из снимка (snapshot) той же игры: движок должен
+    # считать то же правило, размер поля берётся из снимка
+    def load_snapshot(self, snapshot):
+        engine, shape = self.engine, tuple(snapshot["shape"])
+        if snapshot["rule"] != str(self.rule):
+            raise ValueError(f"Снимок игры с правилом {snapshot['rule']}, а движок считает {self.rule}")
+        if self.is_unbounded():
+            engine.origin, engine.window = tuple(snapshot["origin"]), shape
+        self._initial_state = engine.from_packed_bits(snapshot["initial"], shape)
+        self._state = engine.from_packed_bits(snapshot["state"], shape)
+        self._prev_state = engine.from_packed_bits(snapshot["prev"], shape)
+        self._state_view = None
+        self._state_digest = None
+        self._step_stats = None
+        self.age = snapshot["age"]
+        self._finished, self._finish_reason = snapshot["finished"]
+        self._periodic, self._periodic_info = snapshot["periodic"]
+        self._periodic_span = snapshot.get("periodic_span")
+        self._cycles = snapshot["cycles"]
+        self.history = snapshot["history"]
+        self.stats = snapshot["stats"]
+
+    # Сдвиг окна на di строк и dj столбцов (только для неограниченной плоскости)
+    def pan(self, di, dj):
+        try:
+            self.engine.move(di, dj)
+            self._state_view = None
         except Exception as e:
             print(e)
+
+    # Левый верхний угол окна на плоскости
+    def origin(self):
+        return self.engine.origin if self.is_unbounded() else (0, 0)
+
+    # Число живых клеток (на плоскости -- всех, а не только в окне)
+    # После шага берётся из его сводки, без подсчёта
+    def population(self):
+        if self._step_stats is not None:
+            return self._step_stats.population
+        if self.is_unbounded():
+            return self.engine.population(self._state)
+        return int(np.count_nonzero(self.state))
+
+    # Живые клетки: матрица и координаты её левого верхнего угла
+    # На плоскости -- по границам узора, иначе -- всё поле
+    def live_region(self):
+        if self.is_unbounded():
+            return self.engine.to_matrix(self._state)
+        return self.state, (0, 0)
+
+    # Состояния клеток текущего поколения: для правил Generations -- матрица
+    # uint8 с угасающими клетками (см. engine.py), иначе -- то же, что state
+    @property
+    def cell_states(self):
+        if self.rule.states == 2:
+            return self.state
+        return self.engine.unpack_states(self._state)
+
     # Get методы состояния игры и его описания
 
     def is_finished(self):
@@ -44,105 +257,251 @@ class GameOfLife:
     def periodic_info(self):
         return self._periodic_info
 
+    # Пара поколений (первое появление поля, его повтор) или None;
+    # период -- их разность
+    def periodic_span(self):
+        return self._periodic_span
+
     # Полная очистка игры, размеры сохраняются
     def clear(self):
         try:
-            self.initial_state[:, :] = False
-            self.prev_state[:, :] = False
-            self.state[:, :] = False
-            self.history.clear()
+            self.engine.clear(self._initial_state)
+            self.engine.clear(self._prev_state)
+            self.engine.clear(self._state)
+            self._state_view = None
+            self._cycles.clear()
+            if self.history is not None:
+                self.history.clear()
+            if self.stats is not None:
+                self.stats.clear()
+            self._step_stats = None
+            self._state_digest = None
             self.age = 1
             self._finished = False
             self._finish_reason = None
             self._periodic = False
             self._periodic_info = None
+            self._periodic_span = None
             print('CLEAN DONE')
         except Exception as e:
             print(e)
 
     # Высота и ширина игрового поля в кол-ве клеток
     def height(self):
-        return self.state.shape[0]
+        return self.engine.shape(self._state)[0]
 
     def width(self):
-        return self.state.shape[1]
+        return self.engine.shape(self._state)[1]
 
     # Смена состояния клетки i, j
     def toggle_cell(self, i, j):
         try:
-            self.state[i, j] = not self.state[i, j]
+            value = not self.engine.get(self._state, i, j)
+            self.engine.set(self._state, i, j, value)
+            self._state_view = None
+            self._state_digest = None
+            self._step_stats = None
             if self.age == 1:
-                self.initial_state[i, j] = self.state[i, j]
+                self.engine.set(self._initial_state, i, j, value)
         except Exception as e:
             print(e)
 
     # Шаг игры
     def next(self):
         try:
-            if self._finished:
+            if self._finished and self.stop_when_finished:
                 return None
+            metrics = self.metrics
+            if metrics is not None:
+                metrics.start()
+
+            # Сохранение отпечатка текущего состояния
+            self._fingerprint_state()
+            if metrics is not None:
+                metrics.lap("game.fingerprint")
+            self._cycles.add(self._state_bits, self._state_digest, self.age)
+            if metrics is not None:
+                metrics.lap("game.history")
+            if self.history is not None:
+                self.history.add(self.age, self._state_bits)
+                if metrics is not None:
+                    metrics.lap("game.rewind_history")
 
             # Смена состояний
-            self.prev_state, self.state = self.state, self.prev_state
-            # Сохранение истории
-            self.history.appendleft(self.prev_state.copy())
-
-            # Обозначение клеток-соседей (компас)
-            # nw nn ne
-            # ww    ee
-            # sw ss se
-
-            N, M = self.prev_state.shape
-            for i in range(N):
-                for j in range(M):
-                    n, s = (i - 1) % N, (i + 1) % N
-                    w, e = (j - 1) % M, (j + 1) % M
-
-                    ww = self.prev_state[i, w]
-                    ee = self.prev_state[i, e]
-                    nn = self.prev_state[n, j]
-                    ss = self.prev_state[s, j]
-                    nw = self.prev_state[n, w]
-                    ne = self.prev_state[n, e]
-                    sw = self.prev_state[s, w]
-                    se = self.prev_state[s, e]
-
-                    # print(i, j)
-                    # print((n, w), (n, j), (n, e))
-                    # print((i, w), (i, j), (i, e))
-                    # print((s, w), (s, j), (s, e))
-
-                    live_neighbours = (
-                             int(ww) + int(ee) + int(nn) + int(ss)
-                           + int(nw) + int(ne) + int(sw) + int(se)
-                    )
-
-                    # print(f"live_neighbours = {live_neighbours}")
-
-                    if self.prev_state[i, j]:
-                        # Правила для живой клетки
-                        self.state[i, j] = live_neighbours == 2 or live_neighbours == 3
-                    else:
-                        # Правило для мёртвой клетки
-                        self.state[i, j] = live_neighbours == 3
+            self._prev_state, self._state = self._state, self._prev_state
+            self._state_view = None
+            self._state_digest = None
+
+            # Вычисление нового поколения в буфер state вместе со сводкой шага
+            self._step_stats = self.engine.step(self._prev_state, self._state, stats=True)
+            if metrics is not None:
+                metrics.lap("game.step")
 
             self.age += 1
+            if self.stats is not None:
+                self.stats.add(self.age, self._step_stats)
+            self._commit()
 
             if not self._periodic:
                 self._finished = self._check_finished()
+                if metrics is not None:
+                    metrics.lap("game.check_finished")
                 self._periodic = self._check_periodic()
+                if metrics is not None:
+                    metrics.lap("game.check_periodic")
+
+            if self.is_on_disk():
+                # Поле в файлах может не поместиться в память целиком
+                if metrics is not None:
+                    metrics.count("game.generations")
+                return None
+            state = self.state
+            if metrics is not None:
+                metrics.lap("game.unpack")
+                metrics.count("game.generations")
+            return state
+        except Exception as e:
+            print(e)
 
+    # Переход сразу на n поколений вперёд
+    # Если стороны поля -- степени двойки, а правило подходит HashLife,
+    # первые n - 1 поколений считаются HashLife (см. hashlife.py) за время,
+    # почти не зависящее от n; на неограниченной плоскости -- всегда
+    # (HashLifeUniverse); иначе поколения считаются по одному. Последний шаг -- обычный next,
+    # а в статистику (stats) попадает только это поколение.
+    # Завершение и периодичность внутри перехода ищутся отдельно (_jump),
+    # с теми же поколениями в описании, что и при счёте по одному
+    def advance(self, n):
+        try:
+            if self._finished or n <= 0:
+                return self.state
+
+            if n > 1 and (self.is_unbounded() or (HashLife.supports_rule(self.rule)
+                                                  and HashLife.supports_torus(self.height(), self.width()))):
+                if self._hashlife is None:
+                    self._hashlife = HashLife(rule=self.rule)
+                self._jump(n - 1)
+                n = 1
+
+            for _ in range(n):
+                if self._finished:
+                    break
+                self.next()
             return self.state
         except Exception as e:
             print(e)
 
+    # Переход HashLife на k поколений вперёд
+    # Поколения внутри перехода не проходят через next, поэтому проверки
+    # next делаются здесь по поколениям перехода s_0 .. s_k (_JumpStates):
+    #   - завершение: s_t пусто или s_t == s_(t-1); раз наступив, оно не
+    #     проходит, поэтому первое такое t ищется делением пополам, и игра
+    #     останавливается на нём, как остановилась бы next;
+    #   - периодичность: наименьший период p <= PERIOD_PROBE, с которым
+    #     s_k == s_(k-p), и первое t, с которого s_t == s_(t+p) (тоже
+    #     делением пополам), -- пара поколений (t, t + p).
+    # Ограничения: период длиннее PERIOD_PROBE находит уже next после
+    # перехода, и пара поколений считается от конца перехода; если цикл
+    # начался ещё до перехода, пара считается от его начала
+    def _jump(self, k):
+        states = _JumpStates(self)
+        age = self.age
+
+        def finished(t):
+            return states.is_empty(t) or states.key(t) == states.key(t - 1)
+
+        end = k
+        if finished(k):
+            end = _first(1, k, finished)
+            if states.is_empty(end):
+                self._finish_reason = f"Все клетки мертвы. Поколение {age + end}."
+            else:
+                self._finish_reason = f"Стабильная конфигурация. Поколение {age + end}."
+            self._finished = True
+        elif not self._periodic:
+            # Поколения k - PERIOD_PROBE .. k -- по порядку, по одному шагу
+            for t in range(max(k - self.PERIOD_PROBE, 0), k + 1):
+                states.get(t)
+            last = states.key(k)
+            period = next((p for p in range(2, min(self.PERIOD_PROBE, k) + 1) if states.key(k - p) == last), None)
+            if period is not None:
+                start = _first(0, k - period, lambda t: states.key(t) == states.key(t + period))
+                self._periodic = True
+                self._periodic_info = (f"Периодическая конфигурация. "
+                                       f"Поколения {age + start} и {age + start + period}.")
+                self._periodic_span = (age + start, age + start + period)
+
+        self._state = states.pack(end)
+        self._prev_state = states.pack(end - 1)
+        self._state_view = None
+        self._state_digest = None
+        self._step_stats = None
+        self.age = age + end
+
+    # Переход к поколению generation
+    # Назад и вперёд в пределах истории поле берётся из истории, дальше
+    # вперёд -- считается (advance). Возвращает state или None, если
+    # поколения нет в истории (вытеснено или пропущено advance)
+    def seek(self, generation):
+        try:
+            history = self.history
+            if history is not None and history.first() is not None and history.first() <= generation <= history.last():
+                # Текущее поколение тоже попадает в историю, чтобы к нему
+                # можно было вернуться
+                if self.age > history.last():
+                    self._fingerprint_state()
+                    history.add(self.age, self._state_bits)
+                bits = history.get(generation)
+                if bits is None:
+                    # Поколение в промежутке, который advance пропустил
+                    return None
+                prev = history.get(generation - 1)
+                shape = (self.height(), self.width())
+                self._state = self.engine.from_packed_bits(bits, shape)
+                self._prev_state = (self.engine.from_packed_bits(prev, shape) if prev is not None
+                                    else self.engine.copy(self._state))
+                self._state_view = None
+                self._state_digest = None
+                self._step_stats = None
+                self._cycles.truncate(generation)
+                if self.stats is not None:
+                    self.stats.truncate(generation + 1)
+                self.age = generation
+                self._finished = False
+                self._finish_reason = None
+                self._periodic = False
+                self._periodic_info = None
+                self._periodic_span = None
+                return self.state
+            if generation >= self.age:
+                return self.advance(generation - self.age)
+            return None
+        except Exception as e:
+            print(e)
+
+    # Перемотка на n поколений назад, не дальше начала истории
+    def rewind(self, n=1):
+        first = self.history.first() if self.history is not None else None
+        if first is None:
+            return None
+        return self.seek(max(first, self.age - n))
+
+    # Для правил с двумя состояниями ответ -- по сводке шага, без прохода
+    # по полю: пустое поле -- население 0, стабильное -- ни рождений, ни смертей
     def _check_finished(self):
         try:
-            if np.all(self.state == False):
+            stats = self._step_stats if self.rule.states == 2 else None
+            if stats is not None:
+                empty, stable = stats.population == 0, stats.births == stats.deaths == 0
+            else:
+                empty = self.engine.is_empty(self._state)
+                stable = not empty and self.engine.equal(self._state, self._prev_state)
+
+            if empty:
                 self._finish_reason = f"Все клетки мертвы. Поколение {self.age}."
                 return True
 
-            if np.all(self.state == self.prev_state):
+            if stable:
                 self._finish_reason = f"Стабильная конфигурация. Поколение {self.age}."
                 return True
 
@@ -150,24 +509,103 @@ class GameOfLife:
         except Exception as e:
             print(e)
 
+    # Наибольший период, который ищется внутри перехода HashLife (_jump)
+    PERIOD_PROBE = 64
+
+    def _fingerprint_state(self):
+        if self._state_digest is None:
+            self._state_bits = self.engine.packed_bits(self._state)
+            self._state_digest = fingerprint(self._state_bits)
+
     def _check_periodic(self):
-        # Просмотр истории, сравнение с текущим состоянием
+        # Поиск текущего состояния среди отпечатков предыдущих
         try:
-            for (i, state) in enumerate(self.history):
-                if i == 0:  # Игнорирование предыдущего состояния (стабильный случай)
-                    continue
-                if np.all(self.state == state):
-                    self._periodic_info = f"Периодическая конфигурация. Поколения {self.age - i - 1} и {self.age}."
-                    return True
-            return False
+            self._fingerprint_state()
+            generation = self._cycles.find(self._state_bits, self._state_digest)
+            # Игнорирование предыдущего состояния (стабильный случай)
+            if generation is None or generation == self.age - 1:
+                return False
+            self._periodic_info = f"Периодическая конфигурация. Поколения {generation} и {self.age}."
+            self._periodic_span = (generation, self.age)
+            return True
         except Exception as e:
             print(e)
 
 
+# Наименьшее t из lo .. hi, для которого test(t) верно (test(hi) верно, и
+# раз став верным, test остаётся верным)
+def _first(lo, hi, test):
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if test(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+# Поколения перехода HashLife: s_t -- поле через t поколений после текущего
+# Каждое поле считается один раз, от ближайшего уже посчитанного до него:
+# следующее за посчитанным на торе -- шагом движка в памяти, остальные -- HashLife
+class _JumpStates:
+    def __init__(self, game):
+        self.game = game
+        self.hashlife = game._hashlife
+        self.unbounded = game.is_unbounded()
+        if self.unbounded:
+            matrix, (top, left) = game.engine.to_matrix(game._state)
+        else:
+            matrix, (top, left) = game.state.copy(), (0, 0)
+        self._states = {0: (matrix, top, left)}
+        self._keys = {}
+        self._engine = None
+
+    # Матрица и координаты её левого верхнего угла
+    def get(self, t):
+        state = self._states.get(t)
+        if state is None:
+            base = max(s for s in self._states if s < t)
+            matrix, top, left = self._states[base]
+            if not self.unbounded and base == t - 1:
+                if self._engine is None:
+                    self._engine = default_engine(self.game.rule)
+                engine = self._engine
+                src = engine.pack(matrix)
+                dst = engine.zeros(matrix.shape)
+                engine.step(src, dst)
+                matrix = np.array(engine.unpack(dst))
+            elif self.unbounded:
+                universe = HashLifeUniverse.from_matrix(matrix, top, left, self.hashlife)
+                universe.advance(t - base)
+                matrix, (top, left) = universe.to_matrix()
+            else:
+                matrix = self.hashlife.advance_torus(matrix, t - base)
+            state = self._states[t] = (matrix, top, left)
+        return state
+
+    # Ключ для сравнения полей
+    def key(self, t):
+        key = self._keys.get(t)
+        if key is None:
+            matrix, top, left = self.get(t)
+            key = self._keys[t] = (top, left, matrix.shape, np.packbits(matrix).tobytes())
+        return key
+
+    def is_empty(self, t):
+        return not self.get(t)[0].any()
+
+    # Буфер движка игры
+    def pack(self, t):
+        matrix, top, left = self.get(t)
+        if self.unbounded:
+            return self.game.engine.from_matrix(matrix, top, left)
+        return self.game.engine.pack(matrix)
+
+
 # Утилиты для создания/изменения игры
 class GameOfLifeMaker:
     @classmethod
-    def fromio(cls, io):
+    def fromio(cls, io, engine=None, rule=None):
         try:
             rows, cols = None, None
 
@@ -186,43 +624,138 @@ class GameOfLifeMaker:
 
             io.readline()
             state = GameOfLifeLoader.string_to_matrix(io.read(), minsize=(rows, cols))
-            return GameOfLife(state)
+            return GameOfLife(state, engine, rule=rule)
         except Exception as e:
             print(e)
 
     # Загрузка из файла формата patterns/glider.txt
     @classmethod
-    def fromtxt(cls, path):
+    def fromtxt(cls, path, engine=None, rule=None):
         try:
             with open(path) as io:
-                return GameOfLifeMaker.fromio(io)
+                return GameOfLifeMaker.fromio(io, engine, rule)
+        except Exception as e:
+            print(e)
+
+    # Загрузка из файла по расширению: .txt -- формат patterns/glider.txt,
+    # .rle, .lif, .life, .cells -- см. formats.py
+    # Узор ставится в левый верхний угол поля размера не меньше minsize
+    # Если ни правило, ни движок не заданы, берётся правило из файла (RLE)
+    @classmethod
+    def fromfile(cls, path, minsize=(30, 30), engine=None, rule=None):
+        if os.path.splitext(path)[1].lower() == ".txt":
+            return GameOfLifeMaker.fromtxt(path, engine, rule)
+        try:
+            pattern = read_pattern(path)
+            if rule is None and engine is None and pattern.rule:
+                rule = parse_rule(pattern.rule)
+            cells = pattern.cells
+            N, M = max(cells.shape[0], minsize[0]), max(cells.shape[1], minsize[1])
+            state = np.zeros((N, M), dtype=np.bool_)
+            state[:cells.shape[0], :cells.shape[1]] = cells
+            return GameOfLife(state, engine, rule=rule)
         except Exception as e:
             print(e)
 
     # Создать пустую игру с полем размера w x h
+    # Движок (см. engine.py) по умолчанию выбирается по размеру поля
     @classmethod
-    def empty(cls, w, h):
+    def empty(cls, w, h, engine=None, rule=None):
         try:
             m = np.zeros((w, h), dtype=np.bool_)
-            return GameOfLife(m)
+            return GameOfLife(m, engine, rule=rule)
+        except Exception as e:
+            print(e)
+
+    # Поле w x h в файлах каталога path (engine.MappedEngine), для полей
+    # больше оперативной памяти; density > 0 -- случайное поле
+    # Поле создаётся блоками строк, целиком в памяти не бывает.
+    # История для перемотки не ведётся: её ключевые кадры -- копии поля
+    @classmethod
+    def mapped(cls, path, w, h, density=0.0, seed=None, rule=None):
+        try:
+            engine = MappedEngine(path, rule or CONWAY)
+            game = GameOfLife(RandomRows((w, h), density, seed), engine, history_budget=0)
+            game.flush()
+            return game
+        except Exception as e:
+            print(e)
+
+    # Продолжение игры из каталога path (см. mapped); None -- игры там нет
+    @classmethod
+    def open_mapped(cls, path):
+        try:
+            saved = MappedEngine.open(path)
+            if saved is None:
+                print(f"В каталоге {path} нет сохранённой игры")
+                return None
+            engine, initial, state, prev, age = saved
+            game = GameOfLife(np.zeros((1, 1), dtype=np.bool_), engine, history_budget=0)
+            game.restore(initial, state, prev, age)
+            return game
+        except Exception as e:
+            print(e)
+
+    # Случайное поле w x h, каждая клетка живая с вероятностью density
+    @classmethod
+    def random(cls, w, h, density=0.5, seed=None, engine=None, rule=None):
+        try:
+            rng = np.random.default_rng(seed)
+            m = rng.random((w, h)) < density
+            return GameOfLife(m, engine, rule=rule)
         except Exception as e:
             print(e)
 
     # Обновление игры по записи из базы данных
+    # Поля -- в двоичном формате GameOfLifeLoader.matrix_to_bytes
+    # или в старом текстовом (строки из "x" и ".")
     @classmethod
-    def update_from_database(cls, game, age: int, init_str: str, curr_str: str, size=None):
+    def update_from_database(cls, game, age: int, init_str, curr_str, size=None):
         try:
-            size = ast.literal_eval(size)
-            size = (size or (game.width(), game.height()))
+            if GameOfLifeLoader.is_blob(init_str):
+                initial_state = GameOfLifeLoader.bytes_to_matrix(init_str)
+                state = GameOfLifeLoader.bytes_to_matrix(curr_str)
+            else:
+                size = ast.literal_eval(size)
+                size = (size or (game.width(), game.height()))
+                initial_state = GameOfLifeLoader.string_to_matrix(init_str, minsize=size)
+                state = GameOfLifeLoader.string_to_matrix(curr_str, minsize=size)
 
             game.clear()
             game.age = age
-            game.initial_state = GameOfLifeLoader.string_to_matrix(init_str, minsize=size)
-            game.prev_state = game.initial_state.copy()
-            game.state = GameOfLifeLoader.string_to_matrix(curr_str, minsize=size)
+            game.initial_state = initial_state
+            game.prev_state = initial_state
+            game.state = state
         except Exception as e:
             print(e)
 
+# Поле, строки которого создаются по запросу: rows[r0:r1] -- матрица bool
+# Каждая клетка живая с вероятностью density (0 -- пустое поле).
+# Строки одинаковы при каждом обращении: генератор задаётся зерном seed
+# и номером группы из CHUNK_ROWS строк. Для полей, не помещающихся
+# в память: MappedEngine.pack читает их блоками строк
+class RandomRows:
+    CHUNK_ROWS = 256
+
+    def __init__(self, shape, density=0.0, seed=None):
+        self.shape = tuple(shape)
+        self.density = density
+        self._entropy = np.random.SeedSequence(seed).entropy
+
+    def __getitem__(self, rows):
+        r0, r1, _ = rows.indices(self.shape[0])
+        M = self.shape[1]
+        if self.density <= 0 or r1 <= r0:
+            return np.zeros((max(0, r1 - r0), M), dtype=np.bool_)
+        C = self.CHUNK_ROWS
+        parts = []
+        for chunk in range(r0 // C, (r1 - 1) // C + 1):
+            rng = np.random.default_rng([self._entropy, chunk])
+            cells = rng.random((min(C, self.shape[0] - chunk * C), M), dtype=np.float32) < self.density
+            parts.append(cells[max(0, r0 - chunk * C):r1 - chunk * C])
+        return np.concatenate(parts)
+
+
 # Утилиты конвертации состояния поля
 class GameOfLifeLoader:
     @classmethod
@@ -243,13 +776,18 @@ class GameOfLifeLoader:
 
             rows_count = max(minsize[0], len(rows))
             # Для числа столбцов надо ещё найти самую длинную строку (string не "квадратная")
-            cols_count = max(minsize[1], max(map(len, rows)))
+            lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+            cols_count = max(minsize[1], int(lengths.max(initial=0)))
+
+            # Все символы подряд, по одному числу (коду символа) на клетку,
+            # для каждого символа -- номер строки и столбца
+            chars = np.frombuffer("".join(rows).encode("utf-32-le"), dtype="<u4")
+            row_index = np.repeat(np.arange(len(rows)), lengths)
+            col_index = np.arange(chars.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
 
-            # Наверняка, в numpy есть для этого функция
             matrix = np.zeros((rows_count, cols_count), dtype=np.bool_)
-            for (i, row) in enumerate(rows):
-                for (j, char) in enumerate(row):
-                    matrix[i, j] = char == "x"
+            alive = chars == ord("x")
+            matrix[row_index[alive], col_index[alive]] = True
 
             return matrix
         except Exception as e:
@@ -260,13 +798,68 @@ class GameOfLifeLoader:
         # Конвертирует матрицу в строку, соответствующую формату
         # GameOfLifeLoader.string_to_matrix
         try:
-            s = ""
-            for i in range(matrix.shape[0]):
-                row = ""
-                for j in range(matrix.shape[1]):
-                    row += "x" if matrix[i, j] else "."
-                s += row.rstrip(".")  # Обрезка мёртвых клеток справа, не несут информации
-                s += "\n"
+            N, M = matrix.shape
+            chars = np.full((N, M + 1), ord("\n"), dtype=np.uint8)
+            chars[:, :M] = np.where(matrix, ord("x"), ord("."))
+            rows = chars.tobytes().decode("ascii").split("\n")[:N]
+            # Обрезка мёртвых клеток справа, не несут информации
+            s = "".join(row.rstrip(".") + "\n" for row in rows)
             return s
         except Exception as e:
             print(e)
+
+    @classmethod
+    def toio(cls, matrix, io, comment=None):
+        # Запись поля в формате patterns/glider.txt
+        # Читается обратно GameOfLifeMaker.fromio
+        try:
+            if comment:
+                io.write(f"# {comment}\n\n")
+            io.write(f"rows = {matrix.shape[0]}\ncols = {matrix.shape[1]}\n\n")
+            io.write(cls.matrix_to_string(matrix))
+        except Exception as e:
+            print(e)
+
+    # Двоичный формат поля для базы данных
+    # Заголовок: сигнатура, версия формата, способ сжатия, число строк и столбцов;
+    # дальше -- поле, упакованное по 8 клеток в байт
+    # Плотные (похожие на случайные) поля zlib почти не сжимает, а время
+    # тратит, поэтому сжимаются только поля с долей живых клеток вне
+    # промежутка BLOB_DENSE
+    BLOB_MAGIC = b"GOLB"
+    BLOB_VERSION = 1
+    BLOB_HEADER = struct.Struct("<4sBBII")
+    BLOB_RAW = 0
+    BLOB_ZLIB = 1
+    BLOB_DENSE = (0.1, 0.9)
+
+    @classmethod
+    def matrix_to_bytes(cls, matrix):
+        try:
+            N, M = matrix.shape
+            bits = np.packbits(matrix).tobytes()
+            density = np.count_nonzero(matrix) / max(1, matrix.size)
+            codec = cls.BLOB_RAW
+            if not cls.BLOB_DENSE[0] <= density <= cls.BLOB_DENSE[1]:
+                codec, bits = cls.BLOB_ZLIB, zlib.compress(bits, 1)
+            return cls.BLOB_HEADER.pack(cls.BLOB_MAGIC, cls.BLOB_VERSION, codec, N, M) + bits
+        except Exception as e:
+            print(e)
+
+    @classmethod
+    def bytes_to_matrix(cls, blob):
+        try:
+            magic, version, codec, N, M = cls.BLOB_HEADER.unpack_from(blob)
+            if magic != cls.BLOB_MAGIC or version != cls.BLOB_VERSION:
+                raise ValueError(f"Неизвестный формат поля: {magic!r}, версия {version}")
+            bits = blob[cls.BLOB_HEADER.size:]
+            if codec == cls.BLOB_ZLIB:
+                bits = zlib.decompress(bits)
+            bits = np.frombuffer(bits, dtype=np.uint8)
+            return np.unpackbits(bits, count=N * M).reshape(N, M).view(np.bool_)
+        except Exception as e:
+            print(e)
+
+    @classmethod
+    def is_blob(cls, value):
+        return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:4]) == cls.BLOB_MAGIC
@@ -0,0 +1,228 @@
+import re
+
+import numpy as np
+
+
+# Правила клеточных автоматов
+# Правило задаётся строкой и один раз компилируется в таблицы для движков:
+#   B3/S23, B36/S23, 23/3         -- life-like: рождение (B) и выживание (S)
+#                                    по числу живых соседей из восьми
+#   B2/S/C3, B2/S345/4, 345/2/4   -- Generations: клетка, не выжившая по S,
+#                                    не умирает сразу, а проходит состояния
+#                                    2 .. C - 1 (угасает) и только потом
+#                                    становится мёртвой; соседями считаются
+#                                    только живые клетки (состояние 1)
+#   R5,C0,M1,S34..58,B34..45,NM   -- Larger than Life: соседи в радиусе R,
+#                                    окрестность NM (квадрат) или NN (ромб),
+#                                    M1 -- клетка считает и себя, C -- как
+#                                    в Generations (C0 и C2 -- два состояния)
+# Вместо строки можно указать имя из RULES (conway, highlife, ...).
+#
+# Скомпилированное правило:
+#   table -- таблица следующего состояния: table[состояние, число соседей]
+#   terms -- то же для живой/мёртвой клетки в виде отрезков числа соседей
+#            (lo, hi, cells): клетка живая в следующем поколении, если
+#            lo <= соседей <= hi и клетка подходит под cells:
+#            ANY -- живая или мёртвая, ALIVE -- живая, DEAD -- мёртвая.
+#            Векторные движки проверяют отрезок одним-двумя сравнениями,
+#            так что для B3/S23 выходят те же четыре операции, что и раньше.
+# Соседи всегда считаются без самой клетки: M1 при разборе переводится
+# в эквивалентное правило со сдвинутыми на единицу числами S.
+
+ANY = 0
+ALIVE = 1
+DEAD = 2
+
+MOORE = "M"
+VON_NEUMANN = "N"
+
+
+class Rule:
+    def __init__(self, birth, survive, states=2, radius=1, neighbourhood=MOORE):
+        self.birth = frozenset(birth)
+        self.survive = frozenset(survive)
+        self.states = states
+        self.radius = radius
+        self.neighbourhood = neighbourhood
+
+        if states < 2 or states > 255:
+            raise ValueError(f"Число состояний должно быть от 2 до 255: {states}")
+        if radius < 1:
+            raise ValueError(f"Радиус должен быть положительным: {radius}")
+        if neighbourhood not in (MOORE, VON_NEUMANN):
+            raise ValueError(f"Неизвестная окрестность: {neighbourhood}")
+
+        # Наибольшее число соседей
+        if neighbourhood == MOORE:
+            self.max_count = (2 * radius + 1) ** 2 - 1
+        else:
+            self.max_count = 2 * radius * (radius + 1)
+        wrong = [k for k in self.birth | self.survive if k < 0 or k > self.max_count]
+        if wrong:
+            raise ValueError(f"Соседей не может быть {wrong[0]}: окрестность из {self.max_count} клеток")
+
+        self.count_dtype = np.uint8 if self.max_count < 256 else np.uint16
+        self.terms = self._compile_terms()
+        self.table = self._compile_table()
+
+    # Два состояния, восемь соседей: правило B/S
+    @property
+    def is_life_like(self):
+        return self.states == 2 and self.radius == 1 and self.neighbourhood == MOORE
+
+    # Пустое пространство остаётся пустым (нет рождения при 0 соседей)
+    @property
+    def keeps_empty(self):
+        return 0 not in self.birth
+
+    def _compile_terms(self):
+        terms = []
+        for k in range(self.max_count + 1):
+            born, survives = k in self.birth, k in self.survive
+            if not (born or survives):
+                continue
+            cells = ANY if born and survives else (DEAD if born else ALIVE)
+            if terms and terms[-1][1] == k - 1 and terms[-1][2] == cells:
+                terms[-1] = (terms[-1][0], k, cells)
+            else:
+                terms.append((k, k, cells))
+        return tuple(terms)
+
+    def _compile_table(self):
+        C, K = self.states, self.max_count + 1
+        table = np.zeros((C, K), dtype=np.uint8)
+        counts = np.arange(K)
+        table[0] = np.isin(counts, list(self.birth))
+        table[1] = np.where(np.isin(counts, list(self.survive)), 1, 2 % C)
+        for s in range(2, C):
+            table[s] = (s + 1) % C
+        return table
+
+    # Ключ для сравнения и хеширования
+    def _key(self):
+        return self.birth, self.survive, self.states, self.radius, self.neighbourhood
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    # Каноническая запись правила
+    def __str__(self):
+        if self.radius == 1 and self.neighbourhood == MOORE:
+            text = "B" + "".join(map(str, sorted(self.birth))) + "/S" + "".join(map(str, sorted(self.survive)))
+            return text if self.states == 2 else f"{text}/C{self.states}"
+        return (f"R{self.radius},C{self.states if self.states > 2 else 0},M0,"
+                f"S{_format_ranges(self.survive)},B{_format_ranges(self.birth)},N{self.neighbourhood}")
+
+    def __repr__(self):
+        return f"Rule({str(self)!r})"
+
+
+def _format_ranges(values):
+    ranges = []
+    for k in sorted(values):
+        if ranges and ranges[-1][1] == k - 1:
+            ranges[-1][1] = k
+        else:
+            ranges.append([k, k])
+    return ",".join(f"{lo}..{hi}" if hi > lo else f"{lo}" for (lo, hi) in ranges)
+
+
+# Разбор
+
+_LIFE_LIKE = re.compile(r"^B(\d*)/?S(\d*)(?:/C?(\d+))?$")
+_LIFE_LIKE_SB = re.compile(r"^S(\d*)/?B(\d*)(?:/C?(\d+))?$")
+_LEGACY = re.compile(r"^(\d*)/(\d*)(?:/(\d+))?$")
+_RANGE = re.compile(r"^(\d+)(?:(?:\.\.|-)(\d+))?$")
+
+
+def parse_rule(text):
+    if isinstance(text, Rule):
+        return text
+    # Топология поля после двоеточия (B3/S23:T100,100) не учитывается:
+    # поле всегда тор
+    text = text.split(":")[0]
+    name = re.sub(r"[\s'&_-]", "", text).lower()
+    if name in RULES:
+        return RULES[name]
+
+    spec = text.strip().upper().replace(" ", "")
+    if spec.startswith("R") and "," in spec:
+        return _parse_larger_than_life(spec)
+
+    match = _LIFE_LIKE.match(spec)
+    if match:
+        birth, survive, states = match.groups()
+    else:
+        match = _LIFE_LIKE_SB.match(spec)
+        if match:
+            survive, birth, states = match.groups()
+        else:
+            match = _LEGACY.match(spec)
+            if not match:
+                raise ValueError(f"Неизвестное правило: {text!r}")
+            survive, birth, states = match.groups()
+
+    return Rule(map(int, birth), map(int, survive), int(states) if states else 2)
+
+
+# R<радиус>,C<состояния>,M<0|1>,S<отрезки>,B<отрезки>,N<M|N>
+# Отрезок -- a..b, a-b или a; после S и B можно перечислить несколько через запятую
+def _parse_larger_than_life(spec):
+    radius, states, middle, neighbourhood = None, 2, False, MOORE
+    birth, survive = set(), set()
+    target = None
+    for token in spec.split(","):
+        if not token:
+            continue
+        key, value = token[0], token[1:]
+        if key.isdigit():
+            key, value = None, token
+        try:
+            if key == "R":
+                radius = int(value)
+            elif key == "C":
+                states = max(2, int(value))
+            elif key == "M":
+                middle = int(value) == 1
+            elif key == "N":
+                neighbourhood = value
+            elif key in ("S", "B", None):
+                if key is not None:
+                    target = survive if key == "S" else birth
+                if target is None:
+                    raise ValueError
+                if value:
+                    lo, hi = _RANGE.match(value).groups()
+                    target.update(range(int(lo), int(hi or lo) + 1))
+            else:
+                raise ValueError
+        except (ValueError, AttributeError):
+            raise ValueError(f"Неверная часть правила {token!r} в {spec!r}")
+
+    if radius is None:
+        raise ValueError(f"В правиле {spec!r} не указан радиус R")
+    if middle:
+        # Клетка считает себя: для живой число соседей на единицу больше
+        survive = {k - 1 for k in survive if k > 0}
+    return Rule(birth, survive, states, radius, neighbourhood)
+
+
+# Известные правила по именам
+RULES = {
+    "conway": Rule([3], [2, 3]),
+    "life": Rule([3], [2, 3]),
+    "highlife": Rule([3, 6], [2, 3]),
+    "daynight": Rule([3, 6, 7, 8], [3, 4, 6, 7, 8]),
+    "seeds": Rule([2], []),
+    "lifewithoutdeath": Rule([3], range(9)),
+    "maze": Rule([3], [1, 2, 3, 4, 5]),
+    "replicator": Rule([1, 3, 5, 7], [1, 3, 5, 7]),
+    "briansbrain": Rule([2], [], states=3),
+    "starwars": Rule([2], [3, 4, 5], states=4),
+    "bosco": _parse_larger_than_life("R5,C0,M1,S34..58,B34..45,NM"),
+}
+
+CONWAY = RULES["conway"]
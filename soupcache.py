@@ -0,0 +1,283 @@
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from cycles import fingerprint
+
+
+# Кеш исходов случайных полей (супов)
+# Многие супы приходят к одному и тому же пеплу, а то и к одним и тем же
+# промежуточным полям. SoupCache помнит исход поля: через сколько поколений
+# оно вымрет, станет стабильным или периодическим (и с каким периодом).
+# Ключ -- канонический отпечаток поля (canonical_key): поле обрезается
+# по живым клеткам (сдвиг) и из восьми поворотов и отражений берётся
+# наименьшее, поэтому сдвинутое, повёрнутое или отражённое поле даёт тот же
+# ключ. В ключ входят правило и размер тора (на торе исход зависит от него),
+# для неограниченной плоскости -- только правило. Все правила rules.py
+# симметричны, так что у равных по ключу полей исходы одинаковы.
+#
+# Исход (Outcome) хранится относительно поля: delta -- через сколько
+# поколений игра его обнаружит (как GameOfLife._check_finished и
+# _check_periodic), для периодических -- ещё период.
+#
+# Последние capacity исходов -- в памяти (LRU), все -- в файле SQLite рядом
+# с utils/database.db. Новые исходы пишутся в файл пачками (flush, close).
+#
+# SoupTracker подключает кеш к игре: каждые every поколений ищет поле в кеше
+# и, если исход известен, игру дальше считать не нужно; когда игра
+# закончилась сама, её исход записывается для всех просмотренных полей.
+#
+# Пример
+#   cache = SoupCache()
+#   tracker = SoupTracker(game, cache, every=16)
+#   while not (game.is_finished() or game.is_periodic()):
+#       game.next()
+#       if tracker.after_step() is not None:
+#           break                             # исход известен из кеша
+#   tracker.finish()
+#   kind, age, period = tracker.result()
+#   cache.close()
+
+CACHE_PATH = 'utils/soupcache.db'
+SCHEMA_VERSION = 1
+
+# Исходов в памяти по умолчанию
+DEFAULT_CAPACITY = 100000
+
+# Поле ищется в кеше каждые столько поколений
+DEFAULT_EVERY = 16
+
+# Новые исходы пишутся в файл, когда их набирается столько
+FLUSH_EVERY = 1000
+
+# Виды исходов
+DIES = 1
+STABLE = 2
+PERIODIC = 3
+
+
+# Исход поля: через delta поколений игра обнаружит, что все клетки мертвы
+# (DIES), поле стабильно (STABLE) или повторилось с периодом period (PERIODIC)
+# Для периодических delta - period -- через сколько поколений начинается цикл
+class Outcome:
+    __slots__ = ("kind", "delta", "period")
+
+    def __init__(self, kind, delta, period=0):
+        self.kind = kind
+        self.delta = delta
+        self.period = period
+
+    def __eq__(self, other):
+        return isinstance(other, Outcome) and self._key() == other._key()
+
+    def _key(self):
+        return self.kind, self.delta, self.period
+
+    def __repr__(self):
+        return "Outcome(%d, %d, %d)" % self._key()
+
+    # Описание исхода поля поколения age, как у GameOfLife
+    def text(self, age):
+        end = age + self.delta
+        if self.kind == DIES:
+            return f"Все клетки мертвы. Поколение {end}."
+        if self.kind == STABLE:
+            return f"Стабильная конфигурация. Поколение {end}."
+        return f"Периодическая конфигурация. Поколения {end - self.period} и {end}."
+
+
+# Исход закончившейся игры (GameOfLife): (вид, поколение, на котором он
+# обнаружен, период) или None
+def game_outcome(game):
+    if game.is_periodic():
+        first, end = game.periodic_span()
+        return PERIODIC, end, end - first
+    if game.is_finished():
+        return (DIES if game.population() == 0 else STABLE), game.age, 0
+    return None
+
+
+# Канонический ключ поля (16 байт)
+# matrix -- состояния клеток (bool или uint8 для правил Generations),
+# shape -- размер тора или None для неограниченной плоскости
+def canonical_key(matrix, rule, shape=None):
+    rows = np.flatnonzero(matrix.any(axis=1))
+    if rows.size:
+        cols = np.flatnonzero(matrix.any(axis=0))
+        matrix = matrix[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    else:
+        matrix = matrix[:0, :0]
+
+    # Восемь поворотов и отражений; при повороте на 90 градусов тор
+    # тоже поворачивается. Сначала сравниваются размеры, поле
+    # переводится в байты только у кандидатов с наименьшими размерами
+    candidates = []
+    for (base, board) in ((matrix, shape), (matrix.T, shape[::-1] if shape else None)):
+        for k in range(4):
+            turned = np.rot90(base, k)
+            size = (board if k % 2 == 0 else board[::-1]) if board else ()
+            candidates.append((tuple(size) + turned.shape, turned))
+    smallest = min(size for (size, _) in candidates)
+    best = min(_bytes(turned) for (size, turned) in candidates if size == smallest)
+
+    header = str(rule).encode() + struct.pack(f"<{len(smallest)}q", *smallest)
+    return fingerprint(header + b"\0" + best)
+
+
+def _bytes(matrix):
+    if matrix.dtype == np.bool_:
+        return np.packbits(matrix).tobytes()
+    return np.ascontiguousarray(matrix).tobytes()
+
+
+class SoupCache:
+    def __init__(self, path=CACHE_PATH, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._recent = OrderedDict()
+        # Исходы, ещё не записанные в файл
+        self._pending = {}
+        # Найдено в кеше и не найдено
+        self.hits = 0
+        self.misses = 0
+
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._con.execute("PRAGMA journal_mode = WAL")
+            self._con.execute("PRAGMA synchronous = NORMAL")
+            if self._con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                with self._con:
+                    self._con.execute("CREATE TABLE IF NOT EXISTS outcomes (key BLOB PRIMARY KEY, "
+                                      "kind INTEGER NOT NULL, delta INTEGER NOT NULL, period INTEGER NOT NULL) "
+                                      "WITHOUT ROWID")
+                    self._con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # Число исходов в файле и ещё не записанных
+    def __len__(self):
+        with self._lock:
+            stored = self._con.execute("SELECT count(*) FROM outcomes").fetchone()[0]
+        return stored + len(self._pending)
+
+    # Исход поля с ключом key или None
+    def get(self, key):
+        outcome = self._recent.get(key)
+        if outcome is not None:
+            self._recent.move_to_end(key)
+        else:
+            outcome = self._pending.get(key)
+            if outcome is None:
+                with self._lock:
+                    row = self._con.execute("SELECT kind, delta, period FROM outcomes WHERE key = ?",
+                                            (key,)).fetchone()
+                outcome = Outcome(*row) if row is not None else None
+            if outcome is not None:
+                self._remember(key, outcome)
+        if outcome is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return outcome
+
+    def put(self, key, outcome):
+        self._remember(key, outcome)
+        self._pending[key] = outcome
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    # Записать новые исходы в файл
+    def flush(self):
+        if not self._pending:
+            return None
+        rows = [(key, o.kind, o.delta, o.period) for (key, o) in self._pending.items()]
+        with self._lock, self._con:
+            self._con.executemany("INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?)", rows)
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._con.close()
+
+    def _remember(self, key, outcome):
+        self._recent[key] = outcome
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.capacity:
+            self._recent.popitem(last=False)
+
+
+# Кеш исходов для одной игры (GameOfLife)
+class SoupTracker:
+    def __init__(self, game, cache, every=DEFAULT_EVERY):
+        self.game = game
+        self.cache = cache
+        self.every = every
+        # Просмотренные поля: пары (поколение, ключ)
+        self._seen = []
+        # Исход из кеша и поколение, на котором он найден
+        self.outcome = None
+        self.outcome_age = None
+        # Поле уже в цикле: повтор игра найдёт сама не позже чем через период
+        self._cycling = False
+
+    # Вызывается после каждого шага; исход из кеша или None
+    def after_step(self):
+        game = self.game
+        if self.outcome is not None or game.is_finished() or game.is_periodic():
+            return self.outcome
+        if self._cycling or self.every <= 0 or game.age % self.every:
+            return None
+        key = self.key()
+        outcome = self.cache.get(key)
+        if outcome is None:
+            self._seen.append((game.age, key))
+            return None
+        if outcome.kind == PERIODIC and outcome.delta == outcome.period:
+            # Цикл мог начаться раньше этого поля, и тогда игра найдёт
+            # повтор раньше, чем через период; поколение повтора
+            # известно точно, только если дать ей до него дойти
+            self._cycling = True
+            return None
+        self.outcome, self.outcome_age = outcome, game.age
+        self._record(outcome.kind, game.age + outcome.delta, outcome.period)
+        return outcome
+
+    # Канонический ключ текущего поля игры
+    def key(self):
+        game = self.game
+        if game.is_unbounded():
+            return canonical_key(game.live_region()[0], game.rule)
+        return canonical_key(game.cell_states, game.rule, (game.height(), game.width()))
+
+    # Записать исход закончившейся игры для просмотренных полей
+    def finish(self):
+        result = self.result()
+        if self.outcome is None and result is not None:
+            self._record(*result)
+        self._seen.clear()
+
+    # Исход игры: (вид, поколение, на котором он обнаружен, период)
+    # или None, если игра не закончилась
+    def result(self):
+        if self.outcome is not None:
+            outcome = self.outcome
+            return outcome.kind, self.outcome_age + outcome.delta, outcome.period
+        return game_outcome(self.game)
+
+    # Описание исхода, как у GameOfLife
+    def reason(self):
+        if self.outcome is None:
+            return None
+        return f"Известный исход (кеш супов): {self.outcome.text(self.outcome_age)}"
+
+    # Исход для полей, просмотренных до поколения end
+    # Если поле уже было в цикле, сама по себе игра с него обнаружит
+    # повтор через полный период
+    def _record(self, kind, end, period):
+        for (age, key) in self._seen:
+            if age < end:
+                self.cache.put(key, Outcome(kind, max(end - age, period), period))
+        self._seen.clear()
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+# Статистика поколений: население, рождения, смерти и границы живых клеток
+# Движок считает сводку шага (engine.StepStats) попутно с самим шагом,
+# GameOfLife складывает сводки в StatsSeries -- кольцевой буфер
+# последних capacity поколений в одном массиве numpy, без объекта
+# на поколение.
+#
+# Пример
+#   series = game.stats
+#   series.last()                  # запись последнего поколения или None
+#   data = series.array()          # записи по порядку поколений
+#   data["population"], data["births"]
+#
+# Поля записи -- FIELDS; границы (top, bottom, left, right) -- как
+# engine.StepStats.bbox, у поколения без живых клеток все четыре -- 0.
+
+# Поколений в буфере по умолчанию
+DEFAULT_CAPACITY = 4096
+
+FIELDS = ("age", "population", "births", "deaths", "top", "bottom", "left", "right")
+
+DTYPE = np.dtype([(name, np.int64) for name in FIELDS])
+
+
+class StatsSeries:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=DTYPE)
+        # Индекс следующей записи и число записей
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def copy(self):
+        other = StatsSeries(self.capacity)
+        other._data[...] = self._data
+        other._next = self._next
+        other._count = self._count
+        return other
+
+    # Запись поколения age по сводке шага
+    def add(self, age, stats):
+        bbox = stats.bbox or (0, 0, 0, 0)
+        self._data[self._next] = (age, stats.population, stats.births, stats.deaths) + tuple(bbox)
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    # Последняя запись (numpy.void с полями FIELDS) или None
+    def last(self):
+        if not self._count:
+            return None
+        return self._data[self._next - 1]
+
+    # Записи по порядку поколений (копия)
+    def array(self):
+        start = (self._next - self._count) % self.capacity
+        return np.roll(self._data, -start)[:self._count]
+
+    # Забыть поколения начиная с generation (после перемотки назад)
+    def truncate(self, generation):
+        while self._count and self.last()["age"] >= generation:
+            self._next = (self._next - 1) % self.capacity
+            self._count -= 1
@@ -0,0 +1,96 @@
+import glob
+import os
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from census import MAX_PERIOD, PATTERNS, Catalogue, census, game_census, label
+from engine import default_engine
+from model import GameOfLifeMaker
+
+
+FILES = sorted(glob.glob(os.path.join(PATTERNS, "*")))
+
+
+@pytest.fixture(scope="module")
+def catalogue():
+    return Catalogue.from_directory()
+
+
+def name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def crop(matrix):
+    rows, cols = np.flatnonzero(matrix.any(axis=1)), np.flatnonzero(matrix.any(axis=0))
+    return matrix[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+# Фазы узора за период на плоскости (повтор с точностью до сдвига)
+def phases(cells):
+    margin = MAX_PERIOD + 2
+    board = np.pad(cells, margin)
+    engine = default_engine()
+    src, dst = engine.pack(board), engine.pack(board)
+    result = [crop(board)]
+    for _ in range(MAX_PERIOD):
+        engine.step(src, dst)
+        src, dst = dst, src
+        current = crop(np.array(engine.unpack(src)))
+        if current.shape == result[0].shape and np.array_equal(current, result[0]):
+            return result
+        result.append(current)
+    raise AssertionError("узор не повторился")
+
+
+@pytest.mark.parametrize("path", FILES, ids=name)
+def test_pattern_is_one_object_in_every_phase(path, catalogue):
+    game = GameOfLifeMaker.fromtxt(path)
+    for generation in range(len(phases(game.state))):
+        assert game_census(game, catalogue) == Counter({name(path): 1}), f"поколение {generation}"
+        game.next()
+
+
+# Корабль, переходящий через край тора, во всех фазах
+@pytest.mark.parametrize("ship", ["lwss", "mwss", "hwss"])
+def test_ship_across_torus_edge(ship, catalogue):
+    for cells in phases(GameOfLifeMaker.fromtxt(os.path.join(PATTERNS, ship + ".txt")).state):
+        board = np.zeros((24, 24), dtype=np.bool_)
+        board[:cells.shape[0], :cells.shape[1]] = cells
+        for shift in ((-2, 0), (0, -3), (-2, -3)):
+            assert census(np.roll(board, shift, axis=(0, 1)), catalogue) == Counter({ship: 1})
+
+
+def test_objects_are_counted_separately(catalogue):
+    board = np.zeros((20, 30), dtype=np.bool_)
+    board[2:4, 2:4] = True                          # block
+    board[10, 2:5] = True                           # blinker
+    board[2:4, 10:12] = True                        # block
+    board[[11, 12, 13, 13, 13], [21, 22, 20, 21, 22]] = True   # glider
+    board[17, 27] = True                            # одна клетка
+    counts = census(board, catalogue)
+    assert counts["block"] == 2 and counts["blinker"] == 1 and counts["glider"] == 1
+    assert sum(counts.values()) == 5
+
+
+def test_stack_census(catalogue):
+    boards = np.zeros((3, 16, 16), dtype=np.bool_)
+    boards[0, 2:4, 2:4] = True
+    boards[2, 5, 5:8] = True
+    assert census(boards, catalogue) == [Counter({"block": 1}), Counter(), Counter({"blinker": 1})]
+
+
+def test_label():
+    board = np.zeros((8, 8), dtype=np.bool_)
+    board[0, 0] = board[7, 7] = True                # соседние через угол тора
+    board[3, 3:5] = True
+    assert label(board)[1] == 2
+    assert label(board, wrap=False)[1] == 3
+
+
+def test_missing_directory(tmp_path):
+    with pytest.raises(ValueError):
+        Catalogue.from_directory(str(tmp_path / "missing"))
+    with pytest.raises(ValueError):
+        Catalogue.from_directory(str(tmp_path))
@@ -0,0 +1,112 @@
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+from engine import ENGINES, LoopEngine, MappedEngine
+from rules import RULES, parse_rule
+
+
+# Правила всех видов: life-like, Generations, Larger than Life и по именам
+RULE_TEXTS = [
+    "B3/S23", "B36/S23", "B3678/S34678", "B1357/S1357", "B2/S", "B3/S012345678",
+    "B2/S/C3", "B2/S345/C4", "B3/S23/C5", "345/2/4",
+    "R2,C0,M0,S3..5,B3..4,NM", "R2,C0,M1,S2..7,B3..5,NN", "R3,C4,M0,S5..12,B6..9,NM",
+] + sorted(RULES)
+
+STEPS = 4
+
+
+def random_states(rule, shape, seed):
+    rng = np.random.default_rng(seed)
+    if rule.states == 2:
+        return rng.random(shape) < 0.35
+    return rng.integers(0, rule.states, size=shape).astype(np.uint8)
+
+
+# Поколения движка engine (состояния клеток после каждого шага)
+def run(engine, states, steps=STEPS):
+    src, dst = engine.pack(states), engine.pack(states)
+    result = []
+    for _ in range(steps):
+        engine.step(src, dst)
+        src, dst = dst, src
+        result.append(np.array(engine.unpack_states(src)))
+    return result
+
+
+def make(name, rule, tmp_path):
+    if name == MappedEngine.name:
+        return MappedEngine(str(tmp_path / "mapped"), rule)
+    return ENGINES[name](rule=rule)
+
+
+# Все движки, кроме эталонного LoopEngine
+ENGINE_NAMES = sorted(set(ENGINES) - {LoopEngine.name}) + [MappedEngine.name]
+
+
+def board(rule, unbounded):
+    if unbounded:
+        # Плоскость без краёв: узор в середине тора с запасом, до краёв
+        # которого за STEPS поколений ничего не дойдёт
+        margin = STEPS * rule.radius + 1
+        inner = random_states(rule, (16, 20), seed=1)
+        states = np.zeros((16 + 2 * margin, 20 + 2 * margin), dtype=inner.dtype)
+        states[margin:-margin, margin:-margin] = inner
+        return states
+    # Размеры не кратны словам и плиткам
+    return random_states(rule, (37, 71), seed=1)
+
+
+# Эталон считается один раз на правило и вид поля
+@lru_cache(maxsize=None)
+def expected(text, unbounded):
+    rule = parse_rule(text)
+    return run(LoopEngine(rule), board(rule, unbounded))
+
+
+@pytest.mark.parametrize("text", RULE_TEXTS)
+@pytest.mark.parametrize("name", ENGINE_NAMES)
+def test_engine_matches_loop_engine(text, name, tmp_path):
+    rule = parse_rule(text)
+    cls = MappedEngine if name == MappedEngine.name else ENGINES[name]
+    if not cls.supports(rule):
+        pytest.skip(f"{name} не поддерживает {rule}")
+    engine = make(name, rule, tmp_path)
+    unbounded = getattr(engine, "unbounded", False)
+
+    states = board(rule, unbounded)
+    for (generation, (got, want)) in enumerate(zip(run(engine, states), expected(text, unbounded)), start=1):
+        assert np.array_equal(got, want), f"{name}, {rule}: поколение {generation}"
+
+
+@pytest.mark.parametrize("text", RULE_TEXTS)
+def test_rule_round_trip(text):
+    rule = parse_rule(text)
+    assert parse_rule(str(rule)) == rule
+    assert str(parse_rule(str(rule))) == str(rule)
+
+
+@pytest.mark.parametrize("text, canonical", [
+    ("23/3", "B3/S23"),
+    ("S23/B3", "B3/S23"),
+    ("b3/s23", "B3/S23"),
+    ("B3/S23:T100,100", "B3/S23"),
+    ("Conway", "B3/S23"),
+    ("high life", "B36/S23"),
+    ("B2/S/3", "B2/S/C3"),
+    ("345/2/4", "B2/S345/C4"),
+    ("Brian's Brain", "B2/S/C3"),
+    ("R1,C0,M0,S2..3,B3,NM", "B3/S23"),
+    ("R1,C0,M1,S3..4,B3,NM", "B3/S23"),
+    ("R5,C0,M1,S34..58,B34..45,NM", "R5,C0,M0,S33..57,B34..45,NM"),
+    ("R2,C0,M0,S1-3,5,B2,NN", "R2,C0,M0,S1..3,5,B2,NN"),
+])
+def test_rule_notations(text, canonical):
+    assert str(parse_rule(text)) == canonical
+
+
+@pytest.mark.parametrize("text", ["", "B9/S23", "B3/S23/C1", "R0,C0,M0,S1,B1,NM", "R2,C0,M0,S1,B1,NX", "X3/Y23"])
+def test_invalid_rules(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
@@ -1,13 +1,17 @@
+import time
+
 import numpy as np
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QRectF, QSize
+from PyQt5.QtGui import QImage, QPainter, qRgb
 import configparser
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtWidgets import QLabel, QPushButton, QSlider, QWidget
 from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout
 from PyQt5.QtWidgets import QSizePolicy
-import sqlite3
-from model import GameOfLifeLoader, GameOfLifeMaker
+import database
+from model import GameOfLifeMaker
+from worker import GameWorker, changed_cells
 from dialogs import GameFinishedDialog, GamePeriodicDialog, GameSaveDialog, GameLoadDialog
 import ast
 
@@ -21,68 +25,399 @@ class GameFieldViewSettings:
     dead_cell_color = ast.literal_eval(cfg['VIEW']['dead_cell_color'])
 
 
+# Уменьшение матрицы клеток в k раз по каждой стороне (для мелкого масштаба)
+# Пиксель -- блок k x k клеток, его значение -- доля живых клеток блока
+# от 0 до 255 с округлением вверх: блок хотя бы с одной живой клеткой
+# не пропадает, как при простом прореживании
+def downsample(matrix, k):
+    alive = matrix.view(np.uint8) if matrix.dtype == np.bool_ else np.equal(matrix, 1).view(np.uint8)
+    H, W = alive.shape
+    h, w = -(-H // k), -(-W // k)
+    if (H, W) != (h * k, w * k):
+        padded = np.zeros((h * k, w * k), dtype=np.uint8)
+        padded[:H, :W] = alive
+        alive = padded
+    # Суммы сдвинутых срезов: быстрее, чем sum по осям или reduceat
+    rows = alive[0::k].astype(np.uint16)
+    for q in range(1, k):
+        rows += alive[q::k]
+    counts = rows[:, 0::k].copy()
+    for q in range(1, k):
+        counts += rows[:, q::k]
+    return ((counts.astype(np.uint32) * 255 + k * k - 1) // (k * k)).astype(np.uint8)
+
+
 # Пример использования
 # v = GameFieldView()
 # v.attach_model(GameOfLife(...))
 # v.update()  # только после этой команды поле загружено на экран
+#
+# Изображение поля не копируется: QImage формата Indexed8 смотрит прямо
+# в память матрицы состояния (bool -- байт 0 или 1, цвета из таблицы).
+# После шага перерисовываются только изменившиеся клетки,
+# если их прямоугольник мал по сравнению со всем полем.
+#
+# Окно просмотра: колесо мыши меняет масштаб вокруг курсора, перетаскивание
+# правой кнопкой сдвигает поле. Изображение строится только для видимых
+# клеток: при крупном масштабе -- копия видимой части, при мелком (несколько
+# клеток на пиксель) -- уменьшенная матрица (downsample). Пока видно всё
+# поле клетка к клетке, изображение смотрит в саму матрицу, как раньше.
+# На неограниченной плоскости (GameOfLife.is_unbounded) перетаскивание
+# за край поля сдвигает окно модели (GameOfLife.pan).
+#
+# Если игра считается в потоке (worker.py), поле показывает кадры:
+# v.show_frame(frame) вместо v.update(), а щелчки по клеткам и сдвиги
+# окна модели передаются в v.worker.
 class GameFieldView(QLabel):
+    # Размер клетки при подключении модели, px
+    CELL_SIZE = 20
+    # Наибольший размер виджета при подключении модели, px
+    MAX_HINT = 800
+    # Наибольший масштаб, px на клетку; шаг масштаба на деление колеса
+    MAX_ZOOM = 64
+    ZOOM_STEP = 1.25
+    # Изображения для последних матриц (буферы state модели или кадры)
+    IMAGE_CACHE_SIZE = 4
+
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignCenter)
 
         self.show_settings = GameFieldViewSettings()
+        self._color_table = self._make_color_table(2)
+        self._density_table = self._make_density_table()
         self.model = None
 
+        # Показываемая матрица и её изображение
+        self._matrix = None
+        self._image = None
+        # Видимые клетки, которые покрывает изображение: строки i0..i1,
+        # столбцы j0..j1, k клеток на пиксель изображения
+        self._image_cells = None
+        # Данные изображения видимой части (изображение не владеет памятью)
+        self._region = None
+        # Пары (матрица, изображение); матрица хранится, пока живо изображение
+        self._images = []
+        # Матрица и поколение, показанные последними
+        self._shown = None
+        self._shown_age = None
+
+        # Окно просмотра: масштаб, px на клетку, и клетка (дробная)
+        # в левом верхнем углу виджета; масштаб None -- поле целиком
+        self._zoom = None
+        self._origin = (0.0, 0.0)
+        # Перетаскивание: последнее положение мыши и ещё не переданный
+        # модели сдвиг её окна, клеток
+        self._drag_last = None
+        self._drag_rest = (0.0, 0.0)
+
+        # Замеры времени отображения (metrics.Metrics) или None
+        self.metrics = None
+        # Поток игры (worker.GameWorker) или None
+        self.worker = None
+
     def attach_model(self, model):
         # Теперь виджет знает, откуда брать данные (model: GameOfLife)
         self.model = model
-
-        # Размер клетки -- 20px х 20px
-        self.resize(20*model.height(), 20*model.width())
+        self._shown = None
+        self._zoom = None
+        # Цвета по состояниям клеток правила; изображения -- с новыми цветами
+        self._color_table = self._make_color_table(model.rule.states)
+        self._images = []
+
+        # Размер клетки -- 20px х 20px, но не больше MAX_HINT
+        self.resize(self.sizeHint())
+        self.updateGeometry()
         self.update()
 
+    def _make_color_table(self, states):
+        # 0 -- мёртвая, 1 -- живая, 2 .. states - 1 -- угасающие клетки
+        # правил Generations: от цвета живой к цвету мёртвой
+        dead = np.array(self.show_settings.dead_cell_color, dtype=float)
+        live = np.array(self.show_settings.live_cell_color, dtype=float)
+        table = [qRgb(*self.show_settings.dead_cell_color), qRgb(*self.show_settings.live_cell_color)]
+        for s in range(2, states):
+            t = (s - 1) / (states - 1)
+            table.append(qRgb(*(int(v) for v in np.rint(live + (dead - live) * t))))
+        return table
+
+    def _make_density_table(self):
+        # Цвета для доли живых клеток 0..255 (см. downsample):
+        # даже одна живая клетка на пиксель заметна
+        dead = np.array(self.show_settings.dead_cell_color, dtype=float)
+        live = np.array(self.show_settings.live_cell_color, dtype=float)
+        table = [qRgb(*self.show_settings.dead_cell_color)]
+        for level in range(1, 256):
+            t = 0.3 + 0.7 * level / 255
+            table.append(qRgb(*(int(v) for v in np.rint(dead + (live - dead) * t))))
+        return table
+
+    def sizeHint(self):
+        if self.model is None:
+            return super().sizeHint()
+        rows, cols = self.model.height(), self.model.width()
+        scale = min(self.CELL_SIZE, self.MAX_HINT / max(rows, cols, 1))
+        return QSize(max(1, round(scale * cols)), max(1, round(scale * rows)))
+
     def update(self):
         # Обновляет поле в соответсвии состояниию модели
-        # 1. Сгенерировать изображение
-        # 2. Создать pixmap для показа изображения
-        # 3. Показать pixmap, натянув на реальные размеры виджета
-        image = self.toImage(self.model.state)
-        pixmap = QPixmap().fromImage(image)
-        self.setPixmap(pixmap.scaled(self.size(), Qt.KeepAspectRatio))
-
-    def toImage(self, matrix):
-        # Создание изображения из матрицы bool-ов
-
-        # Матрица, в ячейка хранится rgb код
-        rgb = np.zeros((matrix.shape[0], matrix.shape[1], 3), dtype=np.uint8)
-        # Цвет живых клеток
-        rgb[np.where(matrix)] = self.show_settings.live_cell_color
-        # Цвет мёртвых клеток
-        rgb[np.where(np.invert(matrix))] = self.show_settings.dead_cell_color
-        # Изображение -- матрица, ширина на высоту, число байтов в строке, формат хранения -- RGB
-        img = QImage(rgb, rgb.shape[1], rgb.shape[0], rgb.strides[0], QImage.Format_RGB888)
-        return img
+        # 1. Найти (или создать) изображение видимой части матрицы состояния
+        # 2. Определить, какие клетки изменились с прошлого показа
+        # 3. Запросить перерисовку только этой части виджета
+        if self.model is None:
+            return None
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.start()
+        self._matrix = self.model.cell_states
+        self._render()
+        if metrics is not None:
+            metrics.lap("view.image")
+
+        # Частичная перерисовка возможна, только если с прошлого показа
+        # прошёл ровно один шаг: тогда показанная матрица -- это prev_state
+        dirty = None
+        if self._shown is not None and self.model.age == self._shown_age + 1:
+            prev = self.model.prev_state
+            if prev is self._shown:
+                dirty = changed_cells(self._matrix, prev)
+        self._shown = self._matrix
+        self._shown_age = self.model.age
+        if metrics is not None:
+            metrics.lap("view.dirty")
+
+        if dirty is None:
+            super().update()
+        elif dirty is not False:
+            super().update(self._cells_to_rect(*dirty))
+
+    def show_frame(self, frame, full=False):
+        # Показывает кадр потока игры (worker.Frame)
+        # Перерисовывается прямоугольник изменений кадра, full -- всё поле
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.start()
+        self._matrix = frame.state
+        self._render()
+        self._shown = self._matrix
+        self._shown_age = frame.age
+        if metrics is not None:
+            metrics.lap("view.image")
+
+        if full or frame.dirty is None:
+            super().update()
+        elif frame.dirty is not False:
+            super().update(self._cells_to_rect(*frame.dirty))
+
+    def update_cell(self, i, j):
+        # Перерисовка одной клетки (после её изменения)
+        self._matrix = self.model.cell_states
+        self._render()
+        self._shown = self._matrix
+        super().update(self._cells_to_rect(i, i + 1, j, j + 1))
+
+    def toImage(self, matrix, colors=None):
+        # Изображение поверх матрицы bool или uint8 (номера цветов), без копирования
+        # Изображение не владеет памятью: матрица хранится вместе с ним
+        for (m, image) in self._images:
+            if m is matrix:
+                return image
+
+        if not matrix.flags.c_contiguous:
+            matrix = np.ascontiguousarray(matrix)
+        # Изображение -- матрица, ширина на высоту, число байтов в строке, формат -- индексы цветов
+        image = QImage(sip.voidptr(matrix.ctypes.data), matrix.shape[1], matrix.shape[0],
+                       matrix.strides[0], QImage.Format_Indexed8)
+        image.setColorTable(colors or self._color_table)
+
+        self._images.append((matrix, image))
+        if len(self._images) > self.IMAGE_CACHE_SIZE:
+            self._images.pop(0)
+        return image
+
+    # Окно просмотра
+
+    def _viewport(self):
+        # Масштаб и клетка в левом верхнем углу виджета
+        rows, cols = self.model.height(), self.model.width()
+        if self._zoom is None:
+            zoom = min(self.width() / cols, self.height() / rows)
+            return (zoom,) + self._clamp(zoom, 0.0, 0.0)
+        return (self._zoom,) + self._clamp(self._zoom, *self._origin)
+
+    def _clamp(self, zoom, oi, oj):
+        # Поле меньше виджета -- по центру, больше -- не дальше своих краёв
+        clamped = []
+        for (origin, cells, pixels) in ((oi, self.model.height(), self.height()),
+                                        (oj, self.model.width(), self.width())):
+            visible = pixels / zoom
+            if visible >= cells:
+                clamped.append((cells - visible) / 2)
+            else:
+                clamped.append(min(max(origin, 0.0), cells - visible))
+        return tuple(clamped)
+
+    def _visible_cells(self, zoom, oi, oj):
+        rows, cols = self.model.height(), self.model.width()
+        i0, j0 = max(0, int(np.floor(oi))), max(0, int(np.floor(oj)))
+        i1 = min(rows, int(np.ceil(oi + self.height() / zoom)))
+        j1 = min(cols, int(np.ceil(oj + self.width() / zoom)))
+        return i0, max(i0, i1), j0, max(j0, j1)
+
+    def _render(self):
+        # Изображение видимых клеток self._matrix
+        if self._matrix is None or self.model is None:
+            return None
+        zoom, oi, oj = self._viewport()
+        i0, i1, j0, j1 = self._visible_cells(zoom, oi, oj)
+        # Клеток на пиксель
+        k = min(255, max(1, int(1 / zoom)))
+        rows, cols = self._matrix.shape
+        if k == 1 and (i0, i1, j0, j1) == (0, rows, 0, cols):
+            self._image = self.toImage(self._matrix)
+            self._region = None
+        else:
+            region = self._matrix[i0:i1, j0:j1]
+            if k == 1:
+                data, colors = np.ascontiguousarray(region), self._color_table
+            else:
+                data, colors = downsample(region, k), self._density_table
+            self._image = QImage(sip.voidptr(data.ctypes.data), data.shape[1], data.shape[0],
+                                 data.strides[0], QImage.Format_Indexed8)
+            self._image.setColorTable(colors)
+            self._region = data
+        self._image_cells = (i0, i1, j0, j1, k)
+
+    def _cells_to_rect(self, i0, i1, j0, j1):
+        # Прямоугольник виджета, покрывающий клетки, с запасом в пиксель
+        zoom, oi, oj = self._viewport()
+        rect = QRectF((j0 - oj) * zoom, (i0 - oi) * zoom, (j1 - j0) * zoom, (i1 - i0) * zoom)
+        return rect.toAlignedRect().adjusted(-1, -1, 1, 1)
+
+    def paintEvent(self, e):
+        # Рисуется только та часть изображения, что попала в перерисовываемую область
+        if self._image is None:
+            return None
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.start()
+        zoom, oi, oj = self._viewport()
+        vi0, vi1, vj0, vj1, k = self._image_cells
+
+        # Клетки перерисовываемой области, по границам пикселей изображения
+        area = QRectF(e.rect())
+        i0 = max(vi0, int(np.floor(oi + area.top() / zoom)))
+        j0 = max(vj0, int(np.floor(oj + area.left() / zoom)))
+        i1 = min(vi1, int(np.ceil(oi + area.bottom() / zoom)))
+        j1 = min(vj1, int(np.ceil(oj + area.right() / zoom)))
+        i0, j0 = vi0 + (i0 - vi0) // k * k, vj0 + (j0 - vj0) // k * k
+        i1, j1 = min(vi1, vi0 - (vi0 - i1) // k * k), min(vj1, vj0 - (vj0 - j1) // k * k)
+        if i1 <= i0 or j1 <= j0:
+            return None
+
+        target = QRectF((j0 - oj) * zoom, (i0 - oi) * zoom, (j1 - j0) * zoom, (i1 - i0) * zoom)
+        source = QRectF((j0 - vj0) / k, (i0 - vi0) / k, (j1 - j0) / k, (i1 - i0) / k)
+        painter = QPainter(self)
+        painter.drawImage(target, self._image, source)
+        painter.end()
+        if metrics is not None:
+            metrics.lap("view.paint")
+
+    def resizeEvent(self, e):
+        self._render()
+        super().resizeEvent(e)
 
     def pixel_to_cell(self, x, y):
         # Конвертирует положение пикселя виджета x, y в индекс клетки на игровом поле
-        i = int(self.model.height() * (y / self.height()))
-        j = int(self.model.width() * (x / self.width()))
+        # None -- пиксель вне поля
+        zoom, oi, oj = self._viewport()
+        i, j = int(np.floor(oi + y / zoom)), int(np.floor(oj + x / zoom))
+        if not (0 <= i < self.model.height() and 0 <= j < self.model.width()):
+            return None
         return i, j
 
     def mousePressEvent(self, e):
         # Рисование
         # Происходит по клику левой кнопки мыши
         # Вычисляем по какой клетке из модели произошёл клик и перекрашиываем клетку
+        if self.model is None:
+            return None
         if e.button() == Qt.LeftButton:
-            i, j = self.pixel_to_cell(e.pos().x(), e.pos().y())
-            self.model.toggle_cell(i, j)
-            self.update()
+            cell = self.pixel_to_cell(e.pos().x(), e.pos().y())
+            if cell is None:
+                return None
+            if self.worker is not None:
+                # Клетку меняет поток игры, поле обновится с его кадром
+                self.worker.toggle_cell(*cell)
+                return None
+            self.model.toggle_cell(*cell)
+            self.update_cell(*cell)
+        elif e.button() == Qt.RightButton:
+            self._drag_last = e.pos()
+            self._drag_rest = (0.0, 0.0)
+
+    def mouseMoveEvent(self, e):
+        # Перетаскивание поля: окно просмотра сдвигается в обратную сторону
+        if self._drag_last is None:
+            return None
+        zoom, oi, oj = self._viewport()
+        di = (e.pos().y() - self._drag_last.y()) / zoom
+        dj = (e.pos().x() - self._drag_last.x()) / zoom
+        self._drag_last = e.pos()
+
+        wanted = (oi - di, oj - dj)
+        origin = self._clamp(zoom, *wanted) if self._zoom is not None else (oi, oj)
+        if self._zoom is not None:
+            self._origin = origin
+
+        # На неограниченной плоскости сдвиг за край поля -- сдвиг окна модели
+        if self.model.is_unbounded():
+            rest = (self._drag_rest[0] + wanted[0] - origin[0], self._drag_rest[1] + wanted[1] - origin[1])
+            step = (int(rest[0]), int(rest[1]))
+            self._drag_rest = (rest[0] - step[0], rest[1] - step[1])
+            if step != (0, 0):
+                if self.worker is not None:
+                    # Поле обновится с кадром потока
+                    self.worker.pan(*step)
+                else:
+                    self.model.pan(*step)
+                    self._matrix = self.model.cell_states
+                    self._shown = None
+
+        self._render()
+        super().update()
+
+    def mouseReleaseEvent(self, e):
+        if e.button() == Qt.RightButton:
+            self._drag_last = None
+
+    def wheelEvent(self, e):
+        # Масштаб вокруг клетки под курсором; мельче, чем всё поле, нельзя
+        if self.model is None:
+            return None
+        zoom, oi, oj = self._viewport()
+        fit = min(self.width() / self.model.width(), self.height() / self.model.height())
+        new_zoom = min(self.MAX_ZOOM, zoom * self.ZOOM_STEP ** (e.angleDelta().y() / 120))
+        x, y = e.pos().x(), e.pos().y()
+        if new_zoom <= fit:
+            self._zoom = None
+        else:
+            self._zoom = new_zoom
+            self._origin = self._clamp(new_zoom, oi + y / zoom - y / new_zoom, oj + x / zoom - x / new_zoom)
+        self._render()
+        super().update()
 
 
 # Главное окно приложения
 # Связующее GameOfLife, отображения и игрового цикла
 class MainWindow(QMainWindow):
-    def __init__(self, game, game_loop):
+    # Как часто обновляется строка статистики, с
+    STATS_INTERVAL = 0.5
+    # Деления слайдера скорости на порядок поколений/с; крайнее значение
+    SPEED_DECADE = 25
+    SPEED_MAX = 4 * SPEED_DECADE + 1
+
+    def __init__(self, game, game_loop, metrics=None, checkpointer=None):
         super().__init__()
 
         self.setWindowTitle("Игра жизнь")
@@ -93,15 +428,20 @@ class MainWindow(QMainWindow):
         self.field = GameFieldView()
         self.field.attach_model(game)
 
-        # Игровой цикл каждую итерацию
-        # Обновляет модель и её отображение на экране
-        # Проверяет, закончилась ли игра
-        self.game_loop.timeout.connect(self.game.next)
-        self.game_loop.timeout.connect(self.field.update)
-        self.game_loop.timeout.connect(self.update_age)
-
-        self.game_loop.timeout.connect(self.check_game_finished)
-        self.game_loop.timeout.connect(self.check_game_periodic)
+        # Замеры времени (metrics.Metrics) или None -- без замеров
+        self.metrics = metrics
+        self._stats_shown_at = 0.0
+        self.game.metrics = metrics
+        self.field.metrics = metrics
+
+        # Поколения считаются в отдельном потоке (см. worker.py)
+        # Игровой цикл каждую итерацию просит поток сделать шаг,
+        # готовый кадр показывается, когда поток его опубликует:
+        # обновляется поле и номер поколения, проверяется, закончилась ли игра
+        self.worker = GameWorker(game, checkpointer)
+        self.field.worker = self.worker
+        self.game_loop.timeout.connect(self.request_step)
+        self.worker.frame_ready.connect(self.show_frame)
 
         # Попала ли игра в периодическое состояние (флаг)
         self._game_entered_periodic_state = self.game.is_periodic()
@@ -116,19 +456,34 @@ class MainWindow(QMainWindow):
         layout_window.addLayout(layout_right)
 
         self._age_label = QLabel()
+        self._rate_label = QLabel()
 
         layout_left.addWidget(self.field)
         layout_left.addWidget(self._age_label)
+        # Перемотка по истории поколений: от самого раннего сохранённого
+        # до последнего посчитанного; при перемотке игра ставится на паузу
+        self.history = QSlider(Qt.Horizontal)
+        self.history.setToolTip("История поколений")
+        self.history.setEnabled(False)
+        layout_left.addWidget(self.history)
+        layout_left.addWidget(self._rate_label)
+        # Строка статистики, только при включённых замерах
+        self._stats_label = QLabel()
+        self._stats_label.setVisible(metrics is not None)
+        layout_left.addWidget(self._stats_label)
         layout_left.addStretch()
 
         self.play = QPushButton("Запуск")
         self.pause = QPushButton("Пауза")
         self.speed = QSlider(Qt.Horizontal)
-        # Скорость -- обратная величина периоду обновления
-        self.speed.setMinimum(10)    # 10 мс
-        self.speed.setMaximum(1000)  # 1000 мс = 1 сек
-        self.speed.setValue(800)
-        self.speed.setTickInterval(50)  # Шаг слайдера 50 мс
+        # Скорость в поколениях в секунду, шкала логарифмическая:
+        # значение v -- 10^(v / SPEED_DECADE) поколений/с, от 1 до 10000,
+        # крайнее правое -- без ограничения
+        self.speed.setMinimum(0)
+        self.speed.setMaximum(self.SPEED_MAX)
+        self.speed.setValue(self.SPEED_DECADE * 2 // 3)  # около 5 поколений/с
+        self.speed.setTickInterval(self.SPEED_DECADE)
+        self.speed.setTickPosition(QSlider.TicksBelow)
         self.speed_changed()  # Обновляет начальный период для игрового таймера
 
         layout_right.addWidget(self.play)
@@ -153,12 +508,14 @@ class MainWindow(QMainWindow):
         self.play.clicked.connect(self.play_clicked)
         self.pause.clicked.connect(self.pause_clicked)
         self.speed.valueChanged.connect(self.speed_changed)
+        self.history.valueChanged.connect(self.history_changed)
         self.newgame.clicked.connect(self.newgame_clicked)
         self.save.clicked.connect(self.save_clicked)
         self.load.clicked.connect(self.load_clicked)
 
         # Начальное состояние интерфейса
         self.newgame_ui_state()
+        self.show_frame()
 
     def newgame_ui_state(self):
         self.play.setEnabled(True)
@@ -203,27 +560,101 @@ class MainWindow(QMainWindow):
     def newgame_clicked(self):
         # Создание новой игры с тем же полем
         self.game_loop.pause()
+        self.worker.wait_idle()
 
         self.game.clear()
-        self.field.update()
-        self.update_age()
         self._game_entered_periodic_state = self.game.is_periodic()
+        self.worker.sync()
         self.newgame_ui_state()
 
-    def update_age(self):
-        self._age_label.setText(str(self.game.age))
+    def request_step(self):
+        # Поколения за кадр -- по настройке игрового цикла
+        # Запрос пропускается, если поток ещё считает предыдущие
+        loop = self.game_loop
+        if not self.worker.request_step(loop.generations_per_tick, loop.time_budget) and self.metrics is not None:
+            self.metrics.count("frame.skipped")
+
+    def show_frame(self):
+        # Последний готовый кадр потока игры; промежуточные пропускаются
+        frame = self.worker.frames.take()
+        if frame is None:
+            return None
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.frame()
+            start = time.perf_counter()
+        self.field.show_frame(frame)
+        self.update_age(frame.age)
+        self.update_history(frame)
+        self.game_loop.record(frame.age)
+        self._rate_label.setText(f"{self.game_loop.generations_per_second():.0f} поколений/с")
+        if metrics is not None:
+            metrics.add_time("frame.show", time.perf_counter() - start)
+            self.update_stats()
+
+        if frame.finished:
+            self.check_game_finished()
+        if frame.periodic:
+            self.check_game_periodic()
+
+    def update_age(self, age=None):
+        self._age_label.setText(str(self.game.age if age is None else age))
+
+    def update_history(self, frame):
+        # Диапазон слайдера -- поколения в истории и текущее
+        self.history.blockSignals(True)
+        if frame.history is None:
+            self.history.setRange(frame.age, frame.age)
+        else:
+            first, last = frame.history
+            self.history.setRange(min(first, frame.age), max(last, frame.age))
+        if not self.history.isSliderDown():
+            self.history.setValue(frame.age)
+        self.history.setEnabled(frame.history is not None)
+        self.history.blockSignals(False)
+
+    def history_changed(self):
+        # Перемотка: игра на паузе, поле меняет поток игры
+        # После перемотки назад игру можно продолжить, даже если она закончилась
+        self.pause_clicked()
+        self._game_entered_periodic_state = False
+        self.worker.seek(self.history.value())
+
+    def update_stats(self):
+        # Строка статистики не чаще раза в STATS_INTERVAL секунд
+        now = time.perf_counter()
+        if now - self._stats_shown_at < self.STATS_INTERVAL:
+            return None
+        self._stats_shown_at = now
+
+        timings = self.metrics.timings
+        phases = ", ".join(f"{name} {timings[name].mean() * 1e3:.2f}"
+                           for name in ("game.step", "frame.show", "view.paint") if name in timings)
+        skipped = self.metrics.counters.get("frame.skipped", 0)
+        self._stats_label.setText(f"FPS {self.metrics.fps():.1f} из {self.metrics.requested_fps:.1f}"
+                                  f" | пропущено шагов: {skipped} | мс: {phases}")
 
     def speed_changed(self):
-        # Задержка цикла -- обратная скорости величина
-        delay = (self.speed.minimum() + self.speed.maximum()) - self.speed.value()
+        # Задержка между поколениями -- обратная скорости величина
+        value = self.speed.value()
+        delay = 0 if value == self.SPEED_MAX else 1000 / 10 ** (value / self.SPEED_DECADE)
         self.game_loop.set_delay(delay)
+        if self.metrics is not None:
+            self.metrics.requested_fps = 1000 / self.game_loop.interval
 
     def resizeEvent(self, ev):
         # Перегрузка стандартного события для виджета
         # Нужна для обновления игрового поля при запуске
-        self.field.update()
+        self.field.show_frame(self.worker.frames.front(), full=True)
         super().resizeEvent(ev)
 
+    def closeEvent(self, ev):
+        # Остановка потока игры вместе с окном
+        self.game_loop.pause()
+        self.worker.stop()
+        super().closeEvent(ev)
+
     def check_game_finished(self):
         if not self.game.is_finished():
             return None
@@ -266,6 +697,7 @@ class MainWindow(QMainWindow):
         # Показывает окно для сохранения, юзер там что-то вводит
         # Обрабатывает ввод пользователя
         self.game_loop.pause()
+        self.worker.wait_idle()
 
         dialog = GameSaveDialog()
         dialog.exec_()
@@ -273,29 +705,18 @@ class MainWindow(QMainWindow):
         if dialog.game_name is None:
             return None
 
+        # Поля копируются сейчас, а кодируются и пишутся в базу в фоновом
+        # потоке: интерфейс не ждёт записи
         game_name = dialog.game_name
-        age = self.game.age
-        initial_state = self.game.initial_state
-        current_state = self.game.state
-        size = (self.game.width(), self.game.height())
-        init_str = GameOfLifeLoader.matrix_to_string(initial_state)
-        curr_str = GameOfLifeLoader.matrix_to_string(current_state)
-
-        con = sqlite3.connect('utils/database.db')
-        cur = con.cursor()
-        cur.execute("""
-                        INSERT INTO data
-                         (game_name, age, init_str, curr_str, size)
-                         VALUES
-                         (?, ?, ?, ?, ?)
-                        """,
-                    (game_name, age, init_str, curr_str, str(size)))
-        con.commit()
-        con.close()
-        print(repr(game_name))  # str
-        print(repr(age))        # int
-        print(repr(init_str))   # str
-        print(repr(curr_str))   # str
+        saving = database.Database.shared().save_async(
+            game_name, self.game.age, self.game.initial_state, self.game.state)
+        saving.add_done_callback(lambda future: self._saved(game_name, future))
+
+    def _saved(self, game_name, future):
+        # Вызывается в потоке сохранения
+        error = future.exception()
+        if error is not None:
+            print(f"Игра {game_name!r} не сохранена: {error}")
 
     def load_clicked(self):
         # Загрузка игры
@@ -304,6 +725,7 @@ class MainWindow(QMainWindow):
         # Пользователь там что-то выбрал
         # Обновляем состояние глобальной игры с той, что из базы данных
         self.game_loop.pause()
+        self.worker.wait_idle()
 
         dialog = GameLoadDialog(self.game)
         dialog.exec_()
@@ -319,7 +741,6 @@ class MainWindow(QMainWindow):
             # TODO: size=() # done
 
         )
-        self.field.update()
-        self.update_age()
+        self.worker.sync()
         self.newgame_ui_state()
 
@@ -0,0 +1,275 @@
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+
+# Счёт поколений в отдельном потоке
+# Интерфейс не ждёт шага: игровой таймер только просит GameWorker сделать
+# шаг, а готовые поля забирает из тройного буфера кадров (FrameBuffer).
+# Пока интерфейс показывает один кадр, поток пишет следующий во второй буфер,
+# а третий хранит последний готовый; если интерфейс не успевает,
+# промежуточные кадры пропускаются.
+#
+# За один запрос поток может посчитать несколько поколений (см. loop.py):
+# не больше заданного числа и не дольше заданного времени.
+# Серия прерывается, когда игра завершилась или стала периодической.
+#
+# Если задан checkpointer (checkpoint.Checkpointer), после каждого шага
+# поток проверяет, не пора ли сохранить контрольную точку: снимок делается
+# между шагами, запись идёт в фоне.
+#
+# Игру (GameOfLife) меняет только поток GameWorker. Интерфейсу можно
+# читать и менять игру напрямую лишь после wait_idle при остановленном
+# таймере, а затем вызвать sync, чтобы показать её состояние.
+
+# Перерисовка частью, если изменённый прямоугольник меньше этой доли поля
+DIRTY_FRACTION = 0.25
+
+
+# Прямоугольник изменившихся клеток (строки i0..i1, столбцы j0..j1),
+# False -- ничего не изменилось, None -- изменений слишком много
+def changed_cells(matrix, prev, max_fraction=DIRTY_FRACTION):
+    diff = np.not_equal(matrix, prev)
+    rows = np.flatnonzero(diff.any(axis=1))
+    if rows.size == 0:
+        return False
+    cols = np.flatnonzero(diff.any(axis=0))
+    i0, i1, j0, j1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    if (i1 - i0) * (j1 - j0) > max_fraction * diff.size:
+        return None
+    return i0, i1, j0, j1
+
+
+# Объединение двух прямоугольников изменений в тех же обозначениях
+def _union(a, b):
+    if a is False:
+        return b
+    if b is False:
+        return a
+    if a is None or b is None:
+        return None
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+# Кадр: копия поля и сведения о нём
+# state -- состояния клеток (GameOfLife.cell_states): bool или, для правил
+# Generations, uint8
+# dirty -- изменения относительно предыдущего кадра, забранного интерфейсом
+# history -- первое и последнее поколения истории игры (None -- истории нет)
+class Frame:
+    __slots__ = ("state", "age", "dirty", "finished", "periodic", "history")
+
+    def __init__(self, shape, dtype=np.bool_):
+        self.state = np.zeros(shape, dtype=dtype)
+        self.age = 0
+        self.dirty = None
+        self.finished = False
+        self.periodic = False
+        self.history = None
+
+
+# Тройной буфер кадров
+# front -- кадр интерфейса, ready -- последний готовый, back -- кадр потока
+# Если готовый кадр заменяется новым, не дойдя до интерфейса,
+# их прямоугольники изменений объединяются
+class FrameBuffer:
+    def __init__(self, shape, dtype=np.bool_):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self._frames = [Frame(shape, dtype) for _ in range(3)]
+        self._front, self._ready, self._back = 0, 1, 2
+        self._fresh = False
+        self._lock = threading.Lock()
+
+    # Кадр для записи (поток)
+    def back(self):
+        return self._frames[self._back]
+
+    # Записанный кадр становится готовым (поток)
+    def publish(self):
+        with self._lock:
+            frame = self._frames[self._back]
+            if self._fresh:
+                frame.dirty = _union(self._frames[self._ready].dirty, frame.dirty)
+            self._ready, self._back = self._back, self._ready
+            self._fresh = True
+
+    # Последний готовый кадр или None, если нового нет (интерфейс)
+    def take(self):
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._front, self._ready = self._ready, self._front
+            self._fresh = False
+            return self._frames[self._front]
+
+    # Кадр, показанный интерфейсом
+    def front(self):
+        return self._frames[self._front]
+
+
+# Пример использования
+# worker = GameWorker(game)
+# worker.frame_ready.connect(on_frame)   # on_frame забирает worker.frames.take()
+# timer.timeout.connect(worker.request_step)
+# ...
+# worker.stop()
+class GameWorker(QObject):
+    # Готов новый кадр (испускается в потоке GameWorker)
+    frame_ready = pyqtSignal()
+
+    _step_requested = pyqtSignal(int, float)
+    _toggle_requested = pyqtSignal(int, int)
+    _pan_requested = pyqtSignal(int, int)
+    _seek_requested = pyqtSignal(int)
+
+    def __init__(self, game, checkpointer=None):
+        super().__init__()
+        self.game = game
+        self.checkpointer = checkpointer
+        self.frames = self._make_frames()
+
+        # Сколько запросов отправлено потоку и ещё не выполнено
+        self._pending = 0
+        self._idle = threading.Condition()
+
+        self._thread = QThread()
+        self.moveToThread(self._thread)
+        self._step_requested.connect(self._step)
+        self._toggle_requested.connect(self._toggle)
+        self._pan_requested.connect(self._pan)
+        self._seek_requested.connect(self._seek)
+        self._thread.start()
+
+        self.sync()
+
+    # Запросы из интерфейса
+
+    # Сделать до generations шагов, не дольше budget секунд (None -- без ограничения)
+    # Если поток ещё занят, запрос пропускается (False)
+    def request_step(self, generations=1, budget=None):
+        if not self._request():
+            return False
+        self._step_requested.emit(generations, budget or 0.0)
+        return True
+
+    def toggle_cell(self, i, j):
+        with self._idle:
+            self._pending += 1
+        self._toggle_requested.emit(i, j)
+
+    # Сдвиг окна неограниченной плоскости (GameOfLife.pan)
+    def pan(self, di, dj):
+        with self._idle:
+            self._pending += 1
+        self._pan_requested.emit(di, dj)
+
+    # Переход к поколению (GameOfLife.seek)
+    def seek(self, generation):
+        with self._idle:
+            self._pending += 1
+        self._seek_requested.emit(generation)
+
+    # Дождаться выполнения всех отправленных запросов
+    def wait_idle(self):
+        with self._idle:
+            self._idle.wait_for(lambda: self._pending == 0)
+
+    # Показать текущее состояние игры после её изменения из интерфейса
+    def sync(self):
+        self.wait_idle()
+        frames = self._make_frames()
+        if (self.frames.shape, self.frames.dtype) != (frames.shape, frames.dtype):
+            self.frames = frames
+        self._publish(None)
+
+    def stop(self):
+        self.wait_idle()
+        self._thread.quit()
+        self._thread.wait()
+        if self.checkpointer is not None:
+            self.checkpointer.close()
+
+    def _make_frames(self):
+        return FrameBuffer((self.game.height(), self.game.width()), self.game.cell_states.dtype)
+
+    def _request(self):
+        with self._idle:
+            if self._pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+    # Работа в потоке
+
+    @pyqtSlot(int, float)
+    def _step(self, generations, budget):
+        try:
+            game = self.game
+            start = time.perf_counter()
+            was_periodic = game.is_periodic()
+            done = 0
+            while done < generations and not game.is_finished():
+                game.next()
+                done += 1
+                if self.checkpointer is not None:
+                    self.checkpointer.after_step()
+                if game.is_periodic() and not was_periodic:
+                    break
+                if budget and time.perf_counter() - start >= budget:
+                    break
+
+            # После одного шага перерисовываются только изменения,
+            # после нескольких -- всё поле (и всегда для правил Generations:
+            # угасающие клетки меняются вне прямоугольника живых)
+            if done == 1 and game.rule.states == 2:
+                self._publish(changed_cells(game.state, game.prev_state))
+            elif done >= 1:
+                self._publish(None)
+        finally:
+            self._done()
+
+    @pyqtSlot(int, int)
+    def _toggle(self, i, j):
+        try:
+            self.game.toggle_cell(i, j)
+            self._publish((i, i + 1, j, j + 1))
+        finally:
+            self._done()
+
+    @pyqtSlot(int, int)
+    def _pan(self, di, dj):
+        try:
+            self.game.pan(di, dj)
+            self._publish(None)
+        finally:
+            self._done()
+
+    @pyqtSlot(int)
+    def _seek(self, generation):
+        try:
+            if self.game.seek(generation) is not None:
+                self._publish(None)
+        finally:
+            self._done()
+
+    def _publish(self, dirty):
+        game = self.game
+        frame = self.frames.back()
+        np.copyto(frame.state, game.cell_states)
+        frame.age = game.age
+        frame.dirty = dirty
+        frame.finished = game.is_finished()
+        frame.periodic = game.is_periodic()
+        history = game.history
+        first = history.first() if history is not None else None
+        frame.history = (first, history.last()) if first is not None else None
+        self.frames.publish()
+        self.frame_ready.emit()